@@ -0,0 +1,74 @@
+"""Setup for the benchmarks
+------------------------
+
+Utilities to run the benchmarks in this directory against a temporary test
+database of the ``testproject``.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import os
+import sys
+import timeit
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    """Configure django with the settings of the testproject."""
+    sys.path.insert(0, str(ROOT))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "testproject.settings")
+    import django
+
+    django.setup()
+
+
+@contextmanager
+def test_database() -> Iterator[None]:
+    """Create a temporary test database for the benchmark."""
+    from django.test.utils import (
+        setup_databases,
+        setup_test_environment,
+        teardown_databases,
+        teardown_test_environment,
+    )
+
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
+
+
+def report(name: str, func: Callable[[], object], number: int = 1000):
+    """Time a function and print the time per call."""
+    func()  # warm up
+    best = min(timeit.repeat(func, number=number, repeat=5)) / number
+    print(f"{name:<50s} {best * 1e6:10.1f} µs")
@@ -0,0 +1,91 @@
+"""Benchmark for the ``helmholtz_login_url`` template tag
+-------------------------------------------------------
+
+This benchmark compares the
+:func:`~django_helmholtz_aai.templatetags.helmholtz_aai.helmholtz_login_url`
+tag with its previous implementation that reversed the url and re-parsed the
+query string on every call. Run it via::
+
+    python benchmarks/bench_login_url.py
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import argparse
+from urllib.parse import parse_qs, urlparse, urlunparse
+
+from _setup import report, setup_django
+
+
+def previous_login_url(context) -> str:
+    """The previous implementation of the ``helmholtz_login_url`` tag."""
+    from django.urls import reverse
+    from django.utils.http import urlencode
+
+    login_url = reverse("django_helmholtz_aai:login")
+
+    request = context["request"]
+
+    parts = urlparse(request.path)
+    urlparams = parse_qs(request.GET.urlencode())
+    return urlunparse(
+        [
+            parts.scheme,
+            parts.netloc,
+            login_url,
+            parts.params,
+            urlencode(urlparams, doseq=True),
+            parts.fragment,
+        ]
+    )
+
+
+def main(number: int):
+    from django.template import Context, Template
+    from django.test import RequestFactory
+
+    from django_helmholtz_aai.templatetags.helmholtz_aai import (
+        helmholtz_login_url,
+    )
+
+    for path in ["/some/page/", "/some/page/?next=/other/page/&lang=en"]:
+        context = {"request": RequestFactory().get(path)}
+        assert previous_login_url(context) == helmholtz_login_url(context)
+        print(path)
+        report("previous implementation", lambda: previous_login_url(context))
+        report("helmholtz_login_url", lambda: helmholtz_login_url(context))
+
+    template = Template("{% load helmholtz_aai %}{% helmholtz_login_url %}")
+    context = Context({"request": RequestFactory().get("/?next=/page/")})
+    report("render template", lambda: template.render(context), number)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-n", "--number", type=int, default=10000)
+    args = parser.parse_args()
+
+    setup_django()
+    main(args.number)
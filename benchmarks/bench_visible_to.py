@@ -0,0 +1,86 @@
+"""Benchmark for filtering objects by the groups of a user
+--------------------------------------------------------
+
+This benchmark compares
+:func:`django_helmholtz_aai.models.filter_visible_to` with passing the list
+of group ids from ``user.groups.all()``. Run it via::
+
+    python benchmarks/bench_visible_to.py
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import argparse
+
+from _setup import report, setup_django, test_database
+
+
+def main(n_groups: int, n_memberships: int, number: int):
+    from django.contrib.auth.models import Group
+
+    from django_helmholtz_aai import models
+
+    base = "urn:geant:helmholtz.de:group:bench_{}#login.helmholtz.de"
+    for i in range(n_groups):
+        models.HelmholtzVirtualOrganization.objects.create(
+            name=base.format(i), eduperson_entitlement=base.format(i)
+        )
+    user = models.HelmholtzUser.objects.create(
+        username="bench", eduperson_unique_id="bench"
+    )
+    user.groups.add(*Group.objects.all()[:n_memberships])
+
+    # Group.objects serves as a stand-in for a model with a foreign key to a
+    # group, with the "pk" as group field
+    queryset = Group.objects.all()
+
+    def group_id_list():
+        ids = list(user.groups.values_list("pk", flat=True))
+        return list(queryset.filter(pk__in=ids))
+
+    def subquery():
+        return list(models.filter_visible_to(queryset, user, "pk"))
+
+    def cached():
+        return list(
+            models.filter_visible_to(queryset, user, "pk", cached=True)
+        )
+
+    print(f"{n_groups} groups, user is member of {n_memberships}")
+    report("list of ids from user.groups", group_id_list, number)
+    report("visible_to (subquery)", subquery, number)
+    report("visible_to (cached group ids)", cached, number)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-g", "--groups", type=int, default=2000)
+    parser.add_argument("-m", "--memberships", type=int, default=200)
+    parser.add_argument("-n", "--number", type=int, default=200)
+    args = parser.parse_args()
+
+    setup_django()
+    with test_database():
+        main(args.groups, args.memberships, args.number)
@@ -30,7 +30,6 @@ This module defines the settings options for the ``django_helmholtz_aai`` app.
 from __future__ import annotations
 
 import re
-import warnings
 from typing import Optional
 
 from django.conf import settings
@@ -112,27 +111,6 @@ HELMHOLTZ_CLIENT_ID: str = getattr(settings, "HELMHOLTZ_CLIENT_ID", "")
 HELMHOLTZ_CLIENT_SECRET: str = getattr(settings, "HELMHOLTZ_CLIENT_SECRET", "")
 
 
-if not HELMHOLTZ_CLIENT_ID:
-    warnings.warn(
-        "No client ID configured for the Helmholtz AAI. The authentification "
-        "agains the Helmholtz AAI will not work! Please register a client and "
-        "specify set the username as HELMHOLTZ_CLIENT_ID in settings.py.\n"
-        "See https://hifis.net/doc/helmholtz-aai/howto-services/ for more "
-        "information."
-    )
-
-
-if not HELMHOLTZ_CLIENT_SECRET:
-    warnings.warn(
-        "No client secret configured for the Helmholtz AAI. The "
-        "authentification against the Helmholtz AAI will not work! Please "
-        "register a client and set the secret as HELMHOLTZ_CLIENT_SECRET in "
-        "settings.py.\n"
-        "See https://hifis.net/doc/helmholtz-aai/howto-services/ for more "
-        "information."
-    )
-
-
 #: Keyword argument for the oauth client to connect with the helmholtz AAI.
 #:
 #: Can also be overwritten using the :attr:`HELMHOLTZ_CLIENT_KWS` setting.
@@ -238,7 +216,10 @@ HELMHOLTZ_CREATE_USERS: bool = getattr(
 )
 
 #: The backend that is used to login the user. By default, we use the Django
-#: default, i.e. :class:`django.contrib.auth.backends.ModelBackend`
+#: default, i.e. :class:`django.contrib.auth.backends.ModelBackend`. If your
+#: users are members of many VOs, consider to use the
+#: :class:`django_helmholtz_aai.backends.HelmholtzAAIBackend` that caches the
+#: group permissions.
 HELMHOLTZ_USER_BACKEND: str = getattr(
     settings,
     "HELMHOLTZ_USER_BACKEND",
@@ -261,3 +242,233 @@ HELMHOLTZ_USER_BACKEND: str = getattr(
 #: then the ``ROOT_URL`` in your ``settings.py`` should be
 #: ``https://example.com``
 ROOT_URL: Optional[str] = getattr(settings, "ROOT_URL", None)
+
+#: Interval in seconds for the in-process janitor of empty VOs
+#:
+#: If this setting is specified, a background thread is started with the first
+#: request that periodically removes empty virtual organizations. It only
+#: examines the VOs that have been flagged as possibly empty since its last run
+#: (see the ``--incremental`` option of the ``remove_empty_vos`` command), so
+#: its costs scale with the number of membership changes rather than with the
+#: total number of VOs. By default, this is ``None`` and no janitor is started.
+#:
+#: The janitor is started in every worker process, and only one of them
+#: cleans up at a time if the :setting:`HELMHOLTZ_CACHE` is shared between
+#: the processes. Otherwise, enable the janitor for one process only, see
+#: :mod:`django_helmholtz_aai.janitor`.
+#:
+#: .. setting:: HELMHOLTZ_EMPTY_VOS_JANITOR_INTERVAL
+#:
+#: See Also
+#: --------
+#: HELMHOLTZ_EMPTY_VOS_JANITOR_EXCLUDE
+HELMHOLTZ_EMPTY_VOS_JANITOR_INTERVAL: Optional[float] = getattr(
+    settings, "HELMHOLTZ_EMPTY_VOS_JANITOR_INTERVAL", None
+)
+
+#: VOs that shall never be removed by the in-process janitor
+#:
+#: A list of regular expressions. VOs whose ``eduperson_entitlement`` matches
+#: any of these patterns are kept by the janitor, similar to the ``--exclude``
+#: option of the ``remove_empty_vos`` command.
+#:
+#: .. setting:: HELMHOLTZ_EMPTY_VOS_JANITOR_EXCLUDE
+#:
+#: See Also
+#: --------
+#: HELMHOLTZ_EMPTY_VOS_JANITOR_INTERVAL
+HELMHOLTZ_EMPTY_VOS_JANITOR_EXCLUDE: list[str] = getattr(
+    settings, "HELMHOLTZ_EMPTY_VOS_JANITOR_EXCLUDE", []
+)
+
+#: Grace period in seconds for empty virtual organizations
+#:
+#: Some VOs empty out and refill regularly. Instead of deleting them
+#: (together with their permissions) and creating them again on the next login,
+#: the ``remove_empty_vos`` command can keep empty VOs as tombstones for the
+#: given number of seconds. When a user joins a tombstoned VO, it is revived
+#: with the same primary key and permissions. Only VOs that are still empty
+#: after the grace period are deleted. By default, this is ``0`` and empty VOs
+#: are deleted immediately.
+#:
+#: .. setting:: HELMHOLTZ_VO_TOMBSTONE_GRACE_PERIOD
+#:
+#: Examples
+#: --------
+#: Keep empty VOs for one week::
+#:
+#:     HELMHOLTZ_VO_TOMBSTONE_GRACE_PERIOD = 7 * 24 * 60 * 60
+HELMHOLTZ_VO_TOMBSTONE_GRACE_PERIOD: float = getattr(
+    settings, "HELMHOLTZ_VO_TOMBSTONE_GRACE_PERIOD", 0
+)
+
+#: Regular expressions for entitlements that are materialized as VOs
+#:
+#: By default, every group entitlement of a user becomes a
+#: :class:`~django_helmholtz_aai.models.HelmholtzVirtualOrganization`. If you
+#: only authorize on a few VOs, you can restrict this with a list of regular
+#: expressions. Entitlements that do not match any of these patterns are not
+#: stored in the database. An empty list (the default) means that all group
+#: entitlements are materialized.
+#:
+#: This does not affect the :setting:`HELMHOLTZ_ALLOWED_VOS` check at login.
+#: VOs that have been created before and do not pass the filter anymore can be
+#: removed with ``python manage.py prune_filtered_vos``.
+#:
+#: .. setting:: HELMHOLTZ_VO_INCLUDE
+#:
+#: Examples
+#: --------
+#: Only store the VOs of the Hereon group and its subgroups::
+#:
+#:     HELMHOLTZ_VO_INCLUDE = [
+#:         r"urn:geant:helmholtz.de:group:hereon(:.*)?#login.helmholtz.de",
+#:     ]
+#:
+#: See Also
+#: --------
+#: HELMHOLTZ_VO_EXCLUDE
+HELMHOLTZ_VO_INCLUDE: list[str] = getattr(settings, "HELMHOLTZ_VO_INCLUDE", [])
+
+#: Regular expressions for entitlements that are not materialized as VOs
+#:
+#: Entitlements that match any of these patterns are not stored as
+#: :class:`~django_helmholtz_aai.models.HelmholtzVirtualOrganization`, even if
+#: they match the :setting:`HELMHOLTZ_VO_INCLUDE` patterns.
+#:
+#: .. setting:: HELMHOLTZ_VO_EXCLUDE
+#:
+#: See Also
+#: --------
+#: HELMHOLTZ_VO_INCLUDE
+HELMHOLTZ_VO_EXCLUDE: list[str] = getattr(settings, "HELMHOLTZ_VO_EXCLUDE", [])
+
+#: The cache to use for the memberships and permissions of AAI users
+#:
+#: The name of one of the :setting:`CACHES` in your ``settings.py``. This cache
+#: is used by :class:`~django_helmholtz_aai.backends.HelmholtzAAIBackend` and
+#: the other utilities in :mod:`django_helmholtz_aai.membership`.
+#:
+#: The cached memberships and group permissions are invalidated by deleting
+#: their fingerprints from this cache. The cache must therefore be shared by
+#: all server processes (e.g. Redis or Memcached). With a local-memory cache,
+#: the other processes keep using outdated memberships and permissions until
+#: the :setting:`HELMHOLTZ_MEMBERSHIP_CACHE_TIMEOUT` expires. The system check
+#: ``django_helmholtz_aai.W003`` warns about such a configuration.
+#:
+#: .. setting:: HELMHOLTZ_CACHE
+HELMHOLTZ_CACHE: str = getattr(settings, "HELMHOLTZ_CACHE", "default")
+
+#: Timeout in seconds for cached memberships and permissions of AAI users
+#:
+#: The cached values are versioned and invalidated when the memberships
+#: change. The fingerprints of the versions expire after this timeout as well,
+#: so it also limits how long a server process can use outdated memberships
+#: (including the :setting:`HELMHOLTZ_SESSION_VO_SNAPSHOT`) if it does not see
+#: an invalidation.
+#:
+#: .. setting:: HELMHOLTZ_MEMBERSHIP_CACHE_TIMEOUT
+HELMHOLTZ_MEMBERSHIP_CACHE_TIMEOUT: int = getattr(
+    settings, "HELMHOLTZ_MEMBERSHIP_CACHE_TIMEOUT", 3600
+)
+
+#: Flag to store a snapshot of the VO memberships in the session
+#:
+#: If this is ``True``, the entitlements of the VOs of a user are stored in the
+#: session when the user logs in via the Helmholtz AAI. The
+#: :func:`~django_helmholtz_aai.decorators.require_vo` decorator, the
+#: ``has_vo`` template tag and the ``request.aai_vos`` attribute of the
+#: :class:`~django_helmholtz_aai.middleware.HelmholtzAAIMiddleware` then do not
+#: need to query the database. The snapshot is validated against the membership
+#: fingerprint in the :setting:`HELMHOLTZ_CACHE`, so it is renewed when the
+#: memberships change, e.g. via the admin or a later login.
+#:
+#: .. warning::
+#:
+#:     This requires a :setting:`HELMHOLTZ_CACHE` that is shared by all server
+#:     processes (e.g. Redis or Memcached). With a local-memory cache, only
+#:     the process that changed the memberships renews the fingerprint, and
+#:     the other processes accept the outdated snapshot (including revoked
+#:     VOs) until the :setting:`HELMHOLTZ_MEMBERSHIP_CACHE_TIMEOUT` expires.
+#:     The system check ``django_helmholtz_aai.W004`` warns about such a
+#:     configuration.
+#:
+#: .. setting:: HELMHOLTZ_SESSION_VO_SNAPSHOT
+HELMHOLTZ_SESSION_VO_SNAPSHOT: bool = getattr(
+    settings, "HELMHOLTZ_SESSION_VO_SNAPSHOT", False
+)
+
+#: The store for the state of pending logins at the Helmholtz AAI
+#:
+#: The dotted path to a subclass of
+#: :class:`~django_helmholtz_aai.state.BaseStateStore`. By default, the OAuth
+#: state, the nonce and the URL to return to are kept in the session. Use
+#: ``"django_helmholtz_aai.state.SignedCookieStateStore"`` to keep them in a
+#: signed cookie instead, such that the redirect to the Helmholtz AAI does not
+#: create a session for anonymous users, or
+#: ``"django_helmholtz_aai.state.CacheStateStore"`` to keep them in the
+#: :setting:`HELMHOLTZ_STATE_CACHE`.
+#:
+#: .. setting:: HELMHOLTZ_STATE_STORE
+HELMHOLTZ_STATE_STORE: str = getattr(
+    settings,
+    "HELMHOLTZ_STATE_STORE",
+    "django_helmholtz_aai.state.SessionStateStore",
+)
+
+#: Time in seconds that a login at the Helmholtz AAI may remain pending
+#:
+#: If the user does not come back from the Helmholtz AAI within this time, the
+#: login fails and has to be started again.
+#:
+#: .. setting:: HELMHOLTZ_STATE_MAX_AGE
+HELMHOLTZ_STATE_MAX_AGE: int = getattr(
+    settings, "HELMHOLTZ_STATE_MAX_AGE", 3600
+)
+
+#: The cache for the state of pending logins at the Helmholtz AAI
+#:
+#: The name of one of the :setting:`CACHES` in your ``settings.py`` that is
+#: used by the :class:`~django_helmholtz_aai.state.CacheStateStore`. Defaults
+#: to the :setting:`HELMHOLTZ_CACHE`. The cache should be shared by all your
+#: server processes, i.e. not a local memory cache.
+#:
+#: .. setting:: HELMHOLTZ_STATE_CACHE
+HELMHOLTZ_STATE_CACHE: str = getattr(
+    settings, "HELMHOLTZ_STATE_CACHE", HELMHOLTZ_CACHE
+)
+
+#: Minimum interval in seconds between updates of the last login of AAI users
+#:
+#: Django updates the ``last_login`` of a user with every login. For users
+#: that log in many times a day, this causes many writes to the user table. If
+#: this setting is specified, the ``last_login`` of a Helmholtz AAI user is
+#: only updated if the previous login is longer ago than the given number of
+#: seconds. By default, this is ``None`` and ``last_login`` is updated with
+#: every login.
+#:
+#: .. setting:: HELMHOLTZ_LAST_LOGIN_INTERVAL
+#:
+#: Examples
+#: --------
+#: Update the last login at most once per hour::
+#:
+#:     HELMHOLTZ_LAST_LOGIN_INTERVAL = 60 * 60
+HELMHOLTZ_LAST_LOGIN_INTERVAL: Optional[float] = getattr(
+    settings, "HELMHOLTZ_LAST_LOGIN_INTERVAL", None
+)
+
+#: Flag to record the sessions of Helmholtz AAI users
+#:
+#: If this is ``True``, the session of a user is recorded in the
+#: :class:`~django_helmholtz_aai.models.HelmholtzUserSession` model when the
+#: user logs in via the Helmholtz AAI. This is necessary for the
+#: back-channel logout (see
+#: :class:`~django_helmholtz_aai.views.HelmholtzBackchannelLogoutView`) and
+#: for :func:`~django_helmholtz_aai.sessions.invalidate_sessions_for`. It
+#: requires a session engine that stores the sessions on the server.
+#:
+#: .. setting:: HELMHOLTZ_TRACK_SESSIONS
+HELMHOLTZ_TRACK_SESSIONS: bool = getattr(
+    settings, "HELMHOLTZ_TRACK_SESSIONS", False
+)
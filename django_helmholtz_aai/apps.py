@@ -27,8 +27,29 @@ App config for the django_helmholtz_aai app.
 
 
 from django.apps import AppConfig
+from django.contrib.auth.signals import user_logged_in
+from django.core.signals import request_started
 
 
 class DjangoHelmholtzAaiConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "django_helmholtz_aai"
+
+    def ready(self):
+        # connect the signal receivers and register the system checks
+        import django_helmholtz_aai.checks  # noqa: F401
+        from django_helmholtz_aai import app_settings, janitor, receivers
+
+        # replace the update of the last_login from django.contrib.auth to
+        # throttle it for AAI users. If django.contrib.auth is ready after
+        # this app, its receiver is not connected as the dispatch_uid exists
+        user_logged_in.disconnect(dispatch_uid="update_last_login")
+        user_logged_in.connect(
+            receivers.update_last_login, dispatch_uid="update_last_login"
+        )
+
+        if app_settings.HELMHOLTZ_EMPTY_VOS_JANITOR_INTERVAL:
+            request_started.connect(
+                janitor.start_janitor,
+                dispatch_uid="helmholtz_aai_empty_vo_janitor",
+            )
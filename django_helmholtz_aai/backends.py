@@ -0,0 +1,113 @@
+"""Authentication backends
+-----------------------
+
+This module defines an authentication backend that caches the permissions of
+users with many virtual organizations.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from django_helmholtz_aai import membership
+
+UserModel = get_user_model()
+
+
+class HelmholtzAAIBackend(ModelBackend):
+    """A model backend that caches the group permissions of a user.
+
+    Django's :class:`~django.contrib.auth.backends.ModelBackend` queries the
+    permissions of all groups of a user on every request. Users of the
+    Helmholtz AAI may be members in hundreds of VOs, so this backend caches
+    the resolved group permissions in the :setting:`HELMHOLTZ_CACHE`. The
+    cache is invalidated when the groups of the user or the permissions of any
+    group change, see :mod:`django_helmholtz_aai.membership`.
+
+    To use this backend, add it to the :setting:`AUTHENTICATION_BACKENDS` and
+    set the :setting:`HELMHOLTZ_USER_BACKEND` in your ``settings.py``, e.g.::
+
+        AUTHENTICATION_BACKENDS = [
+            "django_helmholtz_aai.backends.HelmholtzAAIBackend",
+        ]
+        HELMHOLTZ_USER_BACKEND = "django_helmholtz_aai.backends.HelmholtzAAIBackend"
+    """
+
+    def get_group_permissions(self, user_obj, obj=None):
+        """Get the cached permissions from the groups of the user."""
+        if not user_obj.is_active or user_obj.is_anonymous or obj is not None:
+            return set()
+        if not hasattr(user_obj, "_group_perm_cache"):
+            key = "{}:group-perms:{}:{}:{}:{}".format(
+                membership.KEY_PREFIX,
+                user_obj.pk,
+                int(user_obj.is_superuser),
+                membership.get_permissions_version(),
+                membership.get_membership_version(user_obj.pk),
+            )
+            user_obj._group_perm_cache = membership.get_cached(
+                key, partial(super().get_group_permissions, user_obj)
+            )
+        return user_obj._group_perm_cache
+
+    def get_user(self, user_id):
+        """Get the user and return the Helmholtz AAI user if possible.
+
+        The :class:`~django_helmholtz_aai.models.HelmholtzUser` is queried
+        together with the user in a single query, such that ``request.user``
+        is a :class:`~django_helmholtz_aai.models.HelmholtzUser` for users of
+        the Helmholtz AAI without any further query.
+        """
+        from django_helmholtz_aai import models
+
+        try:
+            user = UserModel._default_manager.select_related(
+                "helmholtzuser"
+            ).get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        if not self.user_can_authenticate(user):
+            return None
+        try:
+            return user.helmholtzuser
+        except models.HelmholtzUser.DoesNotExist:
+            return user
+
+    def has_vo(self, user_obj, entitlement: str) -> bool:
+        """Check if the user is a member of a VO.
+
+        Parameters
+        ----------
+        user_obj: User
+            The user to check
+        entitlement: str
+            The ``eduperson_entitlement`` of the VO
+        """
+        if not user_obj.is_active:
+            return False
+        return entitlement in membership.get_vo_entitlements(user_obj)
@@ -0,0 +1,125 @@
+"""System checks
+-------------
+
+System checks for the configuration of the Helmholtz AAI app, see
+:doc:`django:topics/checks`.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+from django.core.checks import Warning, register
+
+from django_helmholtz_aai import app_settings
+
+
+def is_local_cache(alias: str) -> bool:
+    """Check if the cache `alias` is local to the server process.
+
+    Invalidations in such a cache, e.g. a
+    :class:`~django.core.cache.backends.locmem.LocMemCache`, are not seen
+    by the other server processes.
+    """
+    from django.core.cache import InvalidCacheBackendError, caches
+    from django.core.cache.backends.locmem import LocMemCache
+
+    try:
+        return isinstance(caches[alias], LocMemCache)
+    except InvalidCacheBackendError:
+        return False
+
+
+@register()
+def check_client_credentials(app_configs, **kwargs) -> list[Warning]:
+    """Check that the client for the Helmholtz AAI is configured."""
+    errors: list[Warning] = []
+    if not app_settings.HELMHOLTZ_CLIENT_KWS.get("client_id"):
+        errors.append(
+            Warning(
+                "No client ID configured for the Helmholtz AAI. The "
+                "authentification against the Helmholtz AAI will not work!",
+                hint=(
+                    "Please register a client and set the username as "
+                    "HELMHOLTZ_CLIENT_ID in settings.py. See "
+                    "https://hifis.net/doc/helmholtz-aai/howto-services/ for "
+                    "more information."
+                ),
+                id="django_helmholtz_aai.W001",
+            )
+        )
+    if not app_settings.HELMHOLTZ_CLIENT_KWS.get("client_secret"):
+        errors.append(
+            Warning(
+                "No client secret configured for the Helmholtz AAI. The "
+                "authentification against the Helmholtz AAI will not work!",
+                hint=(
+                    "Please register a client and set the secret as "
+                    "HELMHOLTZ_CLIENT_SECRET in settings.py. See "
+                    "https://hifis.net/doc/helmholtz-aai/howto-services/ for "
+                    "more information."
+                ),
+                id="django_helmholtz_aai.W002",
+            )
+        )
+    return errors
+
+
+@register()
+def check_membership_cache(app_configs, **kwargs) -> list[Warning]:
+    """Check that the memberships are cached in a shared cache."""
+    errors: list[Warning] = []
+    if is_local_cache(app_settings.HELMHOLTZ_CACHE):
+        errors.append(
+            Warning(
+                f"The HELMHOLTZ_CACHE {app_settings.HELMHOLTZ_CACHE!r} is a "
+                "local-memory cache. Changed memberships and group "
+                "permissions are only invalidated in the server process that "
+                "changed them, so other processes may grant revoked "
+                "permissions for up to HELMHOLTZ_MEMBERSHIP_CACHE_TIMEOUT "
+                "seconds.",
+                hint=(
+                    "Set HELMHOLTZ_CACHE to a cache that is shared by all "
+                    "server processes (e.g. Redis or Memcached), or silence "
+                    "this check if your website runs in a single process."
+                ),
+                id="django_helmholtz_aai.W003",
+            )
+        )
+        if app_settings.HELMHOLTZ_SESSION_VO_SNAPSHOT:
+            errors.append(
+                Warning(
+                    "HELMHOLTZ_SESSION_VO_SNAPSHOT is enabled with a "
+                    "local-memory HELMHOLTZ_CACHE. Other server processes "
+                    "accept the VO snapshots in the sessions, including "
+                    "revoked VOs, for up to "
+                    "HELMHOLTZ_MEMBERSHIP_CACHE_TIMEOUT seconds.",
+                    hint=(
+                        "Set HELMHOLTZ_CACHE to a cache that is shared by "
+                        "all server processes or disable "
+                        "HELMHOLTZ_SESSION_VO_SNAPSHOT."
+                    ),
+                    id="django_helmholtz_aai.W004",
+                )
+            )
+    return errors
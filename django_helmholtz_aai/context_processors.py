@@ -0,0 +1,58 @@
+"""Context processors
+------------------
+
+Context processors for the Helmholtz AAI.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+from django.utils.functional import SimpleLazyObject
+
+from django_helmholtz_aai import membership
+
+
+def helmholtz_aai(request):
+    """Add the VOs of the user to the template context.
+
+    This context processor adds the ``aai_vos`` variable, a lazily evaluated
+    frozenset with the entitlements of the VOs of ``request.user``. It is
+    computed at most once per request via
+    :func:`~django_helmholtz_aai.membership.get_request_vos`.
+
+    To use it, add ``"django_helmholtz_aai.context_processors.helmholtz_aai"``
+    to the ``context_processors`` in your :setting:`TEMPLATES` setting. You
+    can then check memberships in templates via
+
+    .. code-block:: html
+
+        {% if "urn:geant:helmholtz.de:group:hereon#login.helmholtz.de" in aai_vos %}
+          ...
+        {% endif %}
+    """
+    return {
+        "aai_vos": SimpleLazyObject(
+            lambda: membership.get_request_vos(request)
+        )
+    }
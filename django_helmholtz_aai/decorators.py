@@ -0,0 +1,91 @@
+"""Decorators
+----------
+
+Decorators to restrict views to members of virtual organizations.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+from functools import wraps
+from typing import Optional
+
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import PermissionDenied
+
+from django_helmholtz_aai import membership
+
+
+def require_vo(
+    *vo_entitlements: str,
+    include_subgroups: bool = False,
+    login_url: Optional[str] = None,
+):
+    """Decorator for views that require the membership in a VO.
+
+    Anonymous users are redirected to the login page, other users that are not
+    a member of any of the given VOs get a
+    :class:`~django.core.exceptions.PermissionDenied` error. The memberships
+    are checked with
+    :func:`~django_helmholtz_aai.membership.request_has_vo`, i.e. via the
+    snapshot in the session if :setting:`HELMHOLTZ_SESSION_VO_SNAPSHOT` is
+    enabled.
+
+    Parameters
+    ----------
+    ``*vo_entitlements``
+        The entitlements of the VOs. The user needs to be a member of at least
+        one of them.
+    include_subgroups: bool
+        If True, also accept memberships in the subgroups of the VOs
+    login_url: Optional[str]
+        The URL to redirect anonymous users to. Defaults to the
+        :setting:`LOGIN_URL`.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        from django_helmholtz_aai.decorators import require_vo
+
+
+        @require_vo("urn:geant:helmholtz.de:group:hereon#login.helmholtz.de")
+        def my_view(request):
+            ...
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request, *args, **kwargs):
+            if membership.request_has_vo(
+                request, *vo_entitlements, include_subgroups=include_subgroups
+            ):
+                return view_func(request, *args, **kwargs)
+            if not request.user.is_authenticated:
+                return redirect_to_login(request.get_full_path(), login_url)
+            raise PermissionDenied
+
+        return _wrapped_view
+
+    return decorator
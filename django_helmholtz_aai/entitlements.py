@@ -0,0 +1,224 @@
+"""Entitlements of the Helmholtz AAI
+----------------------------------
+
+This module defines utilities to parse the ``eduperson_entitlement`` claims of
+the Helmholtz AAI. A group entitlement has the form
+``<namespace>:group:<group path>#<authority>``, e.g.
+``urn:geant:helmholtz.de:group:some_VO:subgroup#login.helmholtz.de``, see
+https://hifis.net/doc/helmholtz-aai/attributes/.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import TYPE_CHECKING, NamedTuple, Optional, Sequence, Tuple, Union
+
+from django_helmholtz_aai import app_settings
+
+if TYPE_CHECKING:
+    from django_helmholtz_aai.models import HelmholtzVirtualOrganization
+
+#: Separator between the namespace and the group path of an entitlement
+GROUP_SEPARATOR = ":group:"
+
+#: Separator between the group path and the authority of an entitlement
+AUTHORITY_SEPARATOR = "#"
+
+#: Separator between the segments of a group path
+PATH_SEPARATOR = ":"
+
+
+class Entitlement(NamedTuple):
+    """A parsed group entitlement of the Helmholtz AAI."""
+
+    #: The namespace, e.g. ``urn:geant:helmholtz.de``
+    namespace: str
+
+    #: The path of the group, e.g. ``some_VO:subgroup``
+    group_path: str
+
+    #: The authority, e.g. ``login.helmholtz.de``
+    authority: str
+
+    @property
+    def segments(self) -> Tuple[str, ...]:
+        """The segments of the :attr:`group_path`."""
+        return tuple(self.group_path.split(PATH_SEPARATOR))
+
+    def is_descendant_of(
+        self, other: Entitlement, include_self: bool = True
+    ) -> bool:
+        """Check if this entitlement is a subgroup of `other`.
+
+        Parameters
+        ----------
+        other: Entitlement
+            The potential ancestor
+        include_self: bool
+            If True, an entitlement is considered as a descendant of itself.
+        """
+        if (self.namespace, self.authority) != (
+            other.namespace,
+            other.authority,
+        ):
+            return False
+        if self.group_path == other.group_path:
+            return include_self
+        return self.group_path.startswith(other.group_path + PATH_SEPARATOR)
+
+    def ancestors(self) -> list[Entitlement]:
+        """Get the entitlements of the parent groups, starting at the root."""
+        segments = self.segments
+        return [
+            self._replace(group_path=PATH_SEPARATOR.join(segments[:i]))
+            for i in range(1, len(segments))
+        ]
+
+    def __str__(self) -> str:
+        return (
+            self.namespace
+            + GROUP_SEPARATOR
+            + self.group_path
+            + AUTHORITY_SEPARATOR
+            + self.authority
+        )
+
+
+def parse_entitlement(entitlement: str) -> Optional[Entitlement]:
+    """Parse a group entitlement of the Helmholtz AAI.
+
+    Parameters
+    ----------
+    entitlement: str
+        The entitlement as provided in the ``eduperson_entitlement`` claim of
+        the userinfo.
+
+    Returns
+    -------
+    Optional[Entitlement]
+        The parsed entitlement or ``None`` if `entitlement` does not describe
+        a group (such as ``urn:mace:dir:entitlement:common-lib-terms``).
+
+    Examples
+    --------
+    .. code-block:: python
+
+        >>> parse_entitlement(
+        ...     "urn:geant:helmholtz.de:group:some_VO:subgroup#login.helmholtz.de"
+        ... )
+        Entitlement(namespace='urn:geant:helmholtz.de', group_path='some_VO:subgroup', authority='login.helmholtz.de')
+    """
+    namespace, sep, rest = entitlement.partition(GROUP_SEPARATOR)
+    if not sep:
+        return None
+    group_path, sep, authority = rest.rpartition(AUTHORITY_SEPARATOR)
+    if not sep:
+        return None
+    return Entitlement(namespace, group_path, authority)
+
+
+def is_group_entitlement(entitlement: str) -> bool:
+    """Check if the entitlement describes a group of the Helmholtz AAI."""
+    return parse_entitlement(entitlement) is not None
+
+
+class EntitlementFilter:
+    """A filter for the entitlements that are materialized as VOs.
+
+    The include and exclude patterns are compiled into a single regular
+    expression each, such that every entitlement is only matched once per
+    pattern list.
+
+    Parameters
+    ----------
+    include: Sequence[str]
+        Regular expressions for the entitlements to accept. If empty, all
+        group entitlements are accepted.
+    exclude: Sequence[str]
+        Regular expressions for the entitlements to reject.
+    """
+
+    def __init__(
+        self, include: Sequence[str] = (), exclude: Sequence[str] = ()
+    ):
+        self.include = self._compile(include)
+        self.exclude = self._compile(exclude)
+
+    @staticmethod
+    def _compile(patterns: Sequence[str]) -> Optional[re.Pattern]:
+        if not patterns:
+            return None
+        return re.compile("|".join(f"(?:{patt})" for patt in patterns))
+
+    def __call__(self, entitlement: str) -> bool:
+        """Check if the entitlement should be materialized as a VO."""
+        if not is_group_entitlement(entitlement):
+            return False
+        if self.include is not None and not self.include.match(entitlement):
+            return False
+        if self.exclude is not None and self.exclude.match(entitlement):
+            return False
+        return True
+
+
+@lru_cache(maxsize=None)
+def _get_vo_filter(
+    include: Tuple[str, ...], exclude: Tuple[str, ...]
+) -> EntitlementFilter:
+    return EntitlementFilter(include, exclude)
+
+
+def get_vo_filter() -> EntitlementFilter:
+    """Get the filter for the entitlements that are materialized as VOs.
+
+    The filter is compiled from the :setting:`HELMHOLTZ_VO_INCLUDE` and
+    :setting:`HELMHOLTZ_VO_EXCLUDE` settings and cached.
+    """
+    return _get_vo_filter(
+        tuple(app_settings.HELMHOLTZ_VO_INCLUDE),
+        tuple(app_settings.HELMHOLTZ_VO_EXCLUDE),
+    )
+
+
+def to_entitlement(
+    entitlement: Union[str, Entitlement, "HelmholtzVirtualOrganization"]
+) -> Entitlement:
+    """Get the parsed entitlement of a string or a VO.
+
+    Raises
+    ------
+    ValueError
+        If `entitlement` does not describe a group.
+    """
+    if isinstance(entitlement, Entitlement):
+        return entitlement
+    if isinstance(entitlement, str):
+        parsed = parse_entitlement(entitlement)
+    else:
+        parsed = entitlement.entitlement
+    if parsed is None:
+        raise ValueError(f"{entitlement} is not a group entitlement.")
+    return parsed
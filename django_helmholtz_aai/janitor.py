@@ -0,0 +1,123 @@
+"""Janitor for empty virtual organizations
+-----------------------------------------
+
+This module defines a background thread that periodically removes empty
+virtual organizations, see the
+:setting:`HELMHOLTZ_EMPTY_VOS_JANITOR_INTERVAL` setting.
+
+The janitor is started in every worker process of the website. To avoid
+concurrent cleanups, a run only starts if it can acquire a lock in the
+:setting:`HELMHOLTZ_CACHE`. This only works across processes if this cache is
+shared between them (e.g. redis or memcached). With a local-memory cache,
+enable the janitor in one process only, or run the ``remove_empty_vos``
+command periodically instead.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Optional
+
+from django.db import close_old_connections
+
+from django_helmholtz_aai import app_settings
+
+logger = logging.getLogger(__name__)
+
+#: The key of the lock in the :setting:`HELMHOLTZ_CACHE` that prevents
+#: concurrent cleanups
+LOCK_KEY = "helmholtz_aai:empty-vo-janitor-lock"
+
+
+class EmptyVOJanitor(threading.Thread):
+    """A daemon thread to remove empty virtual organizations.
+
+    The janitor only examines the VOs that have been flagged as possibly
+    empty, see
+    :meth:`~django_helmholtz_aai.models.HelmholtzVirtualOrganizationQuerySet.remove_empty_vos`.
+    """
+
+    daemon = True
+
+    def __init__(self, interval: float, exclude: list[str] = []):
+        super().__init__(name="helmholtz-aai-empty-vo-janitor")
+        self.interval = interval
+        self.exclude = exclude
+        self._stopped = threading.Event()
+
+    def run(self):
+        """Remove the empty VOs every :attr:`interval` seconds."""
+        while not self._stopped.wait(self.interval):
+            self.cleanup()
+
+    def cleanup(self):
+        """Remove the VOs that have been flagged as possibly empty.
+
+        Nothing is done if another janitor holds the :data:`LOCK_KEY`.
+        """
+        from django_helmholtz_aai import membership, models
+
+        cache = membership.get_cache()
+        if not cache.add(LOCK_KEY, True, timeout=self.interval):
+            return
+        try:
+            models.HelmholtzVirtualOrganization.objects.remove_empty_vos(
+                exclude=self.exclude, incremental=True
+            )
+        except Exception:
+            logger.exception("Failed to remove empty virtual organizations.")
+        finally:
+            cache.delete(LOCK_KEY)
+            close_old_connections()
+
+    def stop(self):
+        """Stop the janitor after the current run."""
+        self._stopped.set()
+
+
+#: The janitor that has been started via :func:`start_janitor`
+janitor: Optional[EmptyVOJanitor] = None
+
+_lock = threading.Lock()
+
+
+def start_janitor(**kwargs) -> Optional[EmptyVOJanitor]:
+    """Start the janitor if it is configured and not yet running.
+
+    This function is connected to the :data:`~django.core.signals.request_started`
+    signal if the :setting:`HELMHOLTZ_EMPTY_VOS_JANITOR_INTERVAL` is set.
+    """
+    global janitor
+    interval = app_settings.HELMHOLTZ_EMPTY_VOS_JANITOR_INTERVAL
+    if not interval:
+        return None
+    with _lock:
+        if janitor is None or not janitor.is_alive():
+            janitor = EmptyVOJanitor(
+                interval, app_settings.HELMHOLTZ_EMPTY_VOS_JANITOR_EXCLUDE
+            )
+            janitor.start()
+    return janitor
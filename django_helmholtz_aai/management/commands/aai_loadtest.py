@@ -0,0 +1,484 @@
+"""Load-test the login at the Helmholtz AAI
+-----------------------------------------
+
+This command measures how many logins per second the website sustains. It
+serves a :class:`~django_helmholtz_aai.testing.StandInProvider` on the
+loopback interface, points the OAuth client to it and sends concurrent
+simulated users through the
+:class:`~django_helmholtz_aai.views.HelmholtzLoginView` and the
+:class:`~django_helmholtz_aai.views.HelmholtzAuthentificationView`, i.e.
+through the full login flow including the requests to the token, userinfo
+and JWKS endpoints of the provider. The requests to the website are handled
+in-process with Django's test client, so no web server is needed.
+
+Every simulated user is member of a configurable number of VOs. Returning
+users log in once before the measurement, so that their account exists
+already. At the end, the command reports the latency percentiles, the
+throughput, the number of database queries and the errors.
+
+By default, the logins are performed in a temporary test database. Use
+``--use-existing-database`` to run them against the configured database
+(which then contains the simulated users).
+
+.. argparse::
+   :module: django_helmholtz_aai.management.commands.aai_loadtest
+   :func: _dummy_parser
+   :prog: python manage.py aai_loadtest
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import math
+import random
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from queue import Empty, Queue
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand
+
+
+def _dummy_parser():
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser()
+    _add_arguments(parser)
+    return parser
+
+
+def _add_arguments(parser):
+    parser.add_argument(
+        "-u",
+        "--users",
+        type=int,
+        default=100,
+        help="Number of simulated logins, default: %(default)s",
+    )
+
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        type=int,
+        default=None,
+        help=(
+            "Number of concurrent users, default: 1 for SQLite databases "
+            "(which only support one writer at a time), 10 otherwise"
+        ),
+    )
+
+    parser.add_argument(
+        "-e",
+        "--entitlements",
+        type=int,
+        default=5,
+        help="Number of VOs per user, default: %(default)s",
+    )
+
+    parser.add_argument(
+        "--vos",
+        type=int,
+        default=50,
+        help=(
+            "Number of distinct VOs that the VOs of the users are drawn "
+            "from, default: %(default)s"
+        ),
+    )
+
+    parser.add_argument(
+        "-r",
+        "--returning",
+        type=float,
+        default=0.5,
+        help=(
+            "Fraction of the users that already have an account, "
+            "default: %(default)s"
+        ),
+    )
+
+    parser.add_argument(
+        "-l",
+        "--latency",
+        type=float,
+        default=0.0,
+        help=(
+            "Latency of every request to the provider in seconds, "
+            "default: %(default)s"
+        ),
+    )
+
+    parser.add_argument(
+        "--failure-rate",
+        type=float,
+        default=0.0,
+        help=(
+            "Probability that a request to the provider fails, "
+            "default: %(default)s"
+        ),
+    )
+
+    parser.add_argument(
+        "--seed",
+        type=int,
+        help="Seed for the random VOs and failures.",
+    )
+
+    parser.add_argument(
+        "--use-existing-database",
+        action="store_true",
+        help=(
+            "Perform the logins in the configured database instead of a "
+            "temporary test database."
+        ),
+    )
+
+    parser.add_argument(
+        "-db",
+        "--database",
+        help=(
+            "The Django database identifier (see settings.py) whose queries "
+            "are counted, default: %(default)s"
+        ),
+        default="default",
+    )
+
+
+class LoginResult(NamedTuple):
+    """The result of a simulated login."""
+
+    #: The duration of the login in seconds
+    duration: float
+
+    #: The number of database queries during the login
+    queries: int
+
+    #: The error of the login, or None if the login succeeded
+    error: Optional[str]
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """Get the `q`-th percentile of the `values` (nearest rank)."""
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    rank = max(math.ceil(q / 100 * len(values)), 1)
+    return values[min(rank, len(values)) - 1]
+
+
+def get_client_path(url: str) -> str:
+    """Get the path of a URL of the website for the test client.
+
+    The test client expects the path without the ``FORCE_SCRIPT_NAME``.
+    """
+    from django.urls import get_script_prefix
+
+    parts = urlsplit(url)
+    path = parts.path
+    prefix = get_script_prefix()
+    if path.startswith(prefix):
+        path = "/" + path[len(prefix) :]
+    return path + ("?" + parts.query if parts.query else "")
+
+
+@contextmanager
+def temporary_database() -> Iterator[None]:
+    """Create a temporary test database.
+
+    SQLite test databases are created in a temporary file, as the in-memory
+    databases of SQLite do not support concurrent writes from several
+    threads.
+    """
+    import tempfile
+
+    from django.db import connections
+    from django.test.utils import setup_databases, teardown_databases
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for conn in connections.all():
+            if conn.vendor == "sqlite":
+                conn.settings_dict["TEST"]["NAME"] = (
+                    tmpdir + f"/{conn.alias}.sqlite3"
+                )
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            yield
+        finally:
+            teardown_databases(old_config, verbosity=0)
+
+
+@contextmanager
+def silence_output() -> Iterator[None]:
+    """Silence the logs of failed requests and the output of receivers.
+
+    The errors are summarized in the report of the command instead.
+    """
+    import io
+    import logging
+    from contextlib import redirect_stdout
+
+    logger = logging.getLogger("django.request")
+    disabled = logger.disabled
+    logger.disabled = True
+    try:
+        with redirect_stdout(io.StringIO()):
+            yield
+    finally:
+        logger.disabled = disabled
+
+
+class Command(BaseCommand):
+    """Django command to load-test the login flow."""
+
+    help = (
+        "Measure the logins per second with concurrent users and a local "
+        "stand-in for the Helmholtz AAI."
+    )
+
+    def add_arguments(self, parser):
+        """Add connection arguments to the parser."""
+        _add_arguments(parser)
+
+    def handle(
+        self,
+        *args,
+        users: int = 100,
+        concurrency: Optional[int] = None,
+        entitlements: int = 5,
+        vos: int = 50,
+        returning: float = 0.5,
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: Optional[int] = None,
+        use_existing_database: bool = False,
+        database: str = "default",
+        **options,
+    ):
+        """Run the load test."""
+        from contextlib import ExitStack
+
+        from django.db import connections
+        from django.test.utils import (
+            setup_test_environment,
+            teardown_test_environment,
+        )
+
+        from django_helmholtz_aai import app_settings, views
+        from django_helmholtz_aai.testing import StandInProvider
+
+        self.database = database
+        rng = random.Random(seed)
+        userinfos = self.get_userinfos(users, entitlements, vos, rng)
+        n_returning = int(round(returning * users))
+
+        is_sqlite = connections[database].vendor == "sqlite"
+        if concurrency is None:
+            concurrency = 1 if is_sqlite else 10
+        elif concurrency > 1 and is_sqlite:
+            self.stderr.write(
+                "SQLite only supports one writer at a time, so concurrent "
+                "logins fail with 'database is locked' errors. Use another "
+                "database for representative results."
+            )
+
+        provider = StandInProvider(seed=seed)
+        quiet = int(options.get("verbosity", 1)) < 2
+        try:
+            setup_test_environment()
+        except RuntimeError:  # we are in a test environment already
+            teardown = False
+        else:
+            teardown = True
+        client_kws = app_settings.HELMHOLTZ_CLIENT_KWS
+        try:
+            with ExitStack() as stack:
+                stack.enter_context(provider)
+                app_settings.HELMHOLTZ_CLIENT_KWS = provider.client_kws
+                if not use_existing_database:
+                    stack.enter_context(temporary_database())
+                if quiet:
+                    stack.enter_context(silence_output())
+                views.reset_oauth()
+                self.provider = provider
+
+                # create the accounts of the returning users
+                if n_returning:
+                    failed = sum(
+                        bool(res.error)
+                        for res in self.run_logins(
+                            userinfos[:n_returning], concurrency
+                        )
+                    )
+                    if failed:
+                        self.stderr.write(
+                            f"{failed} of {n_returning} returning users "
+                            "could not be created."
+                        )
+
+                # now simulate the users with the configured latency and
+                # failures
+                provider.latency = latency
+                provider.failure_rate = failure_rate
+                provider.requests = dict.fromkeys(provider.requests, 0)
+                rng.shuffle(userinfos)
+                t0 = time.perf_counter()
+                results = self.run_logins(userinfos, concurrency)
+                duration = time.perf_counter() - t0
+        finally:
+            app_settings.HELMHOLTZ_CLIENT_KWS = client_kws
+            views.reset_oauth()
+            if teardown:
+                teardown_test_environment()
+
+        self.report(results, duration, n_returning)
+
+    @staticmethod
+    def get_userinfos(
+        users: int, entitlements: int, vos: int, rng: random.Random
+    ) -> List[Dict[str, Any]]:
+        """Generate the userinfos of the simulated users."""
+        from django_helmholtz_aai.testing import make_userinfo
+
+        vo_names = [f"loadtest_VO_{i}" for i in range(vos)]
+        return [
+            make_userinfo(
+                f"loadtest-user-{i}",
+                rng.sample(vo_names, min(entitlements, vos)),
+            )
+            for i in range(users)
+        ]
+
+    def run_logins(
+        self, userinfos: List[Dict[str, Any]], concurrency: int
+    ) -> List[LoginResult]:
+        """Log in the users with `concurrency` threads."""
+        from django.db import connections
+
+        queue: Queue = Queue()
+        for userinfo in userinfos:
+            queue.put(userinfo)
+        results: List[LoginResult] = []
+
+        def worker():
+            try:
+                while True:
+                    try:
+                        userinfo = queue.get_nowait()
+                    except Empty:
+                        break
+                    results.append(self.simulate_login(userinfo))
+            finally:
+                connections.close_all()
+
+        threads = [
+            threading.Thread(target=worker) for i in range(max(1, concurrency))
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def simulate_login(self, userinfo: Dict[str, Any]) -> LoginResult:
+        """Send one user through the login and the authentification view."""
+        from django.db import connections
+        from django.test import Client
+        from django.urls import reverse
+
+        client = Client()
+        queries = 0
+
+        def count_queries(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        error: Optional[str] = None
+        t0 = time.perf_counter()
+        try:
+            with connections[self.database].execute_wrapper(count_queries):
+                response = client.get(
+                    get_client_path(reverse("django_helmholtz_aai:login"))
+                )
+                if response.status_code != 302:
+                    error = f"login view: HTTP {response.status_code}"
+                else:
+                    callback = self.provider.authorize(
+                        response["Location"], userinfo
+                    )
+                    response = client.get(get_client_path(callback))
+                    if response.status_code != 302:
+                        error = f"auth view: HTTP {response.status_code}"
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        duration = time.perf_counter() - t0
+        if error is None and "_auth_user_id" not in client.session:
+            error = "not logged in"
+        return LoginResult(duration, queries, error)
+
+    def report(
+        self, results: List[LoginResult], duration: float, n_returning: int
+    ):
+        """Print the statistics of the load test."""
+        total = len(results)
+        durations = [res.duration * 1000 for res in results]
+        queries = sum(res.queries for res in results)
+        errors = Counter(res.error for res in results if res.error)
+        n_errors = sum(errors.values())
+        write = self.stdout.write
+
+        write(
+            f"Logins:       {total} ({n_returning} returning users, "
+            f"{total - n_returning} new users)"
+        )
+        write(f"Duration:     {duration:.2f} s")
+        write(f"Throughput:   {total / duration:.1f} logins/s")
+        write(
+            "Latency (ms): "
+            + ", ".join(
+                f"p{q} {percentile(durations, q):.1f}" for q in [50, 95, 99]
+            )
+            + f", max {max(durations, default=0):.1f}"
+        )
+        write(
+            f"Queries:      {queries} ({queries / max(total, 1):.1f} per login)"
+        )
+        write(
+            "Provider:     "
+            + ", ".join(
+                f"{endpoint} {count}"
+                for endpoint, count in self.provider.requests.items()
+            )
+        )
+        style = self.style.ERROR if n_errors else self.style.SUCCESS
+        write(
+            style(
+                f"Errors:       {n_errors} "
+                f"({100 * n_errors / max(total, 1):.1f} %)"
+            )
+        )
+        for error, count in errors.most_common():
+            write(f"    {count:6d} {error}")
@@ -0,0 +1,237 @@
+"""Enforce the allowed virtual organizations
+------------------------------------------
+
+The :setting:`HELMHOLTZ_ALLOWED_VOS` are only checked when a user logs in.
+This command re-evaluates the setting for all Helmholtz AAI users based on
+their VOs in the database and logs out the users that are not member of any
+allowed VO anymore, e.g. after the list of allowed VOs has been tightened.
+
+The patterns are evaluated once per VO, and the users without an allowed VO
+are then selected and updated with a single query each. Users are logged out
+by deleting their sessions, which requires the
+:setting:`HELMHOLTZ_TRACK_SESSIONS` setting. Alternatively (or in addition),
+the users can be deactivated with the ``--deactivate`` option. Note that
+deactivated users cannot log in anymore until you activate them again, even
+if they join an allowed VO later.
+
+.. note::
+
+    Only the VOs that are stored in the database are considered. If you
+    restrict the stored VOs with the :setting:`HELMHOLTZ_VO_INCLUDE` or
+    :setting:`HELMHOLTZ_VO_EXCLUDE` settings, make sure that they contain
+    the allowed VOs.
+
+.. argparse::
+   :module: django_helmholtz_aai.management.commands.enforce_allowed_vos
+   :func: _dummy_parser
+   :prog: python manage.py enforce_allowed_vos
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import re
+from typing import TYPE_CHECKING, List
+
+from django.core.management.base import BaseCommand
+
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+
+
+def _dummy_parser():
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser()
+    _add_arguments(parser)
+    return parser
+
+
+def _add_arguments(parser):
+    parser.add_argument(
+        "-d",
+        "--deactivate",
+        action="store_true",
+        help=(
+            "Deactivate the users that are not member of an allowed VO. "
+            "Without this option, the users are only logged out."
+        ),
+    )
+
+    parser.add_argument(
+        "-n",
+        "--dry-run",
+        action="store_true",
+        help="Only print the number of users that would be logged out.",
+    )
+
+    parser.add_argument(
+        "-c",
+        "--chunk-size",
+        type=int,
+        default=2000,
+        help="Number of VOs to load at once, default: %(default)s",
+    )
+
+    parser.add_argument(
+        "-db",
+        "--database",
+        help=(
+            "The Django database identifier (see settings.py), "
+            "default: %(default)s"
+        ),
+        default="default",
+    )
+
+
+def get_allowed_vo_ids(
+    patterns: List[re.Pattern], using: str = "default", chunk_size: int = 2000
+) -> List[int]:
+    """Get the primary keys of the VOs that match one of the `patterns`.
+
+    The patterns are matched in Python with :meth:`re.Pattern.match`, as at
+    login, and not by the database, whose regular expressions differ.
+
+    Parameters
+    ----------
+    patterns: List[re.Pattern]
+        The compiled patterns, see :setting:`HELMHOLTZ_ALLOWED_VOS_REGEXP`
+    using: str
+        The database identifier
+    chunk_size: int
+        The number of VOs to load at once
+    """
+    from django_helmholtz_aai import models
+
+    vos = models.HelmholtzVirtualOrganization.objects.using(using)
+    return [
+        pk
+        for pk, entitlement in vos.values_list(
+            "pk", "eduperson_entitlement"
+        ).iterator(chunk_size=chunk_size)
+        if any(patt.match(entitlement) for patt in patterns)
+    ]
+
+
+def get_disallowed_users(
+    patterns: List[re.Pattern], using: str = "default", chunk_size: int = 2000
+) -> QuerySet:
+    """Get the users that are not member of a VO that matches `patterns`.
+
+    Parameters
+    ----------
+    patterns: List[re.Pattern]
+        The compiled patterns, see :setting:`HELMHOLTZ_ALLOWED_VOS_REGEXP`
+    using: str
+        The database identifier
+    chunk_size: int
+        The number of VOs to load at once
+
+    Returns
+    -------
+    QuerySet
+        A queryset of :class:`~django_helmholtz_aai.models.HelmholtzUser`
+    """
+    from django_helmholtz_aai import models
+
+    allowed = get_allowed_vo_ids(patterns, using, chunk_size)
+    return models.HelmholtzUser.objects.using(using).exclude(
+        groups__in=allowed
+    )
+
+
+class Command(BaseCommand):
+    """Django command to enforce the allowed VOs for existing users."""
+
+    help = (
+        "Log out (or deactivate) the Helmholtz AAI users that are not member "
+        "of an allowed VO anymore."
+    )
+
+    def add_arguments(self, parser):
+        """Add connection arguments to the parser."""
+        _add_arguments(parser)
+
+    def handle(
+        self,
+        *args,
+        deactivate: bool = False,
+        dry_run: bool = False,
+        chunk_size: int = 2000,
+        database: str = "default",
+        **options,
+    ):
+        """Log out the users that are not member of an allowed VO."""
+        from django.core.management.base import CommandError
+        from django.db import transaction
+
+        from django_helmholtz_aai import app_settings, sessions
+
+        patterns = app_settings.HELMHOLTZ_ALLOWED_VOS_REGEXP
+        if not patterns:
+            self.stdout.write(
+                "No HELMHOLTZ_ALLOWED_VOS configured, all users are allowed."
+            )
+            return
+        logout = app_settings.HELMHOLTZ_TRACK_SESSIONS
+        if not logout and not deactivate:
+            raise CommandError(
+                "Cannot log out users without HELMHOLTZ_TRACK_SESSIONS. "
+                "Enable this setting or use the --deactivate option."
+            )
+        if app_settings.HELMHOLTZ_VO_INCLUDE or (
+            app_settings.HELMHOLTZ_VO_EXCLUDE
+        ):
+            self.stderr.write(
+                "HELMHOLTZ_VO_INCLUDE or HELMHOLTZ_VO_EXCLUDE are set. Make "
+                "sure that they do not filter the allowed VOs, as only the "
+                "VOs in the database are considered."
+            )
+
+        users = get_disallowed_users(patterns, database, chunk_size)
+
+        if dry_run:
+            if int(options.get("verbosity", 1)) > 1:
+                for username in users.values_list(
+                    "username", flat=True
+                ).iterator():
+                    self.stdout.write(username)
+            self.stdout.write(
+                f"Found {users.count()} users without an allowed VO."
+            )
+            return
+
+        deactivated = deleted = 0
+        with transaction.atomic(using=database):
+            if deactivate:
+                deactivated = users.filter(is_active=True).update(
+                    is_active=False
+                )
+            if logout:
+                deleted = sessions.invalidate_sessions_for(
+                    users, using=database
+                )
+        self.stdout.write(
+            f"Deactivated {deactivated} users and deleted {deleted} sessions."
+        )
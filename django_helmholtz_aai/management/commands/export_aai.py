@@ -0,0 +1,216 @@
+"""Export the Helmholtz AAI users
+------------------------------
+
+This command exports the Helmholtz AAI users and their memberships in the
+virtual organizations, e.g. for reporting. It writes two files into the
+output directory:
+
+``users.<format>``
+    One record per Helmholtz AAI user with the ``id``, the
+    ``eduperson_unique_id`` and the account data
+``memberships.<format>``
+    One record per membership with the ``user_id`` and the
+    ``eduperson_entitlement`` of the virtual organization
+
+The rows are streamed from the database, so the memory usage does not depend
+on the number of users. Both files are exported within one transaction, such
+that they reflect the same state of the database. Exports to Parquet files require :mod:`pyarrow`.
+
+.. argparse::
+   :module: django_helmholtz_aai.management.commands.export_aai
+   :func: _dummy_parser
+   :prog: python manage.py export_aai
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import os
+import os.path as osp
+
+from django.core.management.base import BaseCommand, CommandError
+
+#: The fields of the users in the export
+USER_FIELDS = [
+    "pk",
+    "eduperson_unique_id",
+    "username",
+    "email",
+    "first_name",
+    "last_name",
+    "is_active",
+    "date_joined",
+    "last_login",
+]
+
+
+def _dummy_parser():
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser()
+    _add_arguments(parser)
+    return parser
+
+
+def _add_arguments(parser):
+    from django_helmholtz_aai.management.records import WRITE_FORMATS
+
+    parser.add_argument(
+        "-o",
+        "--output-dir",
+        default=".",
+        help="The directory for the exported files, default: %(default)s",
+    )
+
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=WRITE_FORMATS,
+        default="jsonl",
+        help="The format of the exported files, default: %(default)s",
+    )
+
+    parser.add_argument(
+        "-p",
+        "--prefix",
+        default="",
+        help="A prefix for the names of the exported files.",
+    )
+
+    parser.add_argument(
+        "-c",
+        "--chunk-size",
+        type=int,
+        default=2000,
+        help=(
+            "Number of rows to fetch from the database at once, "
+            "default: %(default)s"
+        ),
+    )
+
+    parser.add_argument(
+        "-db",
+        "--database",
+        help=(
+            "The Django database identifier (see settings.py), "
+            "default: %(default)s"
+        ),
+        default="default",
+    )
+
+
+class Command(BaseCommand):
+    """Django command to export the Helmholtz AAI users."""
+
+    help = "Export the Helmholtz AAI users and their VO memberships."
+
+    def add_arguments(self, parser):
+        """Add connection arguments to the parser."""
+        _add_arguments(parser)
+
+    def handle(
+        self,
+        *args,
+        output_dir: str = ".",
+        format: str = "jsonl",
+        prefix: str = "",
+        chunk_size: int = 2000,
+        database: str = "default",
+        **options,
+    ):
+        """Export the users and memberships."""
+        from django.contrib.auth import get_user_model
+        from django.db import connections, transaction
+
+        from django_helmholtz_aai import models
+        from django_helmholtz_aai.management.records import (
+            get_field_types,
+            write_rows,
+        )
+
+        os.makedirs(output_dir, exist_ok=True)
+
+        def get_path(name: str) -> str:
+            return osp.join(output_dir, f"{prefix}{name}.{format}")
+
+        users = models.HelmholtzUser.objects.using(database).order_by("pk")
+
+        field = get_user_model().groups.field
+        user_field = field.m2m_field_name()
+        group_field = field.m2m_reverse_field_name()
+        vo_field = (
+            group_field
+            + "__helmholtzvirtualorganization__eduperson_entitlement"
+        )
+        through = field.remote_field.through
+        memberships = (
+            through._default_manager.using(database)
+            .filter(
+                **{
+                    user_field + "__helmholtzuser__isnull": False,
+                    vo_field + "__isnull": False,
+                }
+            )
+            .order_by("pk")
+        )
+
+        exports = [
+            (
+                "users",
+                ["id"] + USER_FIELDS[1:],
+                users,
+                USER_FIELDS,
+            ),
+            (
+                "memberships",
+                ["user_id", "eduperson_entitlement"],
+                memberships,
+                [user_field, vo_field],
+            ),
+        ]
+
+        # export the users and memberships from the same snapshot
+        with transaction.atomic(using=database):
+            connection = connections[database]
+            if connection.vendor == "postgresql":
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ "
+                        "READ ONLY"
+                    )
+            for name, fieldnames, queryset, lookups in exports:
+                path = get_path(name)
+                rows = queryset.values_list(*lookups).iterator(chunk_size)
+                try:
+                    n = write_rows(
+                        path,
+                        fieldnames,
+                        rows,
+                        format,
+                        chunk_size=chunk_size,
+                        field_types=get_field_types(queryset.model, lookups),
+                    )
+                except ImportError as e:
+                    raise CommandError(str(e))
+                self.stdout.write(f"Exported {n} {name} to {path}")
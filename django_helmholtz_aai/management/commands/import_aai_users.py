@@ -0,0 +1,384 @@
+"""Import users from the Helmholtz AAI
+------------------------------------
+
+This command creates Helmholtz AAI users and their memberships in the virtual
+organizations in advance, e.g. before an event with many first logins.
+
+The input is a JSONL file with one userinfo of the Helmholtz AAI per line
+(as it is returned by the userinfo endpoint), or a CSV file with the same
+keys as columns. In a CSV file, the ``eduperson_entitlement`` column
+contains the entitlements separated by whitespace.
+
+The file is processed in batches, so the memory usage does not depend on the
+size of the file. The users are checked as at their first login: Records for
+existing Helmholtz AAI users, with unverified emails, with emails that
+already exist (unless :setting:`HELMHOLTZ_EMAIL_DUPLICATES_ALLOWED`) or
+without a VO of the :setting:`HELMHOLTZ_ALLOWED_VOS_REGEXP` are skipped.
+
+By default, the signals of the :mod:`django_helmholtz_aai.signals` module are
+not sent. Use the ``--send-signals`` option to send them with
+``request=None``.
+
+.. argparse::
+   :module: django_helmholtz_aai.management.commands.import_aai_users
+   :func: _dummy_parser
+   :prog: python manage.py import_aai_users
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import time
+from collections import Counter
+from itertools import product
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+from django.core.management.base import BaseCommand
+
+if TYPE_CHECKING:
+    from django_helmholtz_aai import models
+
+
+def _dummy_parser():
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser()
+    _add_arguments(parser)
+    return parser
+
+
+def _add_arguments(parser):
+    from django_helmholtz_aai.management.records import FORMATS
+
+    parser.add_argument(
+        "input_file",
+        help=(
+            "The JSONL or CSV file with the userinfo records. Use '-' to read "
+            "from stdin."
+        ),
+    )
+
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=FORMATS,
+        help="The format of the input file. Default: Use the file extension.",
+    )
+
+    parser.add_argument(
+        "-b",
+        "--batch-size",
+        type=int,
+        default=500,
+        help="Number of records to import at once, default: %(default)s",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        help=(
+            "Number of processes to parse the lines of a JSONL file. Default: "
+            "Parse the file in the main process."
+        ),
+    )
+
+    parser.add_argument(
+        "--send-signals",
+        action="store_true",
+        help=(
+            "Send the aai_user_created, aai_vo_created and aai_vo_entered "
+            "signals."
+        ),
+    )
+
+    parser.add_argument(
+        "-db",
+        "--database",
+        help=(
+            "The Django database identifier (see settings.py), "
+            "default: %(default)s"
+        ),
+        default="default",
+    )
+
+
+class Command(BaseCommand):
+    """Django command to import users from the Helmholtz AAI."""
+
+    help = (
+        "Create Helmholtz AAI users and their virtual organizations from a "
+        "file of userinfo records."
+    )
+
+    #: Keys that are required in every record
+    required_keys = [
+        "eduperson_unique_id",
+        "email",
+        "given_name",
+        "family_name",
+    ]
+
+    def add_arguments(self, parser):
+        """Add connection arguments to the parser."""
+        _add_arguments(parser)
+
+    def handle(
+        self,
+        input_file: str,
+        *args,
+        format: Optional[str] = None,
+        batch_size: int = 500,
+        jobs: Optional[int] = None,
+        send_signals: bool = False,
+        database: str = "default",
+        **options,
+    ):
+        """Import the users of the `input_file`."""
+        from django_helmholtz_aai.management.records import read_record_chunks
+
+        self.database = database
+        self.send_signals = send_signals
+        self.stats: Counter = Counter()
+
+        start = time.perf_counter()
+        for records in read_record_chunks(
+            input_file, batch_size, format, processes=jobs
+        ):
+            self.import_batch([self.clean(record) for record in records])
+            if options.get("verbosity", 1) > 1:
+                self.stdout.write(self.format_stats(start))
+
+        self.stdout.write(self.style.SUCCESS(self.format_stats(start)))
+        skipped = {
+            key[len("skipped_") :]: val
+            for key, val in self.stats.items()
+            if key.startswith("skipped_")
+        }
+        if skipped:
+            self.stdout.write(
+                self.style.WARNING(
+                    "Skipped records: "
+                    + ", ".join(f"{val} {key}" for key, val in skipped.items())
+                )
+            )
+
+    def format_stats(self, start: float) -> str:
+        """Format the statistics of the import."""
+        stats = self.stats
+        seconds = time.perf_counter() - start
+        return (
+            f"Imported {stats['users']} users with {stats['memberships']} "
+            f"memberships and {stats['vos']} new VOs from {stats['records']} "
+            f"records in {seconds:.1f} s "
+            f"({stats['records'] / max(seconds, 1e-9):.0f} records/s)"
+        )
+
+    @staticmethod
+    def clean(record: Dict[str, Any]) -> Dict[str, Any]:
+        """Convert the values of a CSV record."""
+        vos = record.get("eduperson_entitlement") or []
+        if isinstance(vos, str):
+            record["eduperson_entitlement"] = vos.split()
+        verified = record.get("email_verified", True)
+        if isinstance(verified, str):
+            record["email_verified"] = verified.lower() in ["true", "1", "yes"]
+        return record
+
+    def get_skip_reason(self, userinfo: Dict[str, Any]) -> Optional[str]:
+        """Check if a user may not be created.
+
+        The checks are the same as in
+        :meth:`~django_helmholtz_aai.views.HelmholtzAuthentificationView.has_permission`,
+        except for the existing users and emails that are checked for the
+        entire batch in :meth:`import_batch`.
+        """
+        from django_helmholtz_aai import app_settings
+
+        if not all(userinfo.get(key) for key in self.required_keys) or not any(
+            userinfo.get(key) for key in app_settings.HELMHOLTZ_USERNAME_FIELDS
+        ):
+            return "invalid"
+        if not userinfo.get("email_verified", True):
+            return "email_not_verified"
+        if app_settings.HELMHOLTZ_ALLOWED_VOS_REGEXP and not any(
+            patt.match(vo)
+            for patt, vo in product(
+                app_settings.HELMHOLTZ_ALLOWED_VOS_REGEXP,
+                userinfo["eduperson_entitlement"],
+            )
+        ):
+            return "vo_not_allowed"
+        return None
+
+    def import_batch(self, userinfos: List[Dict[str, Any]]):
+        """Create the users and memberships of one batch of records."""
+        from django.db import transaction
+        from django.db.models.functions import Lower
+
+        from django_helmholtz_aai import app_settings, models
+
+        stats = self.stats
+        stats["records"] += len(userinfos)
+
+        valid = []
+        for userinfo in userinfos:
+            reason = self.get_skip_reason(userinfo)
+            if reason:
+                stats["skipped_" + reason] += 1
+            else:
+                valid.append(userinfo)
+
+        aai_users = models.HelmholtzUser.objects.db_manager(self.database)
+
+        existing = set(
+            aai_users.filter(
+                eduperson_unique_id__in=[
+                    u["eduperson_unique_id"] for u in valid
+                ]
+            ).values_list("eduperson_unique_id", flat=True)
+        )
+        if app_settings.HELMHOLTZ_EMAIL_DUPLICATES_ALLOWED:
+            emails = set()
+        else:
+            emails = set(
+                aai_users.annotate(email_lower=Lower("email"))
+                .filter(email_lower__in=[u["email"].lower() for u in valid])
+                .values_list("email_lower", flat=True)
+            )
+
+        to_create = []
+        for userinfo in valid:
+            unique_id = userinfo["eduperson_unique_id"]
+            email = userinfo["email"].lower()
+            if unique_id in existing:
+                stats["skipped_existing"] += 1
+            elif email in emails:
+                stats["skipped_email_exists"] += 1
+            else:
+                existing.add(unique_id)
+                emails.add(email)
+                to_create.append(userinfo)
+
+        if not to_create:
+            return
+
+        with transaction.atomic(using=self.database):
+            users = aai_users.bulk_create_aai_users(to_create)
+            user_vos, vos, created = self.create_memberships(users, to_create)
+
+        stats["users"] += len(users)
+        if self.send_signals:
+            self.send_user_signals(users, to_create, user_vos, vos, created)
+
+    def create_memberships(
+        self,
+        users: List[models.HelmholtzUser],
+        userinfos: List[Dict[str, Any]],
+    ) -> Tuple[
+        List[List[str]],
+        Dict[str, models.HelmholtzVirtualOrganization],
+        List[str],
+    ]:
+        """Add the new `users` to their VOs.
+
+        Returns
+        -------
+        List[List[str]]
+            The entitlements of the VOs of each user
+        Dict[str, HelmholtzVirtualOrganization]
+            The VOs of the users
+        List[str]
+            The entitlements of the VOs that have been created
+        """
+        from django.contrib.auth import get_user_model
+
+        from django_helmholtz_aai import entitlements, models
+
+        vo_filter = entitlements.get_vo_filter()
+        user_vos = [
+            list(dict.fromkeys(filter(vo_filter, u["eduperson_entitlement"])))
+            for u in userinfos
+        ]
+        vo_manager = models.HelmholtzVirtualOrganization.objects.db_manager(
+            self.database
+        )
+        vos, created = vo_manager.get_or_create_many(
+            vo for vo_names in user_vos for vo in vo_names
+        )
+        self.stats["vos"] += len(created)
+
+        vo_manager.filter(
+            pk__in=[vo.pk for vo in vos.values() if vo.tombstoned_at]
+        ).revive()
+
+        field = get_user_model().groups.field
+        user_key = field.m2m_column_name()
+        group_key = field.m2m_reverse_name()
+        through = field.remote_field.through
+        memberships = [
+            through(**{user_key: user.pk, group_key: vos[vo].pk})
+            for user, vo_names in zip(users, user_vos)
+            for vo in vo_names
+        ]
+        through._default_manager.using(self.database).bulk_create(
+            memberships, ignore_conflicts=True
+        )
+        self.stats["memberships"] += len(memberships)
+        return user_vos, vos, created
+
+    def send_user_signals(
+        self,
+        users: List[models.HelmholtzUser],
+        userinfos: List[Dict[str, Any]],
+        user_vos: List[List[str]],
+        vos: Dict[str, models.HelmholtzVirtualOrganization],
+        created: List[str],
+    ):
+        """Send the signals for the created users, VOs and memberships."""
+        from django_helmholtz_aai import models, signals
+
+        vo_class = models.HelmholtzVirtualOrganization
+        created_vos = set(created)
+        for user, userinfo, vo_names in zip(users, userinfos, user_vos):
+            signals.aai_user_created.send(
+                sender=user.__class__,
+                user=user,
+                request=None,
+                userinfo=userinfo,
+            )
+            for vo_name in vo_names:
+                vo = vos[vo_name]
+                if vo_name in created_vos:
+                    created_vos.remove(vo_name)
+                    signals.aai_vo_created.send(
+                        sender=vo_class, request=None, vo=vo, userinfo=userinfo
+                    )
+                signals.aai_vo_entered.send(
+                    sender=vo_class,
+                    request=None,
+                    user=user,
+                    vo=vo,
+                    userinfo=userinfo,
+                )
@@ -0,0 +1,193 @@
+"""Map existing accounts to the Helmholtz AAI
+-------------------------------------------
+
+This command creates the Helmholtz AAI users for existing django users in
+bulk, as it is done with the first login when the
+:setting:`HELMHOLTZ_MAP_ACCOUNTS` setting is enabled.
+
+The input is a CSV or JSONL file with the ``email`` and the
+``eduperson_unique_id`` of the users, e.g.::
+
+    email,eduperson_unique_id
+    user@example.com,0123456789abcdef@login.helmholtz.de
+
+Users whose email is not unique on the website, and users that are already
+Helmholtz AAI users, are skipped.
+
+.. argparse::
+   :module: django_helmholtz_aai.management.commands.map_aai_accounts
+   :func: _dummy_parser
+   :prog: python manage.py map_aai_accounts
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Optional
+
+from django.core.management.base import BaseCommand
+
+
+def _dummy_parser():
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser()
+    _add_arguments(parser)
+    return parser
+
+
+def _add_arguments(parser):
+    from django_helmholtz_aai.management.records import FORMATS
+
+    parser.add_argument(
+        "input_file",
+        help=(
+            "The CSV or JSONL file with the email and eduperson_unique_id of "
+            "the users. Use '-' to read from stdin."
+        ),
+    )
+
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=FORMATS,
+        help="The format of the input file. Default: Use the file extension.",
+    )
+
+    parser.add_argument(
+        "-n",
+        "--dry-run",
+        action="store_true",
+        help="Only print how many accounts would be mapped.",
+    )
+
+    parser.add_argument(
+        "-c",
+        "--chunk-size",
+        type=int,
+        default=1000,
+        help="Number of records to process at once, default: %(default)s",
+    )
+
+    parser.add_argument(
+        "-db",
+        "--database",
+        help=(
+            "The Django database identifier (see settings.py), "
+            "default: %(default)s"
+        ),
+        default="default",
+    )
+
+
+class Command(BaseCommand):
+    """Django command to map existing accounts to the Helmholtz AAI."""
+
+    help = (
+        "Create Helmholtz AAI users for existing users from a list of emails "
+        "and eduperson_unique_ids."
+    )
+
+    def add_arguments(self, parser):
+        """Add connection arguments to the parser."""
+        _add_arguments(parser)
+
+    def handle(
+        self,
+        input_file: str,
+        *args,
+        format: Optional[str] = None,
+        database: str = "default",
+        dry_run: bool = False,
+        chunk_size: int = 1000,
+        **options,
+    ):
+        """Map the accounts in the `input_file`."""
+        from django.contrib.auth import get_user_model
+        from django.db import transaction
+        from django.db.models.functions import Lower
+
+        from django_helmholtz_aai import models
+        from django_helmholtz_aai.management.records import (
+            chunked,
+            read_records,
+        )
+
+        User = get_user_model()
+        users = User.objects.using(database).annotate(
+            email_lower=Lower("email")
+        )
+        aai_users = models.HelmholtzUser.objects.db_manager(database)
+
+        mapped = 0
+        ambiguous = 0
+
+        for records in chunked(read_records(input_file, format), chunk_size):
+            unique_ids = {
+                record["email"].lower(): record["eduperson_unique_id"]
+                for record in records
+                if record.get("email") and record.get("eduperson_unique_id")
+            }
+            existing = set(
+                aai_users.filter(
+                    eduperson_unique_id__in=unique_ids.values()
+                ).values_list("eduperson_unique_id", flat=True)
+            )
+            pks = defaultdict(list)
+            for pk, email in users.filter(
+                email_lower__in=[
+                    email
+                    for email, unique_id in unique_ids.items()
+                    if unique_id not in existing
+                ],
+                helmholtzuser__isnull=True,
+            ).values_list("pk", "email_lower"):
+                pks[email].append(pk)
+
+            to_create = {}
+            for email, user_pks in pks.items():
+                if len(user_pks) > 1:
+                    ambiguous += 1
+                    self.stderr.write(f"Skipping ambiguous email {email}")
+                elif unique_ids[email] not in existing:
+                    to_create[user_pks[0]] = unique_ids[email]
+                    existing.add(unique_ids[email])
+
+            if not dry_run:
+                with transaction.atomic(using=database):
+                    aai_users.bulk_create_for_users(to_create)
+            mapped += len(to_create)
+
+        if dry_run:
+            self.stdout.write(f"Would map {mapped} accounts.")
+        else:
+            self.stdout.write(self.style.SUCCESS(f"Mapped {mapped} accounts."))
+        if ambiguous:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Skipped {ambiguous} emails that belong to multiple "
+                    "users."
+                )
+            )
@@ -0,0 +1,120 @@
+"""Prune filtered virtual organizations
+-------------------------------------
+
+This command can be used to remove the virtual organizations that do not pass
+the :setting:`HELMHOLTZ_VO_INCLUDE` and :setting:`HELMHOLTZ_VO_EXCLUDE`
+settings anymore.
+
+.. argparse::
+   :module: django_helmholtz_aai.management.commands.prune_filtered_vos
+   :func: _dummy_parser
+   :prog: python manage.py prune_filtered_vos
+"""
+from __future__ import annotations
+
+from django.core.management.base import BaseCommand
+
+
+def _dummy_parser():
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser()
+    _add_arguments(parser)
+    return parser
+
+
+def _add_arguments(parser):
+    parser.add_argument(
+        "-y",
+        "--yes",
+        action="store_true",
+        dest="without_confirmation",
+        help="Remove the VOs without asking for confirmation.",
+    )
+
+    parser.add_argument(
+        "-n",
+        "--dry-run",
+        action="store_true",
+        help="Only print the VOs that would be removed.",
+    )
+
+    parser.add_argument(
+        "-c",
+        "--chunk-size",
+        type=int,
+        default=500,
+        help="Number of VOs to delete at once, default: %(default)s",
+    )
+
+    parser.add_argument(
+        "-db",
+        "--database",
+        help=(
+            "The Django database identifier (see settings.py), "
+            "default: %(default)s"
+        ),
+        default="default",
+    )
+
+
+class Command(BaseCommand):
+    """Django command to prune filtered VOs."""
+
+    help = (
+        "Remove virtual organizations of the helmholtz AAI that do not pass "
+        "the HELMHOLTZ_VO_INCLUDE and HELMHOLTZ_VO_EXCLUDE settings."
+    )
+
+    def add_arguments(self, parser):
+        """Add connection arguments to the parser."""
+        _add_arguments(parser)
+
+    def handle(
+        self,
+        *args,
+        database: str = "default",
+        without_confirmation: bool = False,
+        dry_run: bool = False,
+        chunk_size: int = 500,
+        **options,
+    ):
+        """Remove the filtered VOs."""
+        from django_helmholtz_aai import entitlements, models
+
+        vo_filter = entitlements.get_vo_filter()
+        vos = models.HelmholtzVirtualOrganization.objects.using(database)
+
+        to_remove = [
+            (pk, entitlement)
+            for pk, entitlement in vos.values_list(
+                "pk", "eduperson_entitlement"
+            ).iterator()
+            if not vo_filter(entitlement)
+        ]
+
+        if not to_remove:
+            self.stdout.write("No virtual organizations to remove.")
+            return
+
+        for pk, entitlement in to_remove:
+            self.stdout.write(entitlement)
+
+        if dry_run:
+            return
+
+        if not without_confirmation:
+            answer = ""
+            while answer not in ["y", "n"]:
+                answer = input(
+                    f"Remove these {len(to_remove)} VOs? [y/n]"
+                ).lower()
+            if answer == "n":
+                return
+
+        pks = [pk for pk, entitlement in to_remove]
+        for i in range(0, len(pks), chunk_size):
+            vos.filter(pk__in=pks[i : i + chunk_size]).delete()
+        self.stdout.write(
+            self.style.SUCCESS(f"Removed {len(pks)} virtual organizations.")
+        )
@@ -0,0 +1,361 @@
+"""Purge stale Helmholtz AAI users
+--------------------------------
+
+This command deletes (or anonymizes) the Helmholtz AAI users that did not log
+in for a long time, e.g.::
+
+    python manage.py purge_stale_aai_users --older-than 730
+
+removes the users whose last login (or, if they never logged in, whose
+registration) is older than two years. Staff users and superusers are kept
+unless you pass ``--include-staff``.
+
+The users are processed in chunks of a fixed size, each in its own
+transaction. Instead of loading every user through Django's deletion
+collector, the rows that refer to the users are removed per relation and the
+users themselves with raw deletes of the child and parent tables. Therefore
+the ``pre_delete`` and ``post_delete`` signals are not sent for the users.
+Use ``--send-signals`` if you rely on them. The VOs of the purged users are
+flagged for the ``--incremental`` mode of the
+:mod:`~django_helmholtz_aai.management.commands.remove_empty_vos` command.
+
+With ``--anonymize``, the users are kept, but their personal data, their
+memberships and their sessions are removed and they are deactivated.
+
+.. note::
+
+    Django does not index the ``last_login`` column of the user model. For a
+    large number of users, you should add an index on this column in your
+    database, see :ref:`stale-users`.
+
+.. argparse::
+   :module: django_helmholtz_aai.management.commands.purge_stale_aai_users
+   :func: _dummy_parser
+   :prog: python manage.py purge_stale_aai_users
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import TYPE_CHECKING, List
+
+from django.core.management.base import BaseCommand
+
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+
+#: Prefix for the username and the ``eduperson_unique_id`` of anonymized
+#: users
+ANONYMIZED_PREFIX = "anonymized-"
+
+
+def _dummy_parser():
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser()
+    _add_arguments(parser)
+    return parser
+
+
+def _add_arguments(parser):
+    parser.add_argument(
+        "-o",
+        "--older-than",
+        type=int,
+        required=True,
+        metavar="DAYS",
+        help="Purge the users that did not log in for this number of days.",
+    )
+
+    parser.add_argument(
+        "-a",
+        "--anonymize",
+        action="store_true",
+        help="Anonymize and deactivate the users instead of deleting them.",
+    )
+
+    parser.add_argument(
+        "--include-staff",
+        action="store_true",
+        help="Also purge staff users and superusers.",
+    )
+
+    parser.add_argument(
+        "--send-signals",
+        action="store_true",
+        help=(
+            "Delete the users with Django's deletion collector to send the "
+            "pre_delete and post_delete signals. This is considerably slower."
+        ),
+    )
+
+    parser.add_argument(
+        "-y",
+        "--yes",
+        action="store_true",
+        dest="without_confirmation",
+        help="Purge the users without asking for confirmation.",
+    )
+
+    parser.add_argument(
+        "-n",
+        "--dry-run",
+        action="store_true",
+        help="Only print the number of users that would be purged.",
+    )
+
+    parser.add_argument(
+        "-c",
+        "--chunk-size",
+        type=int,
+        default=1000,
+        help="Number of users to purge per transaction, default: %(default)s",
+    )
+
+    parser.add_argument(
+        "-db",
+        "--database",
+        help=(
+            "The Django database identifier (see settings.py), "
+            "default: %(default)s"
+        ),
+        default="default",
+    )
+
+
+def get_stale_users(
+    days: int, include_staff: bool = False, using: str = "default"
+) -> QuerySet:
+    """Get the users that did not log in for the given number of `days`.
+
+    Users that never logged in are selected by their ``date_joined``.
+    Anonymized users are not included.
+
+    Returns
+    -------
+    QuerySet
+        A queryset of :class:`~django_helmholtz_aai.models.HelmholtzUser`
+    """
+    from django.db.models import Q
+    from django.utils import timezone
+
+    from django_helmholtz_aai import models
+
+    cutoff = timezone.now() - timedelta(days=days)
+    users = models.HelmholtzUser.objects.using(using).filter(
+        Q(last_login__lt=cutoff)
+        | Q(last_login__isnull=True, date_joined__lt=cutoff)
+    )
+    if not include_staff:
+        users = users.filter(is_staff=False, is_superuser=False)
+    return users.exclude(eduperson_unique_id__startswith=ANONYMIZED_PREFIX)
+
+
+class Command(BaseCommand):
+    """Django command to purge stale Helmholtz AAI users."""
+
+    help = "Delete or anonymize Helmholtz AAI users that did not log in."
+
+    def add_arguments(self, parser):
+        """Add connection arguments to the parser."""
+        _add_arguments(parser)
+
+    def handle(
+        self,
+        *args,
+        older_than: int,
+        anonymize: bool = False,
+        include_staff: bool = False,
+        send_signals: bool = False,
+        without_confirmation: bool = False,
+        dry_run: bool = False,
+        chunk_size: int = 1000,
+        database: str = "default",
+        **options,
+    ):
+        """Purge the users that did not log in for `older_than` days."""
+        from django.db import transaction
+
+        self.database = database
+        users = get_stale_users(older_than, include_staff, database)
+        action = "anonymize" if anonymize else "delete"
+
+        total = users.count()
+        if not total:
+            self.stdout.write("No stale users found.")
+            return
+        if dry_run:
+            self.stdout.write(f"Would {action} {total} users.")
+            return
+
+        if not without_confirmation:
+            answer = ""
+            while answer not in ["y", "n"]:
+                answer = input(f"{action.capitalize()} {total} users? [y/n]")
+                answer = answer.lower()
+            if answer == "n":
+                return
+
+        if anonymize:
+            purge = self.anonymize_users
+        elif send_signals or not self.can_fast_delete():
+            purge = self.collect_users
+        else:
+            purge = self.delete_users
+
+        purged = 0
+        while True:
+            # the purged users do not match anymore, so we always take the
+            # first chunk
+            pks: List[int] = list(
+                users.values_list("pk", flat=True)[:chunk_size]
+            )
+            if not pks:
+                break
+            with transaction.atomic(using=database):
+                self.prepare_purge(pks)
+                purge(pks)
+            purged += len(pks)
+            if int(options.get("verbosity", 1)) > 1:
+                self.stdout.write(f"Purged {purged} of {total} users.")
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                ("Anonymized" if anonymize else "Deleted")
+                + f" {purged} users."
+            )
+        )
+
+    @staticmethod
+    def get_relations():
+        """Get the relations of other models to the Helmholtz AAI users.
+
+        The parent links between the Helmholtz AAI user and its parent models
+        are not included.
+        """
+        from django_helmholtz_aai import models
+
+        user_models = [models.HelmholtzUser]
+        user_models += models.HelmholtzUser._meta.get_parent_list()
+        relations = {}
+        for model in user_models:
+            for rel in model._meta.related_objects:
+                if rel.related_model in user_models:
+                    continue
+                relations[(rel.related_model, rel.field.name)] = rel
+        return list(relations.values())
+
+    def can_fast_delete(self) -> bool:
+        """Test if we can delete the users without the deletion collector."""
+        from django.db.models import CASCADE, DO_NOTHING, SET_NULL
+
+        return all(
+            rel.many_to_many
+            or rel.on_delete in [CASCADE, DO_NOTHING, SET_NULL]
+            for rel in self.get_relations()
+        )
+
+    def prepare_purge(self, pks: List[int]):
+        """Flag the VOs of the users and log them out."""
+        from django_helmholtz_aai import membership, models, sessions
+
+        models.HelmholtzVirtualOrganization.objects.using(
+            self.database
+        ).filter(user__in=pks).mark_possibly_empty()
+        membership.invalidate_memberships(pks, using=self.database)
+        sessions.invalidate_sessions_for(pks, using=self.database)
+
+    def delete_memberships(self, pks: List[int]):
+        """Delete the rows of the many-to-many fields of the users."""
+        from django_helmholtz_aai import models
+
+        for field in models.HelmholtzUser._meta.many_to_many:
+            through = field.remote_field.through
+            through._base_manager.using(self.database).filter(
+                **{f"{field.m2m_field_name()}__in": pks}
+            )._raw_delete(self.database)
+
+    def delete_users(self, pks: List[int]):
+        """Delete the users without loading them."""
+        from django.db.models import CASCADE, SET_NULL
+
+        from django_helmholtz_aai import models
+
+        db = self.database
+        self.delete_memberships(pks)
+        for rel in self.get_relations():
+            if rel.many_to_many:
+                rel.through._base_manager.using(db).filter(
+                    **{f"{rel.field.m2m_reverse_field_name()}__in": pks}
+                )._raw_delete(db)
+                continue
+            related = rel.related_model._base_manager.using(db).filter(
+                **{f"{rel.field.name}__in": pks}
+            )
+            if rel.on_delete is CASCADE:
+                # the collector only loads the objects if necessary
+                related.delete()
+            elif rel.on_delete is SET_NULL:
+                related.update(**{rel.field.name: None})
+
+        models.HelmholtzUser._base_manager.using(db).filter(
+            pk__in=pks
+        )._raw_delete(db)
+        for parent in models.HelmholtzUser._meta.get_parent_list():
+            parent._base_manager.using(db).filter(pk__in=pks)._raw_delete(db)
+
+    def collect_users(self, pks: List[int]):
+        """Delete the users with Django's deletion collector."""
+        from django_helmholtz_aai import models
+
+        models.HelmholtzUser._base_manager.using(self.database).filter(
+            pk__in=pks
+        ).delete()
+
+    def anonymize_users(self, pks: List[int]):
+        """Remove the personal data of the users and deactivate them."""
+        from django.contrib.auth import get_user_model
+        from django.contrib.auth.hashers import make_password
+        from django.db.models import CharField, Value
+        from django.db.models.functions import Cast, Concat
+
+        from django_helmholtz_aai import models
+
+        db = self.database
+        anonymous_id = Concat(
+            Value(ANONYMIZED_PREFIX), Cast("pk", output_field=CharField())
+        )
+        self.delete_memberships(pks)
+        get_user_model()._base_manager.using(db).filter(pk__in=pks).update(
+            username=anonymous_id,
+            first_name="",
+            last_name="",
+            email="",
+            password=make_password(None),
+            is_active=False,
+        )
+        models.HelmholtzUser._base_manager.using(db).filter(pk__in=pks).update(
+            eduperson_unique_id=anonymous_id
+        )
@@ -10,6 +10,8 @@ This command can be used to automatically remove empty virtual organizations.
 """
 from __future__ import annotations
 
+from typing import Optional
+
 from django.core.management.base import BaseCommand
 
 
@@ -41,6 +43,27 @@ def _add_arguments(parser):
         help="Remove the VOs without asking for confirmation.",
     )
 
+    parser.add_argument(
+        "-i",
+        "--incremental",
+        action="store_true",
+        help=(
+            "Only check the VOs that might have become empty since the last "
+            "run, e.g. because their last member left."
+        ),
+    )
+
+    parser.add_argument(
+        "-g",
+        "--grace-period",
+        type=float,
+        help=(
+            "Number of seconds that empty VOs are kept as tombstones before "
+            "they are deleted. Use 0 to delete them immediately. By default, "
+            "we use the HELMHOLTZ_VO_TOMBSTONE_GRACE_PERIOD setting."
+        ),
+    )
+
     parser.add_argument(
         "-db",
         "--database",
@@ -67,6 +90,8 @@ class Command(BaseCommand):
         database: str = "default",
         exclude: list[str] = [],
         without_confirmation: bool = False,
+        incremental: bool = False,
+        grace_period: Optional[float] = None,
         **options,
     ):
         """Migrate the database."""
@@ -75,5 +100,8 @@ class Command(BaseCommand):
         models.HelmholtzVirtualOrganization.objects.using(
             database
         ).remove_empty_vos(
-            exclude=exclude, without_confirmation=without_confirmation
+            exclude=exclude,
+            without_confirmation=without_confirmation,
+            incremental=incremental,
+            grace_period=grace_period,
         )
@@ -0,0 +1,473 @@
+"""Synchronize the members of virtual organizations
+-------------------------------------------------
+
+This command reconciles the memberships in the virtual organizations with a
+dump of the member lists of the VOs, e.g. as it can be obtained from the
+group management of the Helmholtz AAI. Without this command, memberships only
+change when a user logs in.
+
+The input is either a JSONL file with one record per VO, e.g.::
+
+    {"eduperson_entitlement": "urn:geant:helmholtz.de:group:some_VO#login.helmholtz.de", "members": ["0123456789abcdef@login.helmholtz.de"]}
+
+or a CSV file with one row per membership and the columns
+``eduperson_entitlement`` and ``eduperson_unique_id``. The dump is
+authoritative for the VOs that it contains: Existing Helmholtz AAI users that
+are listed are added to the VO, all other Helmholtz AAI users are removed from
+it. VOs that are not contained in the dump or do not pass the
+:setting:`HELMHOLTZ_VO_INCLUDE` and :setting:`HELMHOLTZ_VO_EXCLUDE` settings
+are not touched. Members that do not have an account on the website are
+ignored.
+
+The dump is loaded into temporary tables and the changes are computed in the
+database. The changes are then streamed in chunks, so that the memory usage
+does not grow with the number of changes. Instead of the
+:signal:`aai_vo_entered` and :signal:`aai_vo_left` signals per user, the
+:signal:`aai_vo_members_added` and :signal:`aai_vo_members_removed` signals
+are sent once per VO and chunk of changes (see the ``--chunk-size`` option)
+after the changes have been committed.
+
+.. argparse::
+   :module: django_helmholtz_aai.management.commands.sync_vo_members
+   :func: _dummy_parser
+   :prog: python manage.py sync_vo_members
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.core.management.base import BaseCommand
+
+#: Name of the temporary table for the VOs of the dump
+VOS_TABLE = "helmholtz_aai_sync_vos"
+
+#: Name of the temporary table for the memberships of the dump
+MEMBERS_TABLE = "helmholtz_aai_sync_members"
+
+#: Name of the temporary table for the memberships to add and remove
+CHANGES_TABLE = "helmholtz_aai_sync_changes"
+
+
+def _dummy_parser():
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser()
+    _add_arguments(parser)
+    return parser
+
+
+def _add_arguments(parser):
+    from django_helmholtz_aai.management.records import FORMATS
+
+    parser.add_argument(
+        "input_file",
+        help=(
+            "The JSONL or CSV file with the members of the VOs. Use '-' to "
+            "read from stdin."
+        ),
+    )
+
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=FORMATS,
+        help="The format of the input file. Default: Use the file extension.",
+    )
+
+    parser.add_argument(
+        "-n",
+        "--dry-run",
+        action="store_true",
+        help="Only print the number of changes and roll them back.",
+    )
+
+    parser.add_argument(
+        "-c",
+        "--chunk-size",
+        type=int,
+        default=1000,
+        help="Number of rows to insert at once, default: %(default)s",
+    )
+
+    parser.add_argument(
+        "-db",
+        "--database",
+        help=(
+            "The Django database identifier (see settings.py), "
+            "default: %(default)s"
+        ),
+        default="default",
+    )
+
+
+def iter_memberships(
+    records: Iterable[Dict[str, Any]]
+) -> Iterator[Tuple[str, Optional[str]]]:
+    """Get the memberships from the records of the dump.
+
+    Yields
+    ------
+    str
+        The ``eduperson_entitlement`` of the VO
+    Optional[str]
+        The ``eduperson_unique_id`` of the member, or None for a record of a
+        VO without members
+    """
+    for record in records:
+        vo = record["eduperson_entitlement"]
+        if "members" in record:
+            yield vo, None
+            for member in record["members"]:
+                yield vo, member
+        else:
+            yield vo, record.get("eduperson_unique_id") or None
+
+
+class Command(BaseCommand):
+    """Django command to synchronize the members of VOs."""
+
+    help = (
+        "Synchronize the members of the virtual organizations with a dump of "
+        "the member lists."
+    )
+
+    def add_arguments(self, parser):
+        """Add connection arguments to the parser."""
+        _add_arguments(parser)
+
+    def handle(
+        self,
+        input_file: str,
+        *args,
+        format: Optional[str] = None,
+        dry_run: bool = False,
+        chunk_size: int = 1000,
+        database: str = "default",
+        **options,
+    ):
+        """Synchronize the members of the VOs in the `input_file`."""
+        from django.db import connections, transaction
+
+        from django_helmholtz_aai.management.records import read_records
+
+        self.database = database
+        self.connection = connections[database]
+        qn = self.connection.ops.quote_name
+        self.tables = {
+            "vos": qn(VOS_TABLE),
+            "members": qn(MEMBERS_TABLE),
+            "changes": qn(CHANGES_TABLE),
+        }
+        self.tables.update(self.get_table_names())
+
+        try:
+            with transaction.atomic(using=database):
+                with self.connection.cursor() as cursor:
+                    self.create_temp_tables(cursor)
+                    self.load_dump(
+                        cursor,
+                        iter_memberships(read_records(input_file, format)),
+                        chunk_size,
+                    )
+                    created = self.create_vos(cursor)
+                    cursor.execute(self.get_add_sql().format(**self.tables))
+                    cursor.execute(self.get_remove_sql().format(**self.tables))
+                    n_added, n_removed = self.count_changes(cursor)
+                self.apply_changes(chunk_size)
+                if dry_run:
+                    transaction.set_rollback(True, using=database)
+
+            self.stdout.write(
+                ("Would add" if dry_run else "Added")
+                + f" {n_added} and remove {n_removed} memberships and "
+                f"create {len(created)} VOs."
+            )
+            if not dry_run:
+                self.send_signals(created, chunk_size)
+        finally:
+            with self.connection.cursor() as cursor:
+                self.drop_temp_tables(cursor)
+
+    def get_table_names(self) -> Dict[str, str]:
+        """Get the names and types of the tables and columns for the queries.
+
+        The names are quoted, the types are the column types of the primary
+        keys for the temporary table of the changes.
+        """
+        from django.contrib.auth import get_user_model
+
+        from django_helmholtz_aai import models
+
+        qn = self.connection.ops.quote_name
+        field = get_user_model().groups.field
+        through = field.remote_field.through._meta
+        user_opts = models.HelmholtzUser._meta
+        vo_opts = models.HelmholtzVirtualOrganization._meta
+        return {
+            "user_table": qn(user_opts.db_table),
+            "user_pk": qn(user_opts.pk.column),
+            "user_type": user_opts.pk.rel_db_type(self.connection),
+            "vo_table": qn(vo_opts.db_table),
+            "vo_pk": qn(vo_opts.pk.column),
+            "vo_type": vo_opts.pk.rel_db_type(self.connection),
+            "m_table": qn(through.db_table),
+            "m_pk": qn(through.pk.column),
+            "m_type": through.pk.rel_db_type(self.connection),
+            "m_user": qn(through.get_field(field.m2m_field_name()).column),
+            "m_group": qn(
+                through.get_field(field.m2m_reverse_field_name()).column
+            ),
+        }
+
+    def create_temp_tables(self, cursor):
+        """Create the temporary tables for the dump and the changes."""
+        self.drop_temp_tables(cursor)
+        cursor.execute(
+            "CREATE TEMPORARY TABLE {vos} ("
+            "eduperson_entitlement VARCHAR(500) NOT NULL PRIMARY KEY)".format(
+                **self.tables
+            )
+        )
+        cursor.execute(
+            "CREATE TEMPORARY TABLE {members} ("
+            "eduperson_entitlement VARCHAR(500) NOT NULL, "
+            "eduperson_unique_id VARCHAR(500) NOT NULL)".format(**self.tables)
+        )
+        cursor.execute(
+            "CREATE INDEX {index} ON {members} "
+            "(eduperson_entitlement, eduperson_unique_id)".format(
+                index=self.connection.ops.quote_name(MEMBERS_TABLE + "_idx"),
+                **self.tables,
+            )
+        )
+        cursor.execute(
+            "CREATE TEMPORARY TABLE {changes} ("
+            "action CHAR(1) NOT NULL, "
+            "membership_id {m_type} NULL, "
+            "user_id {user_type} NOT NULL, "
+            "vo_id {vo_type} NOT NULL)".format(**self.tables)
+        )
+
+    def drop_temp_tables(self, cursor):
+        """Drop the temporary tables for the dump and the changes."""
+        for key in ["vos", "members", "changes"]:
+            cursor.execute(f"DROP TABLE IF EXISTS {self.tables[key]}")
+
+    def load_dump(
+        self,
+        cursor,
+        memberships: Iterable[Tuple[str, Optional[str]]],
+        chunk_size: int,
+    ):
+        """Insert the VOs and memberships of the dump into the temp tables."""
+        from django_helmholtz_aai import entitlements
+        from django_helmholtz_aai.management.records import chunked
+
+        vo_filter = entitlements.get_vo_filter()
+        seen = set()
+        vos_sql = "INSERT INTO {vos} (eduperson_entitlement) VALUES (%s)"
+        members_sql = (
+            "INSERT INTO {members} (eduperson_entitlement, "
+            "eduperson_unique_id) VALUES (%s, %s)"
+        )
+        for chunk in chunked(memberships, chunk_size):
+            new_vos = []
+            rows = []
+            for vo, member in chunk:
+                if vo not in seen:
+                    seen.add(vo)
+                    if vo_filter(vo):
+                        new_vos.append((vo,))
+                if member is not None and vo_filter(vo):
+                    rows.append((vo, member))
+            if new_vos:
+                cursor.executemany(vos_sql.format(**self.tables), new_vos)
+            if rows:
+                cursor.executemany(members_sql.format(**self.tables), rows)
+
+    def create_vos(self, cursor) -> List[str]:
+        """Create the VOs of the dump that have members on the website."""
+        from django_helmholtz_aai import models
+
+        sql = (
+            "SELECT s.eduperson_entitlement FROM {vos} s "
+            "WHERE NOT EXISTS (SELECT 1 FROM {vo_table} v "
+            "WHERE v.eduperson_entitlement = s.eduperson_entitlement) "
+            "AND EXISTS (SELECT 1 FROM {members} t JOIN {user_table} u "
+            "ON u.eduperson_unique_id = t.eduperson_unique_id "
+            "WHERE t.eduperson_entitlement = s.eduperson_entitlement)"
+        )
+        to_create = [row[0] for row in self.query(cursor, sql)]
+        if to_create:
+            models.HelmholtzVirtualOrganization.objects.db_manager(
+                self.database
+            ).get_or_create_many(to_create)
+        return to_create
+
+    @staticmethod
+    def get_add_sql() -> str:
+        """Get the query that stores the memberships that need to be added.
+
+        The primary keys of the user and of the VO are inserted into the
+        temporary table of the changes with the action ``"a"``.
+        """
+        return (
+            "INSERT INTO {changes} (action, user_id, vo_id) "
+            "SELECT DISTINCT 'a', u.{user_pk}, v.{vo_pk} FROM {members} t "
+            "JOIN {user_table} u "
+            "ON u.eduperson_unique_id = t.eduperson_unique_id "
+            "JOIN {vo_table} v "
+            "ON v.eduperson_entitlement = t.eduperson_entitlement "
+            "WHERE NOT EXISTS (SELECT 1 FROM {m_table} m "
+            "WHERE m.{m_user} = u.{user_pk} AND m.{m_group} = v.{vo_pk})"
+        )
+
+    @staticmethod
+    def get_remove_sql() -> str:
+        """Get the query that stores the memberships that need to be removed.
+
+        The primary keys of the membership, the user and the VO are inserted
+        into the temporary table of the changes with the action ``"r"``.
+        """
+        return (
+            "INSERT INTO {changes} (action, membership_id, user_id, vo_id) "
+            "SELECT 'r', m.{m_pk}, m.{m_user}, m.{m_group} FROM {m_table} m "
+            "JOIN {user_table} u ON u.{user_pk} = m.{m_user} "
+            "JOIN {vo_table} v ON v.{vo_pk} = m.{m_group} "
+            "JOIN {vos} s ON s.eduperson_entitlement = v.eduperson_entitlement "
+            "WHERE NOT EXISTS (SELECT 1 FROM {members} t "
+            "WHERE t.eduperson_entitlement = v.eduperson_entitlement "
+            "AND t.eduperson_unique_id = u.eduperson_unique_id)"
+        )
+
+    def query(self, cursor, sql: str) -> List[Tuple]:
+        """Execute a query with the table names and fetch the rows."""
+        cursor.execute(sql.format(**self.tables))
+        return cursor.fetchall()
+
+    def count_changes(self, cursor) -> Tuple[int, int]:
+        """Count the memberships that need to be added and removed."""
+        counts = dict(
+            self.query(
+                cursor,
+                "SELECT action, COUNT(*) FROM {changes} GROUP BY action",
+            )
+        )
+        return counts.get("a", 0), counts.get("r", 0)
+
+    def iter_changes(
+        self, action: str, chunk_size: int
+    ) -> Iterator[List[Tuple]]:
+        """Iterate over the changes in chunks.
+
+        The rows are streamed from the database with a server-side cursor
+        where possible, so that the changes are never loaded all at once.
+
+        Yields
+        ------
+        List[Tuple]
+            The primary keys of the membership, the user and the VO, ordered
+            by the VO
+        """
+        cursor = self.connection.chunked_cursor()
+        try:
+            cursor.execute(
+                "SELECT membership_id, user_id, vo_id FROM {changes} "
+                "WHERE action = %s ORDER BY vo_id, user_id".format(
+                    **self.tables
+                ),
+                [action],
+            )
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cursor.close()
+
+    def apply_changes(self, chunk_size: int):
+        """Add and remove the memberships in chunks of `chunk_size`."""
+        from django.contrib.auth import get_user_model
+
+        from django_helmholtz_aai import models
+
+        field = get_user_model().groups.field
+        through = field.remote_field.through
+        memberships = through._default_manager.using(self.database)
+        vos = models.HelmholtzVirtualOrganization.objects.using(self.database)
+        user_key = field.m2m_column_name()
+        group_key = field.m2m_reverse_name()
+
+        for rows in self.iter_changes("a", chunk_size):
+            vos.filter(
+                pk__in={row[2] for row in rows}, tombstoned_at__isnull=False
+            ).revive()
+            memberships.bulk_create(
+                [
+                    through(**{user_key: user_id, group_key: vo_id})
+                    for pk, user_id, vo_id in rows
+                ],
+                ignore_conflicts=True,
+            )
+        for rows in self.iter_changes("r", chunk_size):
+            memberships.filter(pk__in=[row[0] for row in rows]).delete()
+            vos.filter(
+                pk__in={row[2] for row in rows}, user__isnull=True
+            ).mark_possibly_empty()
+
+    def send_signals(self, created: List[str], chunk_size: int):
+        """Invalidate the memberships and send the signals.
+
+        This is done after the changes have been committed. The
+        :signal:`aai_vo_members_added` and :signal:`aai_vo_members_removed`
+        signals are sent once per VO and chunk of changes.
+        """
+        from django_helmholtz_aai import membership, models, signals
+
+        vo_class = models.HelmholtzVirtualOrganization
+        vos = vo_class.objects.using(self.database)
+        for vo in vos.filter(eduperson_entitlement__in=created):
+            signals.aai_vo_created.send(
+                sender=vo_class, request=None, vo=vo, userinfo=None
+            )
+        for action, signal in [
+            ("a", signals.aai_vo_members_added),
+            ("r", signals.aai_vo_members_removed),
+        ]:
+            for rows in self.iter_changes(action, chunk_size):
+                membership.invalidate_memberships(
+                    {row[1] for row in rows}, using=self.database
+                )
+                user_ids: Dict[int, List[int]] = defaultdict(list)
+                for pk, user_id, vo_id in rows:
+                    user_ids[vo_id].append(user_id)
+                chunk_vos = vos.in_bulk(list(user_ids))
+                for vo_id, ids in user_ids.items():
+                    signal.send(
+                        sender=vo_class, vo=chunk_vos[vo_id], user_ids=ids
+                    )
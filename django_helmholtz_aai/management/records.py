@@ -0,0 +1,350 @@
+"""Records
+-------
+
+Utilities to stream records from and to CSV and JSONL files for the
+management commands of this app. Records are dictionaries, such as the
+userinfo of the Helmholtz AAI. Files are read and written line by line, so the
+memory usage does not depend on the size of the file. Records can also be
+written to Parquet files if :mod:`pyarrow` is installed.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import csv
+import json
+import sys
+from contextlib import contextmanager
+from itertools import islice
+from pathlib import Path
+from typing import (
+    IO,
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Type,
+    TypeVar,
+)
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+if TYPE_CHECKING:
+    from django.db.models import Model
+
+T = TypeVar("T")
+
+#: Supported file formats for reading records
+FORMATS = ["csv", "jsonl"]
+
+#: Supported file formats for writing records
+WRITE_FORMATS = FORMATS + ["parquet"]
+
+#: File extensions for the :attr:`WRITE_FORMATS`
+EXTENSIONS = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".json": "jsonl",
+    ".parquet": "parquet",
+}
+
+
+def get_format(path: str, format: Optional[str] = None) -> str:
+    """Get the format of a file.
+
+    Parameters
+    ----------
+    path: str
+        The path to the file, or ``"-"`` for stdin and stdout
+    format: Optional[str]
+        The format to use. If None, it is determined from the file extension
+        and defaults to ``"jsonl"``.
+    """
+    if format:
+        if format not in WRITE_FORMATS:
+            raise ValueError(
+                f"Unknown format {format!r}. Expected one of {WRITE_FORMATS}."
+            )
+        return format
+    return EXTENSIONS.get(Path(path).suffix.lower(), "jsonl")
+
+
+@contextmanager
+def open_file(path: str, mode: str = "r") -> Iterator[IO[str]]:
+    """Open a text file for the records, or use stdin/stdout for ``"-"``."""
+    if path == "-":
+        yield sys.stdin if "r" in mode else sys.stdout
+    else:
+        with open(path, mode, encoding="utf-8", newline="") as f:
+            yield f
+
+
+def parse_line(line: str) -> Optional[Dict[str, Any]]:
+    """Parse a single line of a JSONL file.
+
+    Empty lines are ignored and return None.
+    """
+    line = line.strip()
+    return json.loads(line) if line else None
+
+
+def read_records(
+    path: str, format: Optional[str] = None
+) -> Iterator[Dict[str, Any]]:
+    """Stream the records of a CSV or JSONL file.
+
+    Parameters
+    ----------
+    path: str
+        The path to the file, or ``"-"`` for stdin
+    format: Optional[str]
+        One of the :attr:`FORMATS`. If None, the format is determined from the
+        file extension (see :func:`get_format`).
+
+    Yields
+    ------
+    Dict[str, Any]
+        The records of the file. For CSV files, this is one dictionary per
+        row with the column names as keys.
+    """
+    format = get_format(path, format)
+    if format not in FORMATS:
+        raise ValueError(f"Cannot read records from {format} files.")
+    with open_file(path) as f:
+        if format == "csv":
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                record = parse_line(line)
+                if record is not None:
+                    yield record
+
+
+def chunked(iterable: Iterable[T], size: int) -> Iterator[List[T]]:
+    """Split an iterable into lists of (at most) `size` items."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def read_record_chunks(
+    path: str,
+    size: int,
+    format: Optional[str] = None,
+    processes: Optional[int] = None,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Stream the records of a CSV or JSONL file in chunks.
+
+    Parameters
+    ----------
+    path: str
+        The path to the file, or ``"-"`` for stdin
+    size: int
+        The number of records (or lines of a JSONL file) per chunk
+    format: Optional[str]
+        One of the :attr:`FORMATS`. If None, the format is determined from the
+        file extension (see :func:`get_format`).
+    processes: Optional[int]
+        If given, the lines of a JSONL file are parsed in a pool with this
+        number of processes. Only one chunk is parsed at a time, so the memory
+        usage still does not depend on the size of the file.
+
+    Yields
+    ------
+    List[Dict[str, Any]]
+        The records of one chunk
+    """
+    format = get_format(path, format)
+    if not processes or format != "jsonl":
+        yield from chunked(read_records(path, format), size)
+        return
+
+    from multiprocessing import Pool
+
+    with open_file(path) as f, Pool(processes) as pool:
+        for lines in chunked(f, size):
+            records = pool.map(
+                parse_line, lines, max(1, len(lines) // (4 * processes))
+            )
+            yield [record for record in records if record is not None]
+
+
+def get_field_types(model: Type[Model], lookups: Sequence[str]) -> List[str]:
+    """Get the internal types of the django fields for ``values_list``.
+
+    Parameters
+    ----------
+    model: Type[Model]
+        The model of the queryset
+    lookups: Sequence[str]
+        The field names or lookups that span relationships, such as
+        ``"user__email"``, as they are passed to ``values_list``
+
+    Returns
+    -------
+    List[str]
+        The internal type of the field for each lookup, e.g. ``"CharField"``.
+        For foreign keys, this is the type of the related primary key.
+    """
+    ret = []
+    for lookup in lookups:
+        opts = model._meta
+        for name in lookup.split("__"):
+            field = opts.pk if name == "pk" else opts.get_field(name)
+            if field.is_relation:
+                opts = field.related_model._meta
+        if field.is_relation:
+            field = opts.pk
+        ret.append(field.get_internal_type())
+    return ret
+
+
+def write_rows(
+    path: str,
+    fieldnames: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    format: Optional[str] = None,
+    chunk_size: int = 10000,
+    field_types: Optional[Sequence[str]] = None,
+) -> int:
+    """Write rows of values as records to a file.
+
+    Parameters
+    ----------
+    path: str
+        The path to the file, or ``"-"`` for stdout (not for Parquet files)
+    fieldnames: Sequence[str]
+        The keys of the records, i.e. the names of the values in each row
+    rows: Iterable[Sequence[Any]]
+        The rows, e.g. a ``values_list(...).iterator()`` of a queryset
+    format: Optional[str]
+        One of the :attr:`WRITE_FORMATS`. If None, the format is determined
+        from the file extension (see :func:`get_format`).
+    chunk_size: int
+        The number of rows per row group of a Parquet file
+    field_types: Optional[Sequence[str]]
+        The internal types of the django fields for the values (see
+        :func:`get_field_types`) to determine the column types of a Parquet
+        file. If None, the types are inferred from the first chunk.
+
+    Returns
+    -------
+    int
+        The number of rows that have been written
+    """
+    format = get_format(path, format)
+    if format == "parquet":
+        return _write_parquet(path, fieldnames, rows, chunk_size, field_types)
+    n = 0
+    with open_file(path, "w") as f:
+        if format == "csv":
+            writer = csv.writer(f)
+            writer.writerow(fieldnames)
+            for n, row in enumerate(rows, 1):
+                writer.writerow(row)
+        else:
+            encoder = DjangoJSONEncoder()
+            for n, row in enumerate(rows, 1):
+                f.write(encoder.encode(dict(zip(fieldnames, row))) + "\n")
+    return n
+
+
+def _write_parquet(
+    path: str,
+    fieldnames: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    chunk_size: int,
+    field_types: Optional[Sequence[str]] = None,
+) -> int:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError(
+            "Writing Parquet files requires pyarrow. Please install it via "
+            "pip install django-helmholtz-aai[parquet]"
+        )
+
+    def get_arrow_type(field_type: str):
+        if field_type == "DateTimeField":
+            return pa.timestamp("us", tz="UTC" if settings.USE_TZ else None)
+        elif field_type.endswith("AutoField") or field_type.endswith(
+            "IntegerField"
+        ):
+            return pa.int64()
+        elif field_type == "BooleanField":
+            return pa.bool_()
+        return pa.string()
+
+    schema = None
+    writer = None
+    if field_types is not None:
+        schema = pa.schema(
+            [
+                (name, get_arrow_type(field_type))
+                for name, field_type in zip(fieldnames, field_types)
+            ]
+        )
+        writer = pq.ParquetWriter(path, schema)
+
+    n = 0
+    try:
+        for chunk in chunked(rows, chunk_size):
+            columns = list(zip(*chunk))
+            if schema is None:
+                table = pa.Table.from_arrays(
+                    [pa.array(column) for column in columns],
+                    names=list(fieldnames),
+                )
+                schema = table.schema
+            else:
+                table = pa.Table.from_arrays(
+                    [
+                        pa.array(column, type=field.type)
+                        for column, field in zip(columns, schema)
+                    ],
+                    schema=schema,
+                )
+            if writer is None:
+                writer = pq.ParquetWriter(path, schema)
+            writer.write_table(table)
+            n += len(chunk)
+        if writer is None:
+            # no rows and no types, still write a file with the column names
+            writer = pq.ParquetWriter(
+                path, pa.schema([(name, pa.string()) for name in fieldnames])
+            )
+    finally:
+        if writer is not None:
+            writer.close()
+    return n
@@ -0,0 +1,353 @@
+"""Cached memberships
+------------------
+
+This module caches the VO memberships and group permissions of users in
+Django's cache framework (see :setting:`HELMHOLTZ_CACHE`).
+
+The cache keys are versioned by a membership fingerprint per user. This
+fingerprint is renewed via :func:`invalidate_memberships` whenever the groups
+of a user change, which is done automatically via the
+:data:`~django.db.models.signals.m2m_changed` signal. Outdated entries are
+therefore never read again and simply expire. As the fingerprints are only
+renewed in the :setting:`HELMHOLTZ_CACHE`, this cache must be shared by all
+server processes.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Callable, FrozenSet, Iterable, Optional
+from uuid import uuid4
+
+from django.core.cache import caches
+from django.db import transaction
+
+from django_helmholtz_aai import app_settings
+from django_helmholtz_aai import entitlements as ent
+
+if TYPE_CHECKING:
+    from django.contrib.auth.models import User
+    from django.core.cache.backends.base import BaseCache
+    from django.http import HttpRequest
+
+
+#: Prefix for the cache keys of this module
+KEY_PREFIX = "helmholtz_aai"
+
+#: Session key for the snapshot of the VO memberships
+SESSION_KEY = "_helmholtz_aai_vos"
+
+
+def get_cache() -> BaseCache:
+    """Get the cache for the memberships, see :setting:`HELMHOLTZ_CACHE`."""
+    return caches[app_settings.HELMHOLTZ_CACHE]
+
+
+def _get_version(key: str) -> str:
+    cache = get_cache()
+    version = cache.get(key)
+    if version is None:
+        # the fingerprints expire, such that outdated memberships are not
+        # used forever if an invalidation is missed
+        cache.add(
+            key,
+            uuid4().hex,
+            timeout=app_settings.HELMHOLTZ_MEMBERSHIP_CACHE_TIMEOUT,
+        )
+        # use what is in the cache now in case another process was faster
+        version = cache.get(key) or uuid4().hex
+    return version
+
+
+def get_membership_version(user_id: Any) -> str:
+    """Get the membership fingerprint of a user.
+
+    Parameters
+    ----------
+    user_id: Any
+        The primary key of the user
+    """
+    return _get_version(f"{KEY_PREFIX}:membership-version:{user_id}")
+
+
+def get_permissions_version() -> str:
+    """Get the fingerprint of the permissions of all groups."""
+    return _get_version(f"{KEY_PREFIX}:permissions-version")
+
+
+def invalidate_memberships(
+    user_ids: Iterable[Any], using: Optional[str] = None
+):
+    """Invalidate the cached memberships of the given users.
+
+    The fingerprints are only renewed when the current transaction is
+    committed. Otherwise, a concurrent request could cache the memberships
+    of before the commit under the new fingerprint.
+
+    Parameters
+    ----------
+    user_ids: Iterable[Any]
+        The primary keys of the users whose memberships changed
+    using: Optional[str]
+        The database of the transaction
+    """
+    keys = [f"{KEY_PREFIX}:membership-version:{pk}" for pk in user_ids]
+    if keys:
+        transaction.on_commit(
+            lambda: get_cache().delete_many(keys), using=using
+        )
+
+
+def invalidate_permissions(using: Optional[str] = None):
+    """Invalidate the cached group permissions of all users.
+
+    As for :func:`invalidate_memberships`, the fingerprint is only renewed
+    when the current transaction of the `using` database is committed.
+    """
+    transaction.on_commit(
+        lambda: get_cache().delete(f"{KEY_PREFIX}:permissions-version"),
+        using=using,
+    )
+
+
+def get_cached(key: str, func: Callable[[], Any]) -> Any:
+    """Get a value from the cache or compute and cache it.
+
+    Parameters
+    ----------
+    key: str
+        The versioned cache key
+    func: Callable[[], Any]
+        The function to compute the value if it is not in the cache
+    """
+    cache = get_cache()
+    value = cache.get(key)
+    if value is None:
+        value = func()
+        cache.set(key, value, app_settings.HELMHOLTZ_MEMBERSHIP_CACHE_TIMEOUT)
+    return value
+
+
+def query_vo_entitlements(user: User) -> FrozenSet[str]:
+    """Query the entitlements of the VOs of a user from the database."""
+    from django_helmholtz_aai import models
+
+    return frozenset(
+        models.HelmholtzVirtualOrganization.objects.filter(
+            user=user
+        ).values_list("eduperson_entitlement", flat=True)
+    )
+
+
+def get_vo_entitlements(user: User) -> FrozenSet[str]:
+    """Get the cached entitlements of the VOs of a user.
+
+    Parameters
+    ----------
+    user: User
+        The user whose VOs to get
+
+    Returns
+    -------
+    FrozenSet[str]
+        The ``eduperson_entitlement`` of the VOs that `user` is a member of.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    version = get_membership_version(user.pk)
+    return get_cached(
+        f"{KEY_PREFIX}:vos:{user.pk}:{version}",
+        lambda: query_vo_entitlements(user),
+    )
+
+
+def get_user_vos(user: User) -> FrozenSet[str]:
+    """Get the entitlements of the VOs of a user and memoize them.
+
+    This function uses :func:`get_vo_entitlements` and stores the result on
+    the `user` instance. As ``request.user`` is loaded once per request, this
+    means that the VOs are fetched at most once per request.
+
+    Parameters
+    ----------
+    user: User
+        The user whose VOs to get
+    """
+    try:
+        return user._helmholtz_aai_vos  # type: ignore
+    except AttributeError:
+        pass
+    vos = get_vo_entitlements(user)
+    user._helmholtz_aai_vos = vos  # type: ignore
+    return vos
+
+
+def get_group_ids(user: User) -> FrozenSet[Any]:
+    """Get the cached primary keys of the groups of a user.
+
+    Parameters
+    ----------
+    user: User
+        The user whose groups to get
+
+    Returns
+    -------
+    FrozenSet[Any]
+        The primary keys of all groups (including the VOs) of `user`.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+    version = get_membership_version(user.pk)
+    return get_cached(
+        f"{KEY_PREFIX}:group-ids:{user.pk}:{version}",
+        lambda: frozenset(user.groups.values_list("pk", flat=True)),
+    )
+
+
+def store_session_snapshot(
+    request: HttpRequest,
+    user: User,
+    vo_entitlements: Optional[Iterable[str]] = None,
+) -> FrozenSet[str]:
+    """Store a snapshot of the VO memberships of a user in the session.
+
+    Parameters
+    ----------
+    request: HttpRequest
+        The request with the session of the user
+    user: User
+        The user whose VOs to store
+    vo_entitlements: Optional[Iterable[str]]
+        The entitlements of the VOs of `user`. If None, they are taken from
+        :func:`get_vo_entitlements`.
+
+    Returns
+    -------
+    FrozenSet[str]
+        The entitlements in the snapshot
+    """
+    if vo_entitlements is None:
+        vos = get_vo_entitlements(user)
+    else:
+        vos = frozenset(vo_entitlements)
+    request.session[SESSION_KEY] = {
+        "user": user.pk,
+        "version": get_membership_version(user.pk),
+        "vos": sorted(vos),
+    }
+    return vos
+
+
+def get_request_vos(request: HttpRequest) -> FrozenSet[str]:
+    """Get the entitlements of the VOs of the user of a request.
+
+    The result is computed once per request. If the
+    :setting:`HELMHOLTZ_SESSION_VO_SNAPSHOT` is enabled, the entitlements are
+    taken from the snapshot in the session (as long as the memberships did not
+    change since the snapshot has been taken). Otherwise, we use
+    :func:`get_vo_entitlements`.
+
+    Parameters
+    ----------
+    request: HttpRequest
+        The request of the user
+
+    Returns
+    -------
+    FrozenSet[str]
+        The ``eduperson_entitlement`` of the VOs of ``request.user``
+    """
+    try:
+        return request._helmholtz_aai_vos  # type: ignore
+    except AttributeError:
+        pass
+    user = request.user
+    vos: FrozenSet[str]
+    if not user.is_authenticated:
+        vos = frozenset()
+    elif app_settings.HELMHOLTZ_SESSION_VO_SNAPSHOT:
+        snapshot = request.session.get(SESSION_KEY)
+        if (
+            snapshot
+            and snapshot["user"] == user.pk
+            and snapshot["version"] == get_membership_version(user.pk)
+        ):
+            vos = frozenset(snapshot["vos"])
+        else:
+            vos = store_session_snapshot(request, user)
+    else:
+        vos = get_user_vos(user)
+    request._helmholtz_aai_vos = vos  # type: ignore
+    return vos
+
+
+def contains_vo(
+    vos: FrozenSet[str], entitlement: str, include_subgroups: bool = False
+) -> bool:
+    """Check if a VO (or one of its subgroups) is in a set of entitlements.
+
+    Parameters
+    ----------
+    vos: FrozenSet[str]
+        The entitlements of the VOs of a user, e.g. from
+        :func:`get_request_vos`
+    entitlement: str
+        The entitlement of the VO to check
+    include_subgroups: bool
+        If True, also accept the subgroups of `entitlement`
+    """
+    if entitlement in vos:
+        return True
+    if include_subgroups:
+        root = ent.to_entitlement(entitlement)
+        return any(
+            parsed is not None and parsed.is_descendant_of(root)
+            for parsed in map(ent.parse_entitlement, vos)
+        )
+    return False
+
+
+def request_has_vo(
+    request: HttpRequest, *vo_entitlements: str, include_subgroups=False
+) -> bool:
+    """Check if the user of the request is a member of any of the given VOs.
+
+    Parameters
+    ----------
+    request: HttpRequest
+        The request of the user
+    ``*vo_entitlements``
+        The entitlements of the VOs to check
+    include_subgroups: bool
+        If True, also accept memberships in the subgroups of the VOs
+
+    See Also
+    --------
+    get_request_vos
+    """
+    vos = get_request_vos(request)
+    return any(
+        contains_vo(vos, entitlement, include_subgroups)
+        for entitlement in vo_entitlements
+    )
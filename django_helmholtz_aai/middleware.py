@@ -0,0 +1,137 @@
+"""Middleware
+----------
+
+This module defines a middleware that gives views and templates direct access
+to the Helmholtz AAI user and its virtual organizations.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING, FrozenSet, Optional, Type
+
+from django.utils.functional import cached_property
+
+from django_helmholtz_aai import membership, models
+
+if TYPE_CHECKING:
+    from django.contrib.auth.models import User
+
+
+def get_aai_user(user: User) -> Optional[models.HelmholtzUser]:
+    """Get the Helmholtz AAI user for a django user.
+
+    Parameters
+    ----------
+    user: User
+        The user, e.g. ``request.user``
+
+    Returns
+    -------
+    Optional[models.HelmholtzUser]
+        The user itself if it already is a
+        :class:`~django_helmholtz_aai.models.HelmholtzUser` (e.g. when using
+        the :class:`~django_helmholtz_aai.backends.HelmholtzAAIBackend`), the
+        corresponding Helmholtz AAI user, or ``None`` if the user did not
+        login via the Helmholtz AAI.
+    """
+    if isinstance(user, models.HelmholtzUser):
+        return user
+    if not user.is_authenticated:
+        return None
+    return models.HelmholtzUser.objects.filter(pk=user.pk).first()
+
+
+class AAIRequestMixin:
+    """Mixin for the request class with the lazy Helmholtz AAI attributes.
+
+    The attributes are cached properties, so they are computed at most once
+    per request, and ``request.aai_user`` really is ``None`` for users that
+    did not log in via the Helmholtz AAI.
+    """
+
+    @cached_property
+    def aai_user(self) -> Optional[models.HelmholtzUser]:
+        """The Helmholtz AAI user of the request, see :func:`get_aai_user`."""
+        return get_aai_user(self.user)  # type: ignore
+
+    @cached_property
+    def aai_vos(self) -> FrozenSet[str]:
+        """The entitlements of the VOs of the user of the request."""
+        return membership.get_request_vos(self)  # type: ignore
+
+
+@lru_cache(maxsize=None)
+def get_request_class(request_class: Type) -> Type:
+    """Get the subclass of `request_class` with the :class:`AAIRequestMixin`."""
+    if issubclass(request_class, AAIRequestMixin):
+        return request_class
+    return type(request_class.__name__, (AAIRequestMixin, request_class), {})
+
+
+class HelmholtzAAIMiddleware:
+    """Middleware to add the Helmholtz AAI user and its VOs to the request.
+
+    This middleware adds two lazily evaluated attributes to the request:
+
+    ``request.aai_user``
+        The :class:`~django_helmholtz_aai.models.HelmholtzUser` of the
+        request (or ``None``), see :func:`get_aai_user`
+    ``request.aai_vos``
+        A frozenset with the ``eduperson_entitlement`` of the VOs of the user,
+        see :func:`django_helmholtz_aai.membership.get_request_vos`
+
+    Both are computed at most once per request and only if they are accessed
+    (see :class:`AAIRequestMixin`).
+    This middleware needs to be added after the
+    :class:`~django.contrib.auth.middleware.AuthenticationMiddleware` to your
+    :setting:`MIDDLEWARE`, e.g.::
+
+        MIDDLEWARE = [
+            ...,
+            "django.contrib.auth.middleware.AuthenticationMiddleware",
+            "django_helmholtz_aai.middleware.HelmholtzAAIMiddleware",
+            ...,
+        ]
+
+    Combine it with the :class:`~django_helmholtz_aai.backends.HelmholtzAAIBackend`
+    to get the Helmholtz AAI user for ``request.user`` without additional
+    queries.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        self.process_request(request)
+        return self.get_response(request)
+
+    def process_request(self, request):
+        """Add the lazy ``aai_user`` and ``aai_vos`` to the request.
+
+        The class of the request is replaced by a subclass with the
+        :class:`AAIRequestMixin`, see :func:`get_request_class`.
+        """
+        request.__class__ = get_request_class(request.__class__)
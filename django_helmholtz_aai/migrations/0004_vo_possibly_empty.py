@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_helmholtz_aai', '0003_auto_20220301_1739'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='helmholtzvirtualorganization',
+            name='possibly_empty',
+            field=models.BooleanField(db_index=True, default=False),
+        ),
+    ]
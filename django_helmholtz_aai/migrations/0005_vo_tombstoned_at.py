@@ -0,0 +1,18 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('django_helmholtz_aai', '0004_vo_possibly_empty'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='helmholtzvirtualorganization',
+            name='tombstoned_at',
+            field=models.DateTimeField(blank=True, db_index=True, null=True),
+        ),
+    ]
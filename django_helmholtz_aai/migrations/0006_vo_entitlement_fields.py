@@ -0,0 +1,77 @@
+# Generated by Django 3.2.25 on 2026-10-19 12:51
+
+from django.db import migrations, models
+
+
+def parse_entitlement(entitlement):
+    """Split an entitlement into namespace, group path and authority.
+
+    This is a frozen copy of
+    :func:`django_helmholtz_aai.entitlements.parse_entitlement`, such that
+    this migration does not change when the parser changes.
+    """
+    namespace, sep, rest = entitlement.partition(":group:")
+    if not sep:
+        return None
+    group_path, sep, authority = rest.rpartition("#")
+    if not sep:
+        return None
+    return namespace, group_path, authority
+
+
+def parse_entitlements(apps, schema_editor):
+    """Set the structured entitlement fields of the existing VOs."""
+    VO = apps.get_model("django_helmholtz_aai", "HelmholtzVirtualOrganization")
+    db_alias = schema_editor.connection.alias
+    fields = ["namespace", "group_path", "authority"]
+    batch = []
+    for vo in (
+        VO.objects.using(db_alias).only("eduperson_entitlement").iterator()
+    ):
+        parsed = parse_entitlement(vo.eduperson_entitlement)
+        if parsed is not None:
+            vo.namespace, vo.group_path, vo.authority = parsed
+            batch.append(vo)
+        if len(batch) >= 1000:
+            VO.objects.using(db_alias).bulk_update(batch, fields)
+            batch.clear()
+    if batch:
+        VO.objects.using(db_alias).bulk_update(batch, fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_helmholtz_aai", "0005_vo_tombstoned_at"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="helmholtzvirtualorganization",
+            name="authority",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="helmholtzvirtualorganization",
+            name="group_path",
+            field=models.CharField(blank=True, max_length=500),
+        ),
+        migrations.AddField(
+            model_name="helmholtzvirtualorganization",
+            name="namespace",
+            field=models.CharField(blank=True, max_length=500),
+        ),
+        migrations.RunPython(parse_entitlements, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="helmholtzvirtualorganization",
+            index=models.Index(
+                fields=["namespace", "authority", "group_path"],
+                name="helmholtz_vo_entitlement_idx",
+                opclasses=[
+                    "varchar_pattern_ops",
+                    "varchar_pattern_ops",
+                    "varchar_pattern_ops",
+                ],
+            ),
+        ),
+    ]
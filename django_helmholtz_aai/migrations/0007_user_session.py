@@ -0,0 +1,50 @@
+# Generated by Django 3.2.25 on 2026-10-19 13:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("django_helmholtz_aai", "0006_vo_entitlement_fields"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HelmholtzUserSession",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "sub",
+                    models.CharField(
+                        blank=True, db_index=True, max_length=255
+                    ),
+                ),
+                (
+                    "sid",
+                    models.CharField(
+                        blank=True, db_index=True, max_length=255
+                    ),
+                ),
+                ("session_key", models.CharField(max_length=40, unique=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="aai_sessions",
+                        to="django_helmholtz_aai.helmholtzuser",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -29,13 +29,27 @@ Models to mimic users and virtual organizations of the Helmholtz AAI in Django.
 from __future__ import annotations
 
 import re
-from typing import TYPE_CHECKING, Callable
+from datetime import timedelta
+from functools import lru_cache
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import Group, GroupManager
-from django.db import models
+from django.db import connections, models, transaction
+from django.utils import timezone
 
-from django_helmholtz_aai import app_settings
+from django_helmholtz_aai import app_settings, entitlements, membership
 
 if TYPE_CHECKING:
     from django.contrib.auth.models import User
@@ -43,16 +57,185 @@ else:
     User = get_user_model()
 
 
+@lru_cache(maxsize=None)
+def _get_parent_attnames(model) -> Tuple[str, ...]:
+    """Get the attribute names of the fields that a model inherits."""
+    return tuple(
+        field.attname
+        for field in model._meta.concrete_fields
+        if field.model is not model
+    )
+
+
+def _get_username(
+    userinfo: Dict[str, Any], is_taken: Callable[[str], bool]
+) -> str:
+    """Get the username for a new user from the Helmholtz AAI userinfo.
+
+    This is the first of the :setting:`HELMHOLTZ_USERNAME_FIELDS` in the
+    `userinfo` that is not yet taken (or the last one, if all are taken).
+    """
+    for field in app_settings.HELMHOLTZ_USERNAME_FIELDS:
+        username = userinfo.get(field)
+        if username and not is_taken(username):
+            break
+    return username
+
+
 class HelmholtzUserManager(User.objects.__class__):  # type: ignore
     """A manager for the helmholtz User."""
 
+    def create_for_user(self, user: User, **kwargs) -> HelmholtzUser:
+        """Create a Helmholtz AAI user for an existing django user.
+
+        Only the row of the Helmholtz AAI user is inserted into the database,
+        the row of the existing `user` remains untouched.
+
+        Parameters
+        ----------
+        user: User
+            The existing django user
+        ``**kwargs``
+            The values for the fields of the Helmholtz AAI user, such as the
+            ``eduperson_unique_id``
+
+        Notes
+        -----
+        The ``pre_save`` and ``post_save`` signals are sent with
+        ``raw=True``, like for loading fixtures.
+        """
+        aai_user = self.model(user_ptr=user, **kwargs)
+        for attname in _get_parent_attnames(self.model):
+            setattr(aai_user, attname, getattr(user, attname))
+        aai_user.save_base(raw=True, force_insert=True, using=self.db)
+        return aai_user
+
+    def bulk_create_for_users(
+        self, unique_ids: Dict[int, str], batch_size: Optional[int] = None
+    ) -> int:
+        """Create Helmholtz AAI users for many existing django users.
+
+        Like :meth:`create_for_user`, this only inserts the rows of the
+        Helmholtz AAI users, but in batches and without sending signals.
+
+        Parameters
+        ----------
+        unique_ids: Dict[int, str]
+            A mapping from the primary key of the existing django user to the
+            ``eduperson_unique_id`` of the Helmholtz AAI user
+        batch_size: Optional[int]
+            The number of rows to insert in one query. If None, this is
+            determined by the database backend.
+
+        Returns
+        -------
+        int
+            The number of created Helmholtz AAI users
+        """
+        opts = self.model._meta
+        fields = [opts.pk, opts.get_field("eduperson_unique_id")]
+        objs = [
+            self.model(user_ptr_id=pk, eduperson_unique_id=unique_id)
+            for pk, unique_id in unique_ids.items()
+        ]
+        if not objs:
+            return 0
+        ops = connections[self.db].ops
+        batch_size = min(
+            batch_size or len(objs), ops.bulk_batch_size(fields, objs) or 1
+        )
+        # bulk_create does not support multi-table inheritance, so we insert
+        # the rows of the child table the same way as bulk_create does
+        with transaction.atomic(using=self.db, savepoint=False):
+            for i in range(0, len(objs), batch_size):
+                self._insert(
+                    objs[i : i + batch_size], fields=fields, using=self.db
+                )
+        return len(objs)
+
+    def bulk_create_aai_users(
+        self,
+        userinfos: Sequence[Dict[str, Any]],
+        batch_size: Optional[int] = None,
+    ) -> List[HelmholtzUser]:
+        """Create many users from the Helmholtz AAI userinfo.
+
+        This does the same as :meth:`create_aai_user` for every userinfo, but
+        with a few queries and without sending signals. The userinfos must not
+        belong to existing Helmholtz AAI users.
+
+        Parameters
+        ----------
+        userinfos: Sequence[Dict[str, Any]]
+            The userinfos from the Helmholtz AAI
+        batch_size: Optional[int]
+            The number of rows to insert in one query. If None, this is
+            determined by the database backend.
+
+        Returns
+        -------
+        List[HelmholtzUser]
+            The created users in the order of the `userinfos`
+        """
+        users = User._default_manager.db_manager(self.db)
+        candidates = {
+            userinfo[field]
+            for userinfo in userinfos
+            for field in app_settings.HELMHOLTZ_USERNAME_FIELDS
+            if userinfo.get(field)
+        }
+        taken = set(
+            users.filter(username__in=candidates).values_list(
+                "username", flat=True
+            )
+        )
+        objs = []
+        for userinfo in userinfos:
+            username = _get_username(userinfo, taken.__contains__)
+            taken.add(username)
+            objs.append(
+                self.model(
+                    username=username,
+                    first_name=userinfo["given_name"],
+                    last_name=userinfo["family_name"],
+                    email=userinfo["email"],
+                    eduperson_unique_id=userinfo["eduperson_unique_id"],
+                )
+            )
+        parent_attnames = _get_parent_attnames(self.model)
+        with transaction.atomic(using=self.db, savepoint=False):
+            parents = users.bulk_create(
+                [
+                    User(**{key: getattr(obj, key) for key in parent_attnames})
+                    for obj in objs
+                ],
+                batch_size=batch_size,
+            )
+            if any(parent.pk is None for parent in parents):
+                # the database backend does not return the primary keys
+                pks = dict(
+                    users.filter(
+                        username__in=[obj.username for obj in objs]
+                    ).values_list("username", "pk")
+                )
+            else:
+                pks = {parent.username: parent.pk for parent in parents}
+            for obj in objs:
+                obj.id = obj.user_ptr_id = pks[obj.username]
+                obj._state.adding = False
+                obj._state.db = self.db
+            self.bulk_create_for_users(
+                {obj.pk: obj.eduperson_unique_id for obj in objs},
+                batch_size=batch_size,
+            )
+        return objs
+
     def create_aai_user(self, userinfo):
         """Create a user from the Helmholtz AAI userinfo."""
 
-        for field in app_settings.HELMHOLTZ_USERNAME_FIELDS:
-            username = userinfo.get(field)
-            if username and not self.filter(username=username):
-                break
+        username = _get_username(
+            userinfo, lambda username: bool(self.filter(username=username))
+        )
 
         email = userinfo["email"]
 
@@ -66,6 +249,113 @@ class HelmholtzUserManager(User.objects.__class__):  # type: ignore
         return user
 
 
+def filter_visible_to(
+    queryset: models.QuerySet,
+    user: User,
+    group_field: str = "group",
+    cached: bool = False,
+) -> models.QuerySet:
+    """Filter the objects that are visible to the groups of a user.
+
+    Parameters
+    ----------
+    queryset: models.QuerySet
+        The queryset of a model with a foreign key to
+        :class:`~django.contrib.auth.models.Group`
+    user: User
+        The user whose groups (including the VOs) determine the visibility
+    group_field: str
+        The name of the foreign key to the group. Can also be a lookup that
+        spans relationships, e.g. ``"project__group"``.
+    cached: bool
+        If True, use the cached primary keys of the groups from
+        :func:`django_helmholtz_aai.membership.get_group_ids` instead of a
+        subquery. This avoids the join with the memberships in the database
+        but should only be used if users have a moderate number of groups.
+
+    Returns
+    -------
+    models.QuerySet
+        The filtered `queryset`. For anonymous users, this is an empty
+        queryset.
+
+    Notes
+    -----
+    Without `cached`, the filter is a single subquery on the membership table
+    (``auth_user_groups``), such as::
+
+        SELECT ... FROM myapp_document WHERE myapp_document.group_id IN (
+            SELECT group_id FROM auth_user_groups WHERE user_id = 1
+        )
+
+    The subquery uses the unique index on ``(user_id, group_id)`` of the
+    membership table, and Django creates an index for the foreign key
+    `group_field` automatically. If you filter or order the visible objects
+    by other fields, add a composite index that starts with the foreign key,
+    e.g. ``models.Index(fields=["group", "-created"])``.
+    """
+    if not user.is_authenticated:
+        return queryset.none()
+    if cached:
+        group_ids = membership.get_group_ids(user)
+    else:
+        group_ids = User.groups.through.objects.filter(user_id=user.pk).values(
+            "group_id"
+        )
+    return queryset.filter(**{group_field + "__in": group_ids})
+
+
+class VisibleToUserQuerySetMixin:
+    """A mixin for querysets of models with a foreign key to a group.
+
+    Examples
+    --------
+    .. code-block:: python
+
+        from django.contrib.auth.models import Group
+        from django.db import models
+
+        from django_helmholtz_aai.models import VisibleToUserQuerySetMixin
+
+
+        class DocumentQuerySet(VisibleToUserQuerySetMixin, models.QuerySet):
+            pass
+
+
+        class Document(models.Model):
+            objects = DocumentQuerySet.as_manager()
+
+            group = models.ForeignKey(Group, on_delete=models.CASCADE)
+
+
+        Document.objects.visible_to(request.user)
+    """
+
+    #: The name of the foreign key to the group
+    group_field = "group"
+
+    def visible_to(
+        self,
+        user: User,
+        group_field: Optional[str] = None,
+        cached: bool = False,
+    ):
+        """Filter the objects that are visible to the groups of a user.
+
+        See :func:`filter_visible_to` for the parameters.
+        """
+        return filter_visible_to(
+            self,  # type: ignore
+            user,
+            group_field or self.group_field,
+            cached=cached,
+        )
+
+
+class VisibleToUserQuerySet(VisibleToUserQuerySetMixin, models.QuerySet):
+    """A queryset with the :meth:`~VisibleToUserQuerySetMixin.visible_to` method."""
+
+
 class HelmholtzUser(User):
     """A User in the in the Helmholtz AAI."""
 
@@ -75,12 +365,194 @@ class HelmholtzUser(User):
 
 
 class HelmholtzVirtualOrganizationQuerySet(models.QuerySet):
-    """A queryset with an extra command to remove empty VOs."""
+    """A queryset with extra commands to query and remove empty VOs."""
+
+    def mark_possibly_empty(self) -> int:
+        """Flag the virtual organizations as candidates for removal.
+
+        The flagged VOs are examined by the next call of
+        :meth:`remove_empty_vos` with ``incremental=True``.
+
+        Returns
+        -------
+        int
+            The number of VOs that have been flagged.
+        """
+        return self.filter(possibly_empty=False).update(possibly_empty=True)
+
+    def revive(self) -> int:
+        """Revive tombstoned virtual organizations.
+
+        This only resets the
+        :attr:`~HelmholtzVirtualOrganization.tombstoned_at` attribute, so
+        the VOs keep their primary key and their permissions.
+
+        Returns
+        -------
+        int
+            The number of VOs that have been revived.
+        """
+        return self.filter(tombstoned_at__isnull=False).update(
+            tombstoned_at=None
+        )
+
+    def get_or_create_many(
+        self, vo_entitlements: Iterable[str]
+    ) -> Tuple[Dict[str, HelmholtzVirtualOrganization], List[str]]:
+        """Get or create the virtual organizations for many entitlements.
+
+        Parameters
+        ----------
+        vo_entitlements: Iterable[str]
+            The ``eduperson_entitlement`` of the VOs
+
+        Returns
+        -------
+        Dict[str, HelmholtzVirtualOrganization]
+            The VOs for the given `vo_entitlements`
+        List[str]
+            The entitlements of the VOs that have been created
+        """
+        vo_entitlements = set(vo_entitlements)
+        vos = {
+            vo.eduperson_entitlement: vo
+            for vo in self.filter(eduperson_entitlement__in=vo_entitlements)
+        }
+        created = sorted(vo_entitlements.difference(vos))
+        for entitlement in created:
+            vos[entitlement] = self.create(
+                name=entitlement, eduperson_entitlement=entitlement
+            )
+        return vos, created
+
+    def from_authority(self, authority: str):
+        """Filter the VOs of the given authority.
+
+        Parameters
+        ----------
+        authority: str
+            The authority of the entitlements, e.g. ``login.helmholtz.de``
+        """
+        return self.filter(authority=authority)
+
+    def in_namespace(self, namespace: str):
+        """Filter the VOs of the given namespace.
+
+        Parameters
+        ----------
+        namespace: str
+            The namespace of the entitlements, e.g. ``urn:geant:helmholtz.de``
+        """
+        return self.filter(namespace=namespace)
+
+    def descendants_of(
+        self,
+        vo: Union[str, entitlements.Entitlement, HelmholtzVirtualOrganization],
+        include_self: bool = False,
+    ):
+        """Filter the subgroups of a VO.
+
+        The hierarchy of the VOs is given by their
+        :attr:`~HelmholtzVirtualOrganization.group_path` that serves as a
+        materialized path. The subgroups of ``some_VO`` are therefore all VOs
+        with the same namespace and authority whose group path starts with
+        ``some_VO:``, which can be answered with an index range scan.
+
+        Parameters
+        ----------
+        vo: str or Entitlement or HelmholtzVirtualOrganization
+            The VO or its entitlement
+        include_self: bool
+            If True, include `vo` in the result.
+        """
+        parsed = entitlements.to_entitlement(vo)
+        query = models.Q(
+            group_path__startswith=parsed.group_path
+            + entitlements.PATH_SEPARATOR
+        )
+        if include_self:
+            query |= models.Q(group_path=parsed.group_path)
+        return self.filter(
+            query, namespace=parsed.namespace, authority=parsed.authority
+        )
+
+    def ancestors_of(
+        self,
+        vo: Union[str, entitlements.Entitlement, HelmholtzVirtualOrganization],
+        include_self: bool = False,
+    ):
+        """Filter the parent groups of a VO.
+
+        Parameters
+        ----------
+        vo: str or Entitlement or HelmholtzVirtualOrganization
+            The VO or its entitlement
+        include_self: bool
+            If True, include `vo` in the result.
+        """
+        parsed = entitlements.to_entitlement(vo)
+        paths = [ancestor.group_path for ancestor in parsed.ancestors()]
+        if include_self:
+            paths.append(parsed.group_path)
+        return self.filter(
+            namespace=parsed.namespace,
+            authority=parsed.authority,
+            group_path__in=paths,
+        )
+
+    def user_in_subtree(
+        self,
+        user: User,
+        vo: Union[str, entitlements.Entitlement, HelmholtzVirtualOrganization],
+    ) -> bool:
+        """Check if the user is a member of a VO or any of its subgroups.
+
+        Parameters
+        ----------
+        user: User
+            The user to check
+        vo: str or Entitlement or HelmholtzVirtualOrganization
+            The VO or its entitlement
+        """
+        return (
+            self.descendants_of(vo, include_self=True)
+            .filter(user=user)
+            .exists()
+        )
+
+    def delete_if_empty(self, vo: HelmholtzVirtualOrganization) -> bool:
+        """Delete a VO if it still has no members.
+
+        The emptiness of the VOs in :meth:`remove_empty_vos` is checked on a
+        snapshot, and users may join the VO in the meantime. We therefore
+        lock the row of the group and check again before deleting it, so that
+        a concurrent login does not lose its membership in the cascade.
+
+        Returns
+        -------
+        bool
+            True, if the VO has been deleted.
+        """
+        with transaction.atomic(using=self.db):
+            locked = (
+                Group._base_manager.using(self.db)
+                .select_for_update()
+                .filter(pk=vo.pk)
+            )
+            if not list(locked.values_list("pk", flat=True)):
+                # the VO has been deleted already
+                return False
+            if vo.user_set.using(self.db).exists():
+                return False
+            vo.delete(using=self.db)
+        return True
 
     def remove_empty_vos(
         self,
         exclude: list[str] = [],
         without_confirmation: bool = True,
+        incremental: bool = False,
+        grace_period: Optional[float] = None,
     ) -> list[HelmholtzVirtualOrganization]:
         """Remove empty virtual organizations.
 
@@ -96,29 +568,67 @@ class HelmholtzVirtualOrganizationQuerySet(models.QuerySet):
         without_confirmation: bool
             If True (default), remove the VO without asking for confirmation
             using python's built-in :func:`input` from the command-line.
+        incremental: bool
+            If True, only examine the VOs that have been flagged via
+            :meth:`mark_possibly_empty` since the last run, e.g. because their
+            last member left.
+        grace_period: Optional[float]
+            The number of seconds that empty VOs are kept as tombstones before
+            they are deleted. If None, we use the
+            :setting:`HELMHOLTZ_VO_TOMBSTONE_GRACE_PERIOD` setting. If this is
+            zero, empty VOs are deleted immediately.
 
         Returns
         -------
         list[HelmholtzVirtualOrganization]
-            The list of virtual organizations that have been removed
+            The list of virtual organizations that have been removed, either
+            by deleting or by tombstoning them.
         """
         exclude_regex: Callable[str] = list(map(re.compile, exclude))  # type: ignore
         vo: HelmholtzVirtualOrganization
         removed: list[HelmholtzVirtualOrganization] = []
-        for vo in self.annotate(count=models.Count("user")).filter(count=0):
-            if not any(
+        if grace_period is None:
+            grace_period = app_settings.HELMHOLTZ_VO_TOMBSTONE_GRACE_PERIOD
+        now = timezone.now()
+        grace_start = now - timedelta(seconds=grace_period or 0)
+        candidates = self.filter(possibly_empty=True) if incremental else self
+        for vo in candidates.annotate(count=models.Count("user")).filter(
+            count=0
+        ):
+            if any(
                 patt.match(vo.eduperson_entitlement) for patt in exclude_regex
             ):
-                if without_confirmation:
-                    vo.delete()
-                    removed.append(vo)
-                else:
-                    answer = ""
-                    while answer not in ["y", "n"]:
-                        answer = input(f"Remove {vo}? [y/n]").lower()
-                    if answer == "y":
-                        vo.delete()
-                        removed.append(vo)
+                continue
+            tombstoned_at = vo.tombstoned_at
+            if grace_period and tombstoned_at and tombstoned_at > grace_start:
+                continue
+            if not without_confirmation:
+                answer = ""
+                while answer not in ["y", "n"]:
+                    answer = input(f"Remove {vo}? [y/n]").lower()
+                if answer == "n":
+                    continue
+            if grace_period and tombstoned_at is None:
+                # keep the VO as a tombstone and examine it again after the
+                # grace period (unless somebody joined it in the meantime)
+                if not self.filter(pk=vo.pk, user__isnull=True).update(
+                    tombstoned_at=now, possibly_empty=True
+                ):
+                    continue
+                vo.tombstoned_at = now
+            elif not self.delete_if_empty(vo):
+                continue
+            removed.append(vo)
+        # tombstones that got members again without join_vo (e.g. via the
+        # admin or the sync_vo_members command) are revived
+        candidates.filter(
+            tombstoned_at__isnull=False, user__isnull=False
+        ).revive()
+        # the remaining candidates have been examined and are kept. VOs whose
+        # last member left during this run stay flagged for the next run
+        candidates.filter(
+            possibly_empty=True, tombstoned_at__isnull=True, user__isnull=False
+        ).update(possibly_empty=False)
         return removed
 
 
@@ -135,16 +645,143 @@ class HelmholtzVirtualOrganization(Group):
 
     eduperson_entitlement = models.CharField(max_length=500, unique=True)
 
+    #: Flag for VOs that might not have any members anymore.
+    #:
+    #: This flag is set when the last member leaves the VO or when a member is
+    #: deleted and it is used by the ``--incremental`` mode of the
+    #: ``remove_empty_vos`` command.
+    possibly_empty = models.BooleanField(default=False, db_index=True)
+
+    #: The time when the VO has been tombstoned because it was empty.
+    #:
+    #: Empty VOs are kept as tombstones for the
+    #: :setting:`HELMHOLTZ_VO_TOMBSTONE_GRACE_PERIOD` and revived when a
+    #: member joins them again. ``None`` means that the VO is alive.
+    tombstoned_at = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    #: The namespace of the :attr:`eduperson_entitlement`, e.g.
+    #: ``urn:geant:helmholtz.de``
+    namespace = models.CharField(max_length=500, blank=True)
+
+    #: The group path of the :attr:`eduperson_entitlement`, e.g.
+    #: ``some_VO:subgroup``
+    group_path = models.CharField(max_length=500, blank=True)
+
+    #: The authority of the :attr:`eduperson_entitlement`, e.g.
+    #: ``login.helmholtz.de``
+    authority = models.CharField(max_length=255, blank=True)
+
+    class Meta:
+        indexes = [
+            # for the lookups in descendants_of and ancestors_of. The
+            # pattern opclasses let PostgreSQL use the index for the
+            # group_path__startswith lookup with any collation (other
+            # databases ignore them)
+            models.Index(
+                fields=["namespace", "authority", "group_path"],
+                name="helmholtz_vo_entitlement_idx",
+                opclasses=["varchar_pattern_ops"] * 3,
+            ),
+        ]
+
+    @property
+    def entitlement(self) -> Optional[entitlements.Entitlement]:
+        """The parsed :attr:`eduperson_entitlement`."""
+        if not self.group_path:
+            return None
+        return entitlements.Entitlement(
+            self.namespace, self.group_path, self.authority
+        )
+
     @property
     def display_name(self) -> str:
         if self.name == self.eduperson_entitlement:
+            if self.group_path:
+                return f"{self.group_path}#{self.authority}"
             return self.name.split(":group:", maxsplit=1)[1]
         return _cached_group_str(self)
 
+    def get_descendants(self, include_self: bool = False):
+        """Get the subgroups of this VO.
+
+        See Also
+        --------
+        HelmholtzVirtualOrganizationQuerySet.descendants_of
+        """
+        return self.__class__.objects.descendants_of(
+            self, include_self=include_self
+        )
+
+    def get_ancestors(self, include_self: bool = False):
+        """Get the parent groups of this VO.
+
+        See Also
+        --------
+        HelmholtzVirtualOrganizationQuerySet.ancestors_of
+        """
+        return self.__class__.objects.ancestors_of(
+            self, include_self=include_self
+        )
+
+    def parse_entitlement(self):
+        """Set the structured fields from the :attr:`eduperson_entitlement`.
+
+        This method is called when the VO is saved and sets the
+        :attr:`namespace`, :attr:`group_path` and :attr:`authority`.
+        """
+        parsed = entitlements.parse_entitlement(self.eduperson_entitlement)
+        if parsed is None:
+            self.namespace = self.group_path = self.authority = ""
+        else:
+            self.namespace, self.group_path, self.authority = parsed
+
+    def save(self, *args, **kwargs):
+        self.parse_entitlement()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and (
+            "eduperson_entitlement" in update_fields
+        ):
+            kwargs["update_fields"] = set(update_fields) | {
+                "namespace",
+                "group_path",
+                "authority",
+            }
+        return super().save(*args, **kwargs)
+
     def __str__(self) -> str:
         return self.display_name
 
 
+class HelmholtzUserSession(models.Model):
+    """An index of the sessions of Helmholtz AAI users.
+
+    The sessions are recorded at login if the
+    :setting:`HELMHOLTZ_TRACK_SESSIONS` setting is enabled, such that the
+    sessions of a user can be deleted without decoding all sessions (see
+    :func:`django_helmholtz_aai.sessions.invalidate_sessions_for`).
+    """
+
+    #: The user who logged in
+    user = models.ForeignKey(
+        HelmholtzUser, on_delete=models.CASCADE, related_name="aai_sessions"
+    )
+
+    #: The subject of the user at the Helmholtz AAI
+    sub = models.CharField(max_length=255, blank=True, db_index=True)
+
+    #: The session id at the Helmholtz AAI
+    sid = models.CharField(max_length=255, blank=True, db_index=True)
+
+    #: The key of the django session
+    session_key = models.CharField(max_length=40, unique=True)
+
+    #: The time of the login
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return f"Session of {self.user} at {self.created_at}"
+
+
 def _display_group_name(self):
     if hasattr(self, "helmholtzvirtualorganization"):
         return self.helmholtzvirtualorganization.display_name
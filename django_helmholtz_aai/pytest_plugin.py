@@ -0,0 +1,54 @@
+"""Pytest plugin
+-------------
+
+Fixtures for testing projects that use the Helmholtz AAI.
+
+This plugin is registered via the ``pytest11`` entry point when
+django-helmholtz-aai is installed, so the fixtures are available in the tests
+of your project without further configuration. It requires pytest-django.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.fixture
+def aai_provider(monkeypatch):
+    """Serve a local stand-in for the Helmholtz AAI and connect to it.
+
+    See :class:`django_helmholtz_aai.testing.StandInProvider`. The latency
+    and failures can be configured via the attributes of the provider.
+    """
+    from django_helmholtz_aai import app_settings, views
+    from django_helmholtz_aai.testing import StandInProvider
+
+    with StandInProvider() as provider:
+        monkeypatch.setattr(
+            app_settings, "HELMHOLTZ_CLIENT_KWS", provider.client_kws
+        )
+        views.reset_oauth()
+        yield provider
+    views.reset_oauth()
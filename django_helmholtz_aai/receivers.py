@@ -0,0 +1,132 @@
+"""Signal receivers
+----------------
+
+Receivers for the signals of Django that keep the data and the caches of the
+Helmholtz AAI app consistent. This module is imported by the
+:meth:`~django_helmholtz_aai.apps.DjangoHelmholtzAaiConfig.ready` method.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth import models as auth_models
+from django.contrib.auth.models import Group
+from django.contrib.auth.signals import user_logged_out
+from django.db.models.signals import m2m_changed, post_migrate, pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from django_helmholtz_aai import app_settings, membership, models
+
+User = get_user_model()
+
+
+@receiver(pre_delete, sender=User)
+def flag_vos_of_deleted_user(sender, instance, using, **kwargs):
+    """Flag the VOs of a user that is about to be deleted."""
+    models.HelmholtzVirtualOrganization.objects.using(using).filter(
+        user=instance
+    ).mark_possibly_empty()
+
+
+@receiver(pre_delete, sender=Group)
+def invalidate_deleted_group(sender, instance, using, **kwargs):
+    """Invalidate the cached memberships of the members of a deleted group.
+
+    The memberships are removed in a cascade that does not send the
+    ``m2m_changed`` signal.
+    """
+    membership.invalidate_memberships(
+        list(instance.user_set.using(using).values_list("pk", flat=True)),
+        using=using,
+    )
+    if instance.permissions.using(using).exists():
+        membership.invalidate_permissions(using=using)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_changed_memberships(
+    sender, instance, action, reverse, pk_set, using, **kwargs
+):
+    """Invalidate the cached memberships when the groups of users change."""
+    if not reverse:
+        # the groups of a user changed
+        if action in ["post_add", "post_remove", "post_clear"]:
+            membership.invalidate_memberships([instance.pk], using=using)
+    elif action == "pre_clear":
+        # all users are removed from a group, so we need to get them before
+        # they are removed
+        membership.invalidate_memberships(
+            list(instance.user_set.using(using).values_list("pk", flat=True)),
+            using=using,
+        )
+    elif action in ["post_add", "post_remove"]:
+        # users have been added to or removed from a group
+        membership.invalidate_memberships(pk_set or [], using=using)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_changed_permissions(sender, action, using, **kwargs):
+    """Invalidate the cached permissions when group permissions change."""
+    if action in ["post_add", "post_remove", "post_clear"]:
+        membership.invalidate_permissions(using=using)
+
+
+@receiver(post_migrate)
+def invalidate_migrated_permissions(sender, using, **kwargs):
+    """Invalidate the cached permissions as new permissions may exist."""
+    membership.invalidate_permissions(using=using)
+
+
+@receiver(user_logged_out)
+def forget_session(sender, request, **kwargs):
+    """Remove the record of the session of a user who logged out."""
+    if not app_settings.HELMHOLTZ_TRACK_SESSIONS:
+        return
+    session = getattr(request, "session", None)
+    if session is not None and session.session_key:
+        models.HelmholtzUserSession.objects.filter(
+            session_key=session.session_key
+        ).delete()
+
+
+def update_last_login(sender, user, **kwargs):
+    """Update the ``last_login`` of a user that logged in.
+
+    This replaces :func:`django.contrib.auth.models.update_last_login` and
+    skips the update for AAI users that logged in within the last
+    :setting:`HELMHOLTZ_LAST_LOGIN_INTERVAL`.
+    """
+    interval = app_settings.HELMHOLTZ_LAST_LOGIN_INTERVAL
+    if (
+        interval
+        and isinstance(user, models.HelmholtzUser)
+        and user.last_login is not None
+        and timezone.now() - user.last_login < timedelta(seconds=interval)
+    ):
+        return
+    auth_models.update_last_login(sender, user, **kwargs)
@@ -0,0 +1,189 @@
+"""Sessions
+--------
+
+Utilities to find and delete the django sessions of Helmholtz AAI users.
+
+Django cannot look up the sessions of a user without decoding every session in
+the session store. If the :setting:`HELMHOLTZ_TRACK_SESSIONS` setting is
+enabled, the session of a Helmholtz AAI user is therefore recorded in the
+:class:`~django_helmholtz_aai.models.HelmholtzUserSession` model at login,
+together with the subject (``sub``) and the session id (``sid``) at the
+Helmholtz AAI. This index is used by :func:`invalidate_sessions_for` and by
+the :class:`~django_helmholtz_aai.views.HelmholtzBackchannelLogoutView`.
+
+The index requires a session engine that stores the sessions on the server,
+i.e. not ``django.contrib.sessions.backends.signed_cookies``.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+from datetime import timedelta
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, Iterable, List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from django_helmholtz_aai import models
+
+if TYPE_CHECKING:
+    from django.db.models import QuerySet
+    from django.http import HttpRequest
+
+
+def record_session(
+    request: HttpRequest,
+    user: models.HelmholtzUser,
+    sub: str = "",
+    sid: Optional[str] = None,
+) -> models.HelmholtzUserSession:
+    """Record the session of a user that logged in.
+
+    This also removes the records of the sessions of this user that expired.
+
+    Parameters
+    ----------
+    request: HttpRequest
+        The request with the session of the user
+    user: models.HelmholtzUser
+        The user who logged in
+    sub: str
+        The subject of the user at the Helmholtz AAI
+    sid: Optional[str]
+        The session id at the Helmholtz AAI, if available
+    """
+    session = request.session
+    if session.session_key is None:
+        session.save()
+    user_sessions = models.HelmholtzUserSession.objects.filter(user=user)
+    user_sessions.filter(
+        created_at__lt=timezone.now()
+        - timedelta(seconds=settings.SESSION_COOKIE_AGE)
+    ).delete()
+    return models.HelmholtzUserSession.objects.update_or_create(
+        session_key=session.session_key,
+        defaults=dict(user=user, sub=sub or "", sid=sid or ""),
+    )[0]
+
+
+def delete_sessions(
+    user_sessions: QuerySet, using: Optional[str] = None
+) -> int:
+    """Delete the django sessions of the given session records.
+
+    Parameters
+    ----------
+    user_sessions: QuerySet
+        A queryset of :class:`~django_helmholtz_aai.models.HelmholtzUserSession`
+    using: Optional[str]
+        The database alias of the session records and of the database-backed
+        sessions. If None, the database router decides.
+
+    Returns
+    -------
+    int
+        The number of deleted sessions
+    """
+    from django.contrib.sessions.backends import cached_db, db
+
+    if using is not None:
+        user_sessions = user_sessions.using(using)
+    session_keys: List[str] = list(
+        user_sessions.values_list("session_key", flat=True)
+    )
+    if not session_keys:
+        return 0
+    store_cls: Any = import_module(settings.SESSION_ENGINE).SessionStore
+    if issubclass(store_cls, db.SessionStore) and not issubclass(
+        store_cls, cached_db.SessionStore
+    ):
+        # the sessions are only in the database, so we can delete them at once
+        store_cls.get_model_class().objects.db_manager(using).filter(
+            session_key__in=session_keys
+        ).delete()
+    else:
+        for session_key in session_keys:
+            store_cls(session_key).delete()
+    models.HelmholtzUserSession.objects.db_manager(using).filter(
+        session_key__in=session_keys
+    ).delete()
+    return len(session_keys)
+
+
+def invalidate_sessions_for(
+    users: Iterable[Any], using: Optional[str] = None
+) -> int:
+    """Log out users by deleting their recorded sessions.
+
+    Parameters
+    ----------
+    users: Iterable[Any]
+        The users (or their primary keys), e.g. a queryset of
+        :class:`~django_helmholtz_aai.models.HelmholtzUser`
+    using: Optional[str]
+        The database alias of the sessions. If None, the database router
+        decides.
+
+    Returns
+    -------
+    int
+        The number of deleted sessions
+    """
+    return delete_sessions(
+        models.HelmholtzUserSession.objects.filter(user__in=users), using
+    )
+
+
+def invalidate_sessions(
+    sub: Optional[str] = None,
+    sid: Optional[str] = None,
+    using: Optional[str] = None,
+) -> int:
+    """Delete the sessions with the given subject or session id of the AAI.
+
+    Parameters
+    ----------
+    sub: Optional[str]
+        The subject of the user at the Helmholtz AAI
+    sid: Optional[str]
+        The session id at the Helmholtz AAI. If this is given together with
+        `sub`, only the sessions that match both are deleted.
+    using: Optional[str]
+        The database alias of the sessions. If None, the database router
+        decides.
+
+    Returns
+    -------
+    int
+        The number of deleted sessions
+    """
+    if not sub and not sid:
+        raise ValueError("Either sub or sid must be specified!")
+    user_sessions = models.HelmholtzUserSession.objects.all()
+    if sub:
+        user_sessions = user_sessions.filter(sub=sub)
+    if sid:
+        user_sessions = user_sessions.filter(sid=sid)
+    return delete_sessions(user_sessions, using)
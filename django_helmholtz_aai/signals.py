@@ -195,3 +195,45 @@ aai_vo_entered = Signal()
 #: --------
 #: django_helmholtz_aai.views.HelmholtzAuthentificationView.synchronize_vos
 aai_vo_left = Signal()
+
+
+#: Signal that is fired if members have been added to a VO in bulk
+#:
+#: This signal is called by the
+#: :mod:`~django_helmholtz_aai.management.commands.sync_vo_members` command
+#: once per virtual organization and chunk of changes instead of an
+#: :signal:`aai_vo_entered` signal per user. Subscribers to this signal can accept
+#: the following parameters.
+#:
+#: .. signal:: aai_vo_members_added
+#:
+#: Parameters
+#: ----------
+#: sender: Type[django_helmholtz_aai.models.HelmholtzVirtualOrganization]
+#:     The type who sent the signal (implemented for reasons of convention)
+#: vo: django_helmholtz_aai.models.HelmholtzVirtualOrganization
+#:     The VO that the users entered
+#: user_ids: List[int]
+#:     The primary keys of the users that entered the VO
+aai_vo_members_added = Signal()
+
+
+#: Signal that is fired if members have been removed from a VO in bulk
+#:
+#: This signal is called by the
+#: :mod:`~django_helmholtz_aai.management.commands.sync_vo_members` command
+#: once per virtual organization and chunk of changes instead of an
+#: :signal:`aai_vo_left` signal per user. Subscribers to this signal can accept
+#: the following parameters.
+#:
+#: .. signal:: aai_vo_members_removed
+#:
+#: Parameters
+#: ----------
+#: sender: Type[django_helmholtz_aai.models.HelmholtzVirtualOrganization]
+#:     The type who sent the signal (implemented for reasons of convention)
+#: vo: django_helmholtz_aai.models.HelmholtzVirtualOrganization
+#:     The VO that the users left
+#: user_ids: List[int]
+#:     The primary keys of the users that left the VO
+aai_vo_members_removed = Signal()
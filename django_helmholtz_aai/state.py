@@ -0,0 +1,272 @@
+"""Login state
+-----------
+
+Stores for the state of pending logins at the Helmholtz AAI.
+
+When the :class:`~django_helmholtz_aai.views.HelmholtzLoginView` redirects a
+user to the Helmholtz AAI, it has to remember the OAuth ``state``, the
+``nonce`` and the URL to return to after the login. The
+:class:`~django_helmholtz_aai.views.HelmholtzAuthentificationView` then
+consumes this data when the user comes back from the Helmholtz AAI. Where this
+data is kept is determined by the :setting:`HELMHOLTZ_STATE_STORE`:
+
+:class:`SessionStateStore`
+    keeps the data in the session (the default). For anonymous users this
+    creates a new session with every click on the login button.
+:class:`SignedCookieStateStore`
+    keeps the data in a signed, short-lived cookie. The redirect to the
+    Helmholtz AAI then does not write to the session or the database at all.
+:class:`CacheStateStore`
+    keeps the data in the :setting:`HELMHOLTZ_STATE_CACHE`, where abandoned
+    logins expire automatically.
+
+You can implement your own store by subclassing :class:`BaseStateStore`.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import hashlib
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import caches
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from django_helmholtz_aai import app_settings, membership
+
+if TYPE_CHECKING:
+    from django.core.cache.backends.base import BaseCache
+    from django.http import HttpRequest, HttpResponse
+
+
+class BaseStateStore:
+    """Base class for stores of the state of pending logins.
+
+    Subclasses must implement the :meth:`save` and :meth:`pop` methods.
+    """
+
+    @property
+    def max_age(self) -> int:
+        """The time in seconds that a login may remain pending.
+
+        See :setting:`HELMHOLTZ_STATE_MAX_AGE`.
+        """
+        return app_settings.HELMHOLTZ_STATE_MAX_AGE
+
+    def save(
+        self,
+        request: HttpRequest,
+        response: HttpResponse,
+        state: str,
+        data: Dict[str, Any],
+    ):
+        """Save the data of a pending login.
+
+        Parameters
+        ----------
+        request: HttpRequest
+            The request to the login view
+        response: HttpResponse
+            The redirect to the Helmholtz AAI
+        state: str
+            The OAuth ``state`` that is sent to the Helmholtz AAI
+        data: Dict[str, Any]
+            The data of the login, e.g. the ``nonce``, the ``redirect_uri``
+            and the URL to return to (``next``). It must be JSON-serializable.
+        """
+        raise NotImplementedError
+
+    def pop(
+        self, request: HttpRequest, state: Optional[str]
+    ) -> Optional[Dict[str, Any]]:
+        """Get and remove the data of a pending login.
+
+        Parameters
+        ----------
+        request: HttpRequest
+            The request to the authentification view
+        state: Optional[str]
+            The OAuth ``state`` that the Helmholtz AAI sent back
+
+        Returns
+        -------
+        Optional[Dict[str, Any]]
+            The `data` that has been passed to :meth:`save`, or ``None`` if
+            there is no pending login for `state` or it expired.
+        """
+        raise NotImplementedError
+
+    def clear(self, request: HttpRequest, response: HttpResponse):
+        """Clean up after the login has been processed.
+
+        This method is called with the response of the authentification view
+        and does nothing by default.
+        """
+        pass
+
+
+class SessionStateStore(BaseStateStore):
+    """Store the state of pending logins in the session.
+
+    This is the same as what :mod:`authlib` does by default.
+    """
+
+    #: Prefix for the session keys of pending logins
+    key_prefix = "_helmholtz_aai_state_"
+
+    def save(self, request, response, state, data):
+        session = request.session
+        now = time.time()
+        # remove abandoned logins from the session
+        for key in list(session.keys()):
+            if key.startswith(self.key_prefix) and session[key]["exp"] < now:
+                del session[key]
+        session[self.key_prefix + state] = {
+            "data": data,
+            "exp": now + self.max_age,
+        }
+
+    def pop(self, request, state):
+        if not state:
+            return None
+        value = request.session.pop(self.key_prefix + state, None)
+        if value is None or value["exp"] < time.time():
+            return None
+        return value["data"]
+
+
+class SignedCookieStateStore(BaseStateStore):
+    """Store the state of pending logins in a signed cookie.
+
+    The cookie is signed with the :setting:`SECRET_KEY`, expires after the
+    :setting:`HELMHOLTZ_STATE_MAX_AGE` and is only sent to the
+    authentification view. As the cookie is bound to the browser, the login
+    can only be completed in the browser that started it.
+
+    Notes
+    -----
+    There can only be one pending login per browser. If the user starts a
+    second login (e.g. in another tab) before the first one finished, the
+    first one fails with a mismatching state.
+    """
+
+    #: The name of the cookie
+    cookie_name = "helmholtz_aai_state"
+
+    #: The salt for signing the cookie
+    salt = "django_helmholtz_aai.state"
+
+    @property
+    def cookie_path(self) -> str:
+        """The path of the authentification view."""
+        return reverse("django_helmholtz_aai:auth")
+
+    def save(self, request, response, state, data):
+        value = signing.dumps(
+            {"state": state, "data": data}, salt=self.salt, compress=True
+        )
+        response.set_cookie(
+            self.cookie_name,
+            value,
+            max_age=self.max_age,
+            path=self.cookie_path,
+            domain=settings.SESSION_COOKIE_DOMAIN,
+            secure=settings.SESSION_COOKIE_SECURE or request.is_secure(),
+            httponly=True,
+            # the callback from the Helmholtz AAI is a cross-site navigation
+            samesite="Lax",
+        )
+
+    def pop(self, request, state):
+        value = request.COOKIES.get(self.cookie_name)
+        if not state or not value:
+            return None
+        try:
+            payload = signing.loads(
+                value, salt=self.salt, max_age=self.max_age
+            )
+        except signing.BadSignature:
+            return None
+        if payload.get("state") != state:
+            return None
+        return payload["data"]
+
+    def clear(self, request, response):
+        if self.cookie_name in request.COOKIES:
+            response.delete_cookie(
+                self.cookie_name,
+                path=self.cookie_path,
+                domain=settings.SESSION_COOKIE_DOMAIN,
+                samesite="Lax",
+            )
+
+
+class CacheStateStore(SignedCookieStateStore):
+    """Store the state of pending logins in the cache.
+
+    The data is stored in the :setting:`HELMHOLTZ_STATE_CACHE` with the
+    :setting:`HELMHOLTZ_STATE_MAX_AGE` as timeout, and can only be consumed
+    once. The browser only gets a signed cookie with the ``state`` to bind the
+    login to the browser that started it.
+    """
+
+    @property
+    def cache(self) -> BaseCache:
+        """The :setting:`HELMHOLTZ_STATE_CACHE`."""
+        return caches[app_settings.HELMHOLTZ_STATE_CACHE]
+
+    def get_key(self, state: str) -> str:
+        """Get the cache key for a `state`."""
+        # the state comes from the request, so we do not use it as it is
+        digest = hashlib.sha256(state.encode("utf-8")).hexdigest()
+        return f"{membership.KEY_PREFIX}:state:{digest}"
+
+    def save(self, request, response, state, data):
+        self.cache.set(self.get_key(state), data, self.max_age)
+        super().save(request, response, state, {})
+
+    def pop(self, request, state):
+        if super().pop(request, state) is None:
+            return None
+        key = self.get_key(state)
+        data = self.cache.get(key)
+        # only the request that deletes the key may use the data
+        if data is None or not self.cache.delete(key):
+            return None
+        return data
+
+
+@lru_cache(maxsize=None)
+def _load_state_store(path: str) -> BaseStateStore:
+    return import_string(path)()
+
+
+def get_state_store() -> BaseStateStore:
+    """Get the store of the :setting:`HELMHOLTZ_STATE_STORE` setting."""
+    return _load_state_store(app_settings.HELMHOLTZ_STATE_STORE)
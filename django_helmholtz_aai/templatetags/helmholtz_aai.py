@@ -23,33 +23,107 @@
 # program. If not, see https://www.eupl.eu/.
 
 
-from urllib.parse import parse_qs, urlparse, urlunparse
+from functools import lru_cache
+from typing import Optional
 
 from django import template
-from django.urls import reverse
-from django.utils.http import urlencode
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import get_script_prefix, get_urlconf, reverse
+
+from django_helmholtz_aai import membership
 
 register = template.Library()
 
 
+@lru_cache(maxsize=None)
+def _reverse_login_url(urlconf: Optional[str], script_prefix: str) -> str:
+    return reverse("django_helmholtz_aai:login", urlconf=urlconf)
+
+
+@receiver(setting_changed)
+def _clear_login_url_cache(setting, **kwargs):
+    if setting in ["ROOT_URLCONF", "FORCE_SCRIPT_NAME"]:
+        _reverse_login_url.cache_clear()
+
+
+def get_login_url() -> str:
+    """Get the url of the login view.
+
+    The reversed url is cached per urlconf and script prefix.
+    """
+    return _reverse_login_url(get_urlconf(), get_script_prefix())
+
+
 @register.simple_tag(takes_context=True)
 def helmholtz_login_url(context) -> str:
-    """Get the url to login to the Helmholtz AAI."""
-    login_url = reverse("django_helmholtz_aai:login")
-
-    request = context["request"]
-
-    parts = urlparse(request.path)
-    urlparams = parse_qs(request.GET.urlencode())
-    url = urlunparse(
-        [
-            parts.scheme,
-            parts.netloc,
-            login_url,
-            parts.params,
-            urlencode(urlparams, doseq=True),
-            parts.fragment,
-        ]
+    """Get the url to login to the Helmholtz AAI.
+
+    The query string of the current request (e.g. the ``next`` parameter) is
+    forwarded to the login view.
+    """
+    login_url = get_login_url()
+    query = context["request"].GET.urlencode()
+    if query:
+        return login_url + "?" + query
+    return login_url
+
+
+@register.simple_tag(takes_context=True)
+def has_vo(context, *vo_entitlements, include_subgroups=False) -> bool:
+    """Check if the user of the request is a member of any of the given VOs.
+
+    This uses :func:`django_helmholtz_aai.membership.request_has_vo` and
+    therefore reads the snapshot in the session if
+    :setting:`HELMHOLTZ_SESSION_VO_SNAPSHOT` is enabled.
+
+    Examples
+    --------
+    .. code-block:: html
+
+        {% load helmholtz_aai %}
+
+        {% has_vo "urn:geant:helmholtz.de:group:hereon#login.helmholtz.de" as is_member %}
+        {% if is_member %}
+          ...
+        {% endif %}
+    """
+    return membership.request_has_vo(
+        context["request"],
+        *vo_entitlements,
+        include_subgroups=include_subgroups,
     )
 
-    return url
+
+@register.filter
+def in_vo(user, vo_entitlement: str) -> bool:
+    """Check if a user is a member of a VO.
+
+    The VOs of the user are fetched once per request (see
+    :func:`django_helmholtz_aai.membership.get_user_vos`), every further
+    check is answered from memory.
+
+    Examples
+    --------
+    .. code-block:: html
+
+        {% load helmholtz_aai %}
+
+        {% if user|in_vo:"urn:geant:helmholtz.de:group:hereon#login.helmholtz.de" %}
+          ...
+        {% endif %}
+    """
+    return vo_entitlement in membership.get_user_vos(user)
+
+
+@register.filter
+def in_vo_tree(user, vo_entitlement: str) -> bool:
+    """Check if a user is a member of a VO or any of its subgroups.
+
+    See Also
+    --------
+    in_vo
+    """
+    return membership.contains_vo(
+        membership.get_user_vos(user), vo_entitlement, include_subgroups=True
+    )
@@ -0,0 +1,559 @@
+"""Testing
+-------
+
+A local stand-in for the OpenID Connect provider of the Helmholtz AAI.
+
+The :class:`StandInProvider` is a small WSGI application that implements the
+parts of the Helmholtz AAI that the
+:class:`~django_helmholtz_aai.views.HelmholtzAuthentificationView` talks to:
+the discovery document, the authorization, token and userinfo endpoints and
+the JWKS. It can be served on the loopback interface, so that the full login
+flow (including the HTTP requests of the OAuth client) can be tested and
+benchmarked without a network connection. Latency and failures of the
+endpoints can be configured to simulate a slow or unreliable AAI.
+
+Examples
+--------
+Serve the provider and point the OAuth client to it::
+
+    from django_helmholtz_aai import app_settings, views
+    from django_helmholtz_aai.testing import StandInProvider, make_userinfo
+
+    with StandInProvider(latency=0.05) as provider:
+        app_settings.HELMHOLTZ_CLIENT_KWS = provider.client_kws
+        views.reset_oauth()
+
+        # the login view redirects to the provider, and the provider
+        # redirects back to the auth view
+        callback_url = provider.authorize(
+            redirect_url, make_userinfo("user1", ["some_VO"])
+        )
+
+For pytest, the ``aai_provider`` fixture of the
+:mod:`~django_helmholtz_aai.pytest_plugin` does the same.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import base64
+import json
+import random
+import secrets
+import threading
+import time
+from socketserver import ThreadingMixIn
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlencode, urlsplit
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+#: The endpoints of the :class:`StandInProvider`
+ENDPOINTS = {
+    "/.well-known/openid-configuration": "discovery",
+    "/authorize": "authorize",
+    "/token": "token",
+    "/userinfo": "userinfo",
+    "/jwks": "jwks",
+}
+
+#: Reasons for the HTTP status codes of the :class:`StandInProvider`
+STATUS_REASONS = {
+    200: "OK",
+    302: "Found",
+    400: "Bad Request",
+    401: "Unauthorized",
+    404: "Not Found",
+    500: "Internal Server Error",
+    502: "Bad Gateway",
+    503: "Service Unavailable",
+}
+
+Response = Tuple[int, List[Tuple[str, str]], bytes]
+
+
+def make_userinfo(
+    user_id: str, vos: Sequence[str] = (), **kwargs
+) -> Dict[str, Any]:
+    """Create the userinfo of a user at the Helmholtz AAI.
+
+    Parameters
+    ----------
+    user_id: str
+        An identifier of the user that is used for the ``sub``, the
+        ``eduperson_unique_id``, the username and the email.
+    vos: Sequence[str]
+        The names of the VOs of the user, e.g. ``"some_VO:subgroup"``. They
+        are converted to the ``eduperson_entitlement`` of the Helmholtz AAI.
+    ``**kwargs``
+        Further claims for the userinfo
+
+    Returns
+    -------
+    Dict[str, Any]
+        The userinfo as it is returned by the Helmholtz AAI
+    """
+    userinfo = {
+        "sub": user_id,
+        "eduperson_unique_id": f"{user_id}@login.helmholtz.de",
+        "preferred_username": user_id,
+        "name": f"User {user_id}",
+        "given_name": "User",
+        "family_name": user_id,
+        "email": f"{user_id}@example.com",
+        "email_verified": True,
+        "eduperson_entitlement": [
+            f"urn:geant:helmholtz.de:group:{vo}#login.helmholtz.de"
+            for vo in vos
+        ],
+    }
+    userinfo.update(kwargs)
+    return userinfo
+
+
+def _generate_key(kid: str) -> Tuple[Any, Dict[str, Any]]:
+    """Generate an RSA key for signing and its public JWK."""
+    try:
+        from joserfc.jwk import RSAKey
+    except ImportError:  # older versions of authlib
+        from authlib.jose import JsonWebKey
+
+        key = JsonWebKey.generate_key(
+            "RSA", 2048, options={"kid": kid}, is_private=True
+        )
+        return key, key.as_dict(is_private=False)
+    else:
+        key = RSAKey.generate_key(2048, parameters={"kid": kid})
+        return key, key.as_dict(private=False)
+
+
+def _encode_jwt(claims: Dict[str, Any], key: Any, kid: str) -> str:
+    """Sign the `claims` with the `key`."""
+    header = {"alg": "RS256", "kid": kid}
+    try:
+        from joserfc import jwt
+    except ImportError:  # older versions of authlib
+        from authlib.jose import jwt as authlib_jwt
+
+        return authlib_jwt.encode(header, claims, key).decode("ascii")
+    else:
+        return jwt.encode(header, claims, key)
+
+
+class _QuietHandler(WSGIRequestHandler):
+    """A request handler that does not log every request."""
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    """A WSGI server that handles every request in a separate thread."""
+
+    daemon_threads = True
+
+
+class StandInProvider:
+    """A local stand-in for the OpenID Connect provider of the Helmholtz AAI.
+
+    Instances of this class are WSGI applications. Use :meth:`start` (or the
+    instance as a context manager) to serve it on the loopback interface, and
+    :attr:`client_kws` for the :setting:`HELMHOLTZ_CLIENT_KWS`.
+
+    Parameters
+    ----------
+    client_id: str
+        The client id that is accepted at the token endpoint
+    client_secret: str
+        The client secret that is accepted at the token endpoint
+    latency: float
+        The time in seconds that every request to the provider takes
+    latencies: Optional[Dict[str, float]]
+        The latency per endpoint (``"discovery"``, ``"authorize"``,
+        ``"token"``, ``"userinfo"`` or ``"jwks"``). This overrides `latency`.
+    failure_rate: float
+        The probability that a request fails with a ``503`` error
+    failures: Optional[Dict[str, int]]
+        HTTP status codes per endpoint. Every request to such an endpoint
+        fails with this status code.
+    seed: Optional[int]
+        The seed for the random failures
+    """
+
+    #: The `kid` of the signing key
+    kid = "stand-in"
+
+    #: The lifetime of the issued tokens in seconds
+    expires_in = 3600
+
+    #: The lifetime of the authorization codes in seconds
+    code_expires_in = 60
+
+    #: The maximum number of valid access tokens. If more tokens are issued,
+    #: the oldest ones are revoked, such that long load tests do not let the
+    #: provider grow without bound.
+    max_tokens = 10000
+
+    #: The URL where the provider is served, see :meth:`start`
+    url: str = "http://127.0.0.1"
+
+    def __init__(
+        self,
+        client_id: str = "stand-in-client",
+        client_secret: str = "stand-in-secret",
+        latency: float = 0.0,
+        latencies: Optional[Dict[str, float]] = None,
+        failure_rate: float = 0.0,
+        failures: Optional[Dict[str, int]] = None,
+        seed: Optional[int] = None,
+    ):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.latency = latency
+        self.latencies = dict(latencies or {})
+        self.failure_rate = failure_rate
+        self.failures = dict(failures or {})
+        self.random = random.Random(seed)
+        self.key, self.public_jwk = _generate_key(self.kid)
+        #: The number of requests per endpoint
+        self.requests: Dict[str, int] = dict.fromkeys(ENDPOINTS.values(), 0)
+        #: The users that can log in via the authorization endpoint, see
+        #: :meth:`add_user`
+        self.users: Dict[str, Dict[str, Any]] = {}
+        self._codes: Dict[str, Dict[str, Any]] = {}
+        self._tokens: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._server: Optional[_ThreadingWSGIServer] = None
+
+    @property
+    def issuer(self) -> str:
+        """The issuer of the tokens, i.e. the :attr:`url`."""
+        return self.url
+
+    @property
+    def client_kws(self) -> Dict[str, Any]:
+        """The :setting:`HELMHOLTZ_CLIENT_KWS` for this provider."""
+        return dict(
+            client_id=self.client_id,
+            client_secret=self.client_secret,
+            server_metadata_url=(
+                self.url + "/.well-known/openid-configuration"
+            ),
+            client_kwargs={
+                "scope": "openid profile email eduperson_unique_id"
+            },
+        )
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """The discovery document of the provider."""
+        return {
+            "issuer": self.issuer,
+            "authorization_endpoint": self.url + "/authorize",
+            "token_endpoint": self.url + "/token",
+            "userinfo_endpoint": self.url + "/userinfo",
+            "jwks_uri": self.url + "/jwks",
+            "response_types_supported": ["code"],
+            "subject_types_supported": ["public"],
+            "id_token_signing_alg_values_supported": ["RS256"],
+            "token_endpoint_auth_methods_supported": [
+                "client_secret_basic",
+                "client_secret_post",
+            ],
+        }
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve the provider in a background thread.
+
+        Parameters
+        ----------
+        host: str
+            The interface to listen on
+        port: int
+            The port to listen on. ``0`` uses a free port.
+
+        Returns
+        -------
+        str
+            The :attr:`url` of the provider
+        """
+        server = make_server(
+            host,
+            port,
+            self,
+            server_class=_ThreadingWSGIServer,
+            handler_class=_QuietHandler,
+        )
+        self._server = server
+        self.url = "http://%s:%i" % (host, server.server_port)
+        threading.Thread(
+            target=server.serve_forever,
+            kwargs={"poll_interval": 0.05},
+            daemon=True,
+        ).start()
+        return self.url
+
+    def stop(self):
+        """Stop serving the provider."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self) -> StandInProvider:
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def add_user(self, userinfo: Dict[str, Any]):
+        """Register a user for the authorization endpoint.
+
+        A request to the authorization endpoint with the ``sub`` of the user
+        as ``login_hint`` then logs in this user.
+        """
+        self.users[userinfo["sub"]] = dict(userinfo)
+
+    def authorize(self, url: str, userinfo: Dict[str, Any]) -> str:
+        """Simulate the login of a user at the provider.
+
+        Parameters
+        ----------
+        url: str
+            The authorization URL that the login view redirects to
+        userinfo: Dict[str, Any]
+            The userinfo of the user that logs in, see :func:`make_userinfo`
+
+        Returns
+        -------
+        str
+            The URL of the authentification view that the provider redirects
+            the user to
+        """
+        params = {
+            key: val[0] for key, val in parse_qs(urlsplit(url).query).items()
+        }
+        code = secrets.token_urlsafe(16)
+        with self._lock:
+            self._prune(self._codes)
+            self._codes[code] = {
+                "expires_at": time.monotonic() + self.code_expires_in,
+                "userinfo": dict(userinfo),
+                "nonce": params.get("nonce"),
+                "redirect_uri": params.get("redirect_uri"),
+                "client_id": params.get("client_id"),
+                "sid": secrets.token_hex(8),
+            }
+        query = {"code": code}
+        if "state" in params:
+            query["state"] = params["state"]
+        redirect_uri = params.get("redirect_uri", "")
+        sep = "&" if "?" in redirect_uri else "?"
+        return redirect_uri + sep + urlencode(query)
+
+    def make_logout_token(
+        self, sub: Optional[str] = None, sid: Optional[str] = None
+    ) -> str:
+        """Create a back-channel logout token for the given user or session.
+
+        See :class:`~django_helmholtz_aai.views.HelmholtzBackchannelLogoutView`
+        """
+        now = int(time.time())
+        claims: Dict[str, Any] = {
+            "iss": self.issuer,
+            "aud": self.client_id,
+            "iat": now,
+            "exp": now + 120,
+            "jti": secrets.token_hex(8),
+            "events": {
+                "http://schemas.openid.net/event/backchannel-logout": {}
+            },
+        }
+        if sub:
+            claims["sub"] = sub
+        if sid:
+            claims["sid"] = sid
+        return _encode_jwt(claims, self.key, self.kid)
+
+    def __call__(
+        self, environ: Dict[str, Any], start_response: Callable
+    ) -> List[bytes]:
+        endpoint = ENDPOINTS.get(environ.get("PATH_INFO", ""))
+        if endpoint is None:
+            status, headers, body = self._json(404, {"error": "not_found"})
+        else:
+            with self._lock:
+                self.requests[endpoint] += 1
+            latency = self.latencies.get(endpoint, self.latency)
+            if latency:
+                time.sleep(latency)
+            failure = self.failures.get(endpoint)
+            if failure is None and self.failure_rate:
+                with self._lock:
+                    if self.random.random() < self.failure_rate:
+                        failure = 503
+            if failure is not None:
+                status, headers, body = self._json(
+                    failure, {"error": "server_error"}
+                )
+            else:
+                handler = getattr(self, "handle_" + endpoint)
+                status, headers, body = handler(environ)
+        start_response(
+            "%i %s" % (status, STATUS_REASONS.get(status, "Unknown")), headers
+        )
+        return [body]
+
+    @staticmethod
+    def _json(status: int, data: Dict[str, Any]) -> Response:
+        body = json.dumps(data).encode("utf-8")
+        headers = [
+            ("Content-Type", "application/json"),
+            ("Content-Length", str(len(body))),
+            ("Cache-Control", "no-store"),
+        ]
+        return status, headers, body
+
+    @staticmethod
+    def _read_form(environ: Dict[str, Any]) -> Dict[str, str]:
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            length = 0
+        data = environ["wsgi.input"].read(length).decode("utf-8")
+        return {key: val[0] for key, val in parse_qs(data).items()}
+
+    def handle_discovery(self, environ: Dict[str, Any]) -> Response:
+        """Return the discovery document."""
+        return self._json(200, self.metadata)
+
+    @staticmethod
+    def _prune(
+        store: Dict[str, Dict[str, Any]], max_size: Optional[int] = None
+    ):
+        """Remove the expired (and the oldest) codes or tokens of `store`.
+
+        The entries of a store have the same lifetime, so they expire in the
+        order of insertion. This method must be called with the lock held.
+        """
+        now = time.monotonic()
+        while store:
+            key = next(iter(store))
+            if store[key]["expires_at"] >= now and (
+                max_size is None or len(store) <= max_size
+            ):
+                break
+            del store[key]
+
+    def handle_jwks(self, environ: Dict[str, Any]) -> Response:
+        """Return the public key set."""
+        return self._json(200, {"keys": [self.public_jwk]})
+
+    def handle_authorize(self, environ: Dict[str, Any]) -> Response:
+        """Log in the user of the ``login_hint`` and redirect back.
+
+        The ``login_hint`` must be the ``sub`` of a user that has been
+        registered with :meth:`add_user`.
+        """
+        params = {
+            key: val[0]
+            for key, val in parse_qs(environ.get("QUERY_STRING", "")).items()
+        }
+        userinfo = self.users.get(params.get("login_hint", ""))
+        if userinfo is None:
+            return self._json(400, {"error": "login_required"})
+        url = "?" + environ.get("QUERY_STRING", "")
+        location = self.authorize(url, userinfo)
+        return 302, [("Location", location), ("Content-Length", "0")], b""
+
+    def _authenticate_client(
+        self, environ: Dict[str, Any], form: Dict[str, str]
+    ) -> bool:
+        auth = environ.get("HTTP_AUTHORIZATION", "")
+        if auth.startswith("Basic "):
+            decoded = base64.b64decode(auth[6:]).decode("utf-8")
+            client_id, _, client_secret = decoded.partition(":")
+        else:
+            client_id = form.get("client_id", "")
+            client_secret = form.get("client_secret", "")
+        return secrets.compare_digest(
+            client_id, self.client_id
+        ) and secrets.compare_digest(client_secret, self.client_secret)
+
+    def handle_token(self, environ: Dict[str, Any]) -> Response:
+        """Exchange an authorization code for the tokens."""
+        if environ["REQUEST_METHOD"] != "POST":
+            return self._json(400, {"error": "invalid_request"})
+        form = self._read_form(environ)
+        if not self._authenticate_client(environ, form):
+            return self._json(401, {"error": "invalid_client"})
+        with self._lock:
+            grant = self._codes.pop(form.get("code", ""), None)
+        if (
+            grant is None
+            or grant["expires_at"] < time.monotonic()
+            or form.get("grant_type") != "authorization_code"
+            or grant["client_id"] != self.client_id
+            or grant["redirect_uri"] != form.get("redirect_uri")
+        ):
+            return self._json(400, {"error": "invalid_grant"})
+
+        userinfo = grant["userinfo"]
+        access_token = secrets.token_urlsafe(24)
+        with self._lock:
+            self._prune(self._tokens, self.max_tokens - 1)
+            self._tokens[access_token] = {
+                "expires_at": time.monotonic() + self.expires_in,
+                "userinfo": userinfo,
+            }
+        now = int(time.time())
+        claims = {
+            "iss": self.issuer,
+            "sub": userinfo["sub"],
+            "aud": self.client_id,
+            "iat": now,
+            "exp": now + self.expires_in,
+            "sid": grant["sid"],
+        }
+        if grant["nonce"]:
+            claims["nonce"] = grant["nonce"]
+        return self._json(
+            200,
+            {
+                "access_token": access_token,
+                "token_type": "Bearer",
+                "expires_in": self.expires_in,
+                "id_token": _encode_jwt(claims, self.key, self.kid),
+            },
+        )
+
+    def handle_userinfo(self, environ: Dict[str, Any]) -> Response:
+        """Return the userinfo for the access token."""
+        auth = environ.get("HTTP_AUTHORIZATION", "")
+        token = auth[7:] if auth.startswith("Bearer ") else ""
+        with self._lock:
+            grant = self._tokens.get(token)
+        if grant is None or grant["expires_at"] < time.monotonic():
+            return self._json(401, {"error": "invalid_token"})
+        return self._json(200, grant["userinfo"])
@@ -0,0 +1,77 @@
+"""Fixtures for the tests
+-----------------------
+
+Fixtures that are shared by the test modules of this app.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+from typing import Any
+
+import pytest
+
+from django_helmholtz_aai import app_settings, membership, views
+
+# the plugin is only registered via its entry point if the package is
+# installed, so we import the fixtures for running the tests from the source
+from django_helmholtz_aai.pytest_plugin import aai_provider  # noqa: F401
+
+
+@pytest.fixture(autouse=True)
+def clear_membership_cache():
+    """Clear the cached memberships.
+
+    The cache is invalidated when a transaction is committed, which does not
+    happen in the tests, so primary keys of users from previous tests could
+    otherwise find their cached memberships.
+    """
+    membership.get_cache().clear()
+    yield
+
+
+@pytest.fixture
+def oauth_metadata() -> dict[str, Any]:
+    """Additional server metadata for the :func:`oauth_client`."""
+    return {}
+
+
+@pytest.fixture
+def oauth_client(monkeypatch, oauth_metadata: dict[str, Any]):
+    """Register an OAuth client that does not need the real AAI."""
+    monkeypatch.setattr(
+        app_settings,
+        "HELMHOLTZ_CLIENT_KWS",
+        dict(
+            client_id="test-client",
+            client_secret="test-secret",
+            authorize_url="https://aai.example.com/authorize",
+            access_token_url="https://aai.example.com/token",
+            client_kwargs={"scope": "openid profile email"},
+            **oauth_metadata,
+        ),
+    )
+    views.reset_oauth()
+    yield views.get_oauth_client()
+    views.reset_oauth()
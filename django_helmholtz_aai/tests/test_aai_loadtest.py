@@ -0,0 +1,86 @@
+"""Tests for the aai_loadtest command
+----------------------------------
+
+This module tests the
+:mod:`~django_helmholtz_aai.management.commands.aai_loadtest` command.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+
+from django_helmholtz_aai import models
+from django_helmholtz_aai.management.commands.aai_loadtest import percentile
+
+
+def run_loadtest(**kwargs) -> str:
+    stdout = StringIO()
+    kwargs.setdefault("users", 6)
+    kwargs.setdefault("concurrency", 1)
+    call_command(
+        "aai_loadtest",
+        use_existing_database=True,
+        seed=0,
+        stdout=stdout,
+        stderr=StringIO(),
+        **kwargs,
+    )
+    return stdout.getvalue()
+
+
+@pytest.mark.parametrize(
+    "q,expected", [(0, 1), (50, 5), (95, 10), (99, 10), (100, 10)]
+)
+def test_percentile(q, expected):
+    """Test the nearest-rank percentiles."""
+    assert percentile(list(range(10, 0, -1)), q) == expected
+
+
+def test_loadtest(transactional_db):
+    """Test a load test with new and returning users."""
+    out = run_loadtest(entitlements=2, vos=3, returning=0.5)
+    assert "Logins:       6 (3 returning users, 3 new users)" in out
+    assert "Errors:       0 (0.0 %)" in out
+    assert "token 6" in out
+    assert models.HelmholtzUser.objects.count() == 6
+    assert models.HelmholtzVirtualOrganization.objects.count() == 3
+
+
+def test_loadtest_failures(transactional_db):
+    """Test that the failures of the provider are reported."""
+    out = run_loadtest(returning=0, failure_rate=1)
+    assert "Errors:       6 (100.0 %)" in out
+    assert "HTTPError" in out
+    assert not models.HelmholtzUser.objects.exists()
+
+
+def test_loadtest_sqlite_concurrency(transactional_db):
+    """Test that the load test runs sequentially on SQLite by default."""
+    out = run_loadtest(concurrency=None, returning=0)
+    assert "Errors:       0 (0.0 %)" in out
+    assert models.HelmholtzUser.objects.count() == 6
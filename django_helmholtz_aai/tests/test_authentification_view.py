@@ -36,9 +36,13 @@ from django.contrib.auth.middleware import AuthenticationMiddleware
 from django.contrib.messages.middleware import MessageMiddleware
 from django.contrib.sessions.middleware import SessionMiddleware
 from django.core.exceptions import PermissionDenied
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.utils.functional import cached_property
 
-from django_helmholtz_aai import app_settings, models, signals
+from django_helmholtz_aai import app_settings, membership, models, signals
+from django_helmholtz_aai.decorators import require_vo
 from django_helmholtz_aai.views import HelmholtzAuthentificationView
 
 if TYPE_CHECKING:
@@ -226,6 +230,27 @@ def test_helmholtz_username_fields(
     test_basic_get(authentification_view, userinfo["email"])
 
 
+def test_last_login_interval(
+    authentification_view: PatchedHelmholtzAuthentificationView,
+    username: str,
+    monkeypatch,
+):
+    """Test throttling the updates of the last login."""
+    test_basic_get(authentification_view, username)
+    last_login = models.HelmholtzUser.objects.get(username=username).last_login
+    assert last_login is not None
+
+    monkeypatch.setattr(app_settings, "HELMHOLTZ_LAST_LOGIN_INTERVAL", 3600)
+    test_basic_get(authentification_view, username)
+    user = models.HelmholtzUser.objects.get(username=username)
+    assert user.last_login == last_login
+
+    monkeypatch.setattr(app_settings, "HELMHOLTZ_LAST_LOGIN_INTERVAL", None)
+    test_basic_get(authentification_view, username)
+    user = models.HelmholtzUser.objects.get(username=username)
+    assert user.last_login > last_login
+
+
 def test_change_email(
     authentification_view: PatchedHelmholtzAuthentificationView,
     username: str,
@@ -290,6 +315,38 @@ def test_change_vo(
 
     assert patched_signals == ["aai_vo_left", "aai_user_logged_in"]
 
+    # the VO has been left by its last member and should be flagged
+    assert models.HelmholtzVirtualOrganization.objects.get(
+        possibly_empty=True
+    ).eduperson_entitlement == (
+        "urn:geant:helmholtz.de:group:some_VO:subgroup#login.helmholtz.de"
+    )
+
+
+def test_rejoin_tombstoned_vo(
+    authentification_view: PatchedHelmholtzAuthentificationView,
+    username: str,
+    userinfo: dict[str, Any],
+    patched_signals: list[str],
+):
+    """Test that a tombstoned VO is revived instead of created again."""
+    entitlement = userinfo["eduperson_entitlement"].pop(1)
+    test_basic_get(authentification_view, username)
+
+    vo = models.HelmholtzVirtualOrganization.objects.create(
+        name=entitlement,
+        eduperson_entitlement=entitlement,
+        tombstoned_at=timezone.now(),
+    )
+    userinfo["eduperson_entitlement"].append(entitlement)
+    patched_signals.clear()
+
+    test_basic_get(authentification_view, username)
+
+    assert patched_signals == ["aai_vo_entered", "aai_user_logged_in"]
+    revived = models.HelmholtzVirtualOrganization.objects.get(pk=vo.pk)
+    assert revived.tombstoned_at is None
+
 
 def test_allowed_vos(
     authentification_view: PatchedHelmholtzAuthentificationView,
@@ -340,6 +397,48 @@ def test_helmholtz_map_accounts(
     assert new_user.pk == admin_user.pk
 
 
+def test_create_for_user(admin_user: User, django_assert_num_queries):
+    """Test that mapping an account only inserts the AAI user."""
+    with django_assert_num_queries(1) as context:
+        aai_user = models.HelmholtzUser.objects.create_for_user(
+            admin_user, eduperson_unique_id="abc@login.helmholtz.de"
+        )
+    assert context.captured_queries[0]["sql"].startswith(
+        f'INSERT INTO "{models.HelmholtzUser._meta.db_table}"'
+    )
+    assert aai_user.pk == admin_user.pk
+    assert aai_user.username == admin_user.username
+    aai_user = models.HelmholtzUser.objects.get(pk=admin_user.pk)
+    assert aai_user.eduperson_unique_id == "abc@login.helmholtz.de"
+    assert aai_user.password == admin_user.password
+
+
+def test_update_fields(
+    authentification_view: PatchedHelmholtzAuthentificationView,
+    username: str,
+    userinfo: dict[str, Any],
+):
+    """Test that updating the user only writes the changed columns."""
+    test_basic_get(authentification_view, username)
+    user = authentification_view.aai_user = models.HelmholtzUser.objects.get(
+        username=username
+    )
+    version = membership.get_membership_version(user.pk)
+    userinfo["given_name"] = "Max"
+    with CaptureQueriesContext(connection) as context:
+        authentification_view.update_user()
+    # the groups did not change, so the cached memberships are still valid
+    assert membership.get_membership_version(user.pk) == version
+    updates = [
+        query["sql"]
+        for query in context.captured_queries
+        if query["sql"].startswith("UPDATE")
+    ]
+    assert len(updates) == 1
+    assert '"first_name"' in updates[0]
+    assert '"email"' not in updates[0]
+
+
 def test_helmholtz_create_users(
     authentification_view: PatchedHelmholtzAuthentificationView,
     username: str,
@@ -356,3 +455,46 @@ def test_helmholtz_create_users(
 
     with pytest.raises(PermissionDenied):
         test_basic_get(authentification_view, username)
+
+
+def test_session_vo_snapshot(
+    authentification_view: PatchedHelmholtzAuthentificationView,
+    username: str,
+    userinfo: dict[str, Any],
+    monkeypatch,
+    django_assert_num_queries,
+    django_capture_on_commit_callbacks,
+):
+    """Test the snapshot of the VO memberships in the session."""
+    monkeypatch.setattr(app_settings, "HELMHOLTZ_SESSION_VO_SNAPSHOT", True)
+
+    test_basic_get(authentification_view, username)
+
+    request = authentification_view.request
+    vos = userinfo["eduperson_entitlement"][:2]
+    assert request.session[membership.SESSION_KEY]["vos"] == sorted(vos)
+
+    @require_vo(vos[0])
+    def view(request):
+        return "success"
+
+    with django_assert_num_queries(0):
+        assert view(request) == "success"
+
+    # changing the memberships invalidates the snapshot
+    user = models.HelmholtzUser.objects.get(username=username)
+    with django_capture_on_commit_callbacks(execute=True):
+        user.groups.remove(
+            models.HelmholtzVirtualOrganization.objects.get(
+                eduperson_entitlement=vos[0]
+            )
+        )
+    del request._helmholtz_aai_vos
+
+    with pytest.raises(PermissionDenied):
+        view(request)
+    assert membership.request_has_vo(
+        request,
+        "urn:geant:helmholtz.de:group:some_VO#login.helmholtz.de",
+        include_subgroups=True,
+    )
@@ -0,0 +1,194 @@
+"""Tests for the authentication backend
+-------------------------------------
+
+This module defines unittests for the
+:class:`django_helmholtz_aai.backends.HelmholtzAAIBackend` class.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser, Group, Permission
+
+from django_helmholtz_aai import membership, models
+from django_helmholtz_aai.backends import HelmholtzAAIBackend
+from django_helmholtz_aai.middleware import HelmholtzAAIMiddleware
+
+User = get_user_model()
+
+VO = "urn:geant:helmholtz.de:group:some_VO#login.helmholtz.de"
+
+
+@pytest.fixture
+def vo(db) -> models.HelmholtzVirtualOrganization:
+    return models.HelmholtzVirtualOrganization.objects.create(
+        name=VO, eduperson_entitlement=VO
+    )
+
+
+@pytest.fixture
+def aai_user(vo) -> models.HelmholtzUser:
+    user = models.HelmholtzUser.objects.create(
+        username="dummy_user",
+        email="user@example.com",
+        eduperson_unique_id="dummy_user@login.helmholtz-data-federation.de",
+    )
+    user.groups.add(vo)
+    return user
+
+
+@pytest.fixture
+def permission(db) -> Permission:
+    return Permission.objects.get(codename="view_helmholtzuser")
+
+
+def get_fresh_user(user: models.HelmholtzUser) -> models.HelmholtzUser:
+    """Get the user without the permission cache of the instance."""
+    return models.HelmholtzUser.objects.get(pk=user.pk)
+
+
+def test_cached_group_permissions(
+    aai_user,
+    vo,
+    permission,
+    django_assert_num_queries,
+    django_capture_on_commit_callbacks,
+):
+    """Test that the group permissions are cached across instances."""
+    backend = HelmholtzAAIBackend()
+    perm = "django_helmholtz_aai.view_helmholtzuser"
+    assert not backend.has_perm(get_fresh_user(aai_user), perm)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        vo.permissions.add(permission)
+    assert backend.has_perm(get_fresh_user(aai_user), perm)
+
+    user = get_fresh_user(aai_user)
+    with django_assert_num_queries(1):
+        # only the user permissions are queried
+        assert backend.has_perm(user, perm)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        aai_user.groups.remove(vo)
+    assert not backend.has_perm(get_fresh_user(aai_user), perm)
+
+
+def test_deleted_group_permissions(
+    aai_user, vo, permission, django_capture_on_commit_callbacks
+):
+    """Test that the permissions of a deleted group are not cached."""
+    backend = HelmholtzAAIBackend()
+    with django_capture_on_commit_callbacks(execute=True):
+        vo.permissions.add(permission)
+    perm = "django_helmholtz_aai.view_helmholtzuser"
+    assert backend.has_perm(get_fresh_user(aai_user), perm)
+    assert backend.has_vo(aai_user, VO)
+
+    with django_capture_on_commit_callbacks(execute=True) as callbacks:
+        vo.delete()
+        # the cache is only invalidated when the transaction is committed
+        assert backend.has_vo(aai_user, VO)
+    assert callbacks
+    assert not backend.has_perm(get_fresh_user(aai_user), perm)
+    assert not backend.has_vo(aai_user, VO)
+
+
+def test_has_vo(
+    aai_user, vo, django_assert_num_queries, django_capture_on_commit_callbacks
+):
+    """Test the cached check for VO memberships."""
+    backend = HelmholtzAAIBackend()
+    assert backend.has_vo(aai_user, VO)
+
+    with django_assert_num_queries(0):
+        assert backend.has_vo(aai_user, VO)
+        assert not backend.has_vo(aai_user, VO + "x")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        aai_user.groups.clear()
+    assert not backend.has_vo(aai_user, VO)
+
+
+def test_get_user(aai_user, django_assert_num_queries):
+    """Test getting the Helmholtz AAI user in one query."""
+    backend = HelmholtzAAIBackend()
+    with django_assert_num_queries(1):
+        user = backend.get_user(aai_user.pk)
+        assert isinstance(user, models.HelmholtzUser)
+        assert user.username == aai_user.username
+        assert user.eduperson_unique_id == aai_user.eduperson_unique_id
+
+
+def test_middleware(aai_user, rf, django_assert_num_queries):
+    """Test the lazy attributes of the middleware."""
+    request = rf.get("/")
+    request.user = User.objects.get(pk=aai_user.pk)
+    HelmholtzAAIMiddleware(lambda request: None).process_request(request)
+
+    with django_assert_num_queries(1):
+        assert request.aai_user.eduperson_unique_id == (
+            aai_user.eduperson_unique_id
+        )
+        assert request.aai_user.pk == aai_user.pk
+
+    assert VO in request.aai_vos
+    with django_assert_num_queries(0):
+        assert VO in request.aai_vos
+
+
+def test_middleware_anonymous(rf, db, django_assert_num_queries):
+    """Test that the AAI user of an anonymous request is None."""
+    from django.contrib.auth.models import AnonymousUser
+
+    request = rf.get("/")
+    request.user = AnonymousUser()
+    HelmholtzAAIMiddleware(lambda request: None).process_request(request)
+
+    with django_assert_num_queries(0):
+        assert request.aai_user is None
+        assert request.aai_vos == frozenset()
+
+
+def test_visible_to(aai_user, vo, permission, django_assert_num_queries):
+    """Test filtering objects by the groups of a user."""
+    other = Group.objects.create(name="other")
+    other.permissions.add(
+        Permission.objects.get(codename="change_helmholtzuser")
+    )
+    vo.permissions.add(permission)
+
+    membership.get_group_ids(aai_user)  # fill the cache
+
+    for cached in [False, True]:
+        with django_assert_num_queries(1):
+            assert list(
+                models.filter_visible_to(
+                    Permission.objects.all(), aai_user, cached=cached
+                )
+            ) == [permission]
+    assert not models.filter_visible_to(
+        Group.objects.all(), AnonymousUser(), "pk"
+    )
@@ -0,0 +1,63 @@
+"""Tests for the system checks
+----------------------------
+
+These tests make sure that configurations which lead to outdated memberships
+in other server processes are reported.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+from django_helmholtz_aai import app_settings, checks
+
+LOCMEM = {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}
+SHARED = {"BACKEND": "django.core.cache.backends.db.DatabaseCache"}
+
+
+def get_ids(errors) -> list[str]:
+    return [error.id for error in errors]
+
+
+def test_membership_cache_local(settings):
+    """Test the warning for a local-memory membership cache."""
+    settings.CACHES = {"default": LOCMEM}
+    assert get_ids(checks.check_membership_cache(None)) == [
+        "django_helmholtz_aai.W003"
+    ]
+
+
+def test_membership_cache_shared(settings):
+    """Test that a shared membership cache is accepted."""
+    settings.CACHES = {"default": dict(SHARED, LOCATION="helmholtz_aai_cache")}
+    assert not checks.check_membership_cache(None)
+
+
+def test_session_vo_snapshot_local(settings, monkeypatch):
+    """Test the warning for the VO snapshot with a local-memory cache."""
+    settings.CACHES = {"default": LOCMEM}
+    monkeypatch.setattr(app_settings, "HELMHOLTZ_SESSION_VO_SNAPSHOT", True)
+    assert get_ids(checks.check_membership_cache(None)) == [
+        "django_helmholtz_aai.W003",
+        "django_helmholtz_aai.W004",
+    ]
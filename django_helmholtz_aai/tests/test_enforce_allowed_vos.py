@@ -0,0 +1,135 @@
+"""Tests for the enforce_allowed_vos command
+-----------------------------------------
+
+This module tests the
+:mod:`~django_helmholtz_aai.management.commands.enforce_allowed_vos` command.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import re
+from importlib import import_module
+
+import pytest
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management import CommandError, call_command
+
+from django_helmholtz_aai import app_settings, models, sessions
+
+VO1 = "urn:geant:helmholtz.de:group:some_VO#login.helmholtz.de"
+VO2 = "urn:geant:helmholtz.de:group:other_VO#login.helmholtz.de"
+
+
+@pytest.fixture
+def users(db, rf) -> list[models.HelmholtzUser]:
+    vos = [
+        models.HelmholtzVirtualOrganization.objects.create(
+            name=vo, eduperson_entitlement=vo
+        )
+        for vo in [VO1, VO2]
+    ]
+    users = [
+        models.HelmholtzUser.objects.create(
+            username=f"user{i}",
+            email=f"user{i}@example.com",
+            eduperson_unique_id=f"user{i}@aai",
+        )
+        for i in range(3)
+    ]
+    users[0].groups.add(*vos)
+    users[1].groups.add(vos[1])
+    for user in users:
+        request = rf.get("/")
+        request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+        request.session["_auth_user_id"] = str(user.pk)
+        request.session.save()
+        sessions.record_session(request, user)
+    return users
+
+
+@pytest.fixture
+def allowed_vos(monkeypatch):
+    monkeypatch.setattr(
+        app_settings, "HELMHOLTZ_ALLOWED_VOS_REGEXP", [re.compile(VO1)]
+    )
+    monkeypatch.setattr(app_settings, "HELMHOLTZ_TRACK_SESSIONS", True)
+
+
+def test_logout(users, allowed_vos):
+    """Test logging out the users without an allowed VO."""
+    call_command("enforce_allowed_vos")
+    assert set(
+        models.HelmholtzUserSession.objects.values_list("user", flat=True)
+    ) == {users[0].pk}
+    assert Session.objects.count() == 1
+    assert models.HelmholtzUser.objects.filter(is_active=True).count() == 3
+
+
+def test_deactivate(users, allowed_vos):
+    """Test deactivating the users without an allowed VO."""
+    call_command("enforce_allowed_vos", deactivate=True)
+    assert set(
+        models.HelmholtzUser.objects.filter(is_active=True).values_list(
+            "username", flat=True
+        )
+    ) == {"user0"}
+    assert Session.objects.count() == 1
+
+
+def test_dry_run(users, allowed_vos, capsys):
+    """Test that the dry run does not change anything."""
+    call_command("enforce_allowed_vos", deactivate=True, dry_run=True)
+    assert "Found 2 users" in capsys.readouterr().out
+    assert Session.objects.count() == 3
+    assert models.HelmholtzUser.objects.filter(is_active=True).count() == 3
+
+
+def test_no_tracking(users, allowed_vos, monkeypatch):
+    """Test that logging out requires the session tracking."""
+    monkeypatch.setattr(app_settings, "HELMHOLTZ_TRACK_SESSIONS", False)
+    with pytest.raises(CommandError):
+        call_command("enforce_allowed_vos")
+    assert Session.objects.count() == 3
+
+
+def test_get_allowed_vo_ids(users):
+    """Test that the patterns are matched like at login."""
+    from django_helmholtz_aai.management.commands.enforce_allowed_vos import (
+        get_allowed_vo_ids,
+    )
+
+    def names(*patterns):
+        return set(
+            models.HelmholtzVirtualOrganization.objects.filter(
+                pk__in=get_allowed_vo_ids(patterns)
+            ).values_list("name", flat=True)
+        )
+
+    assert names(re.compile(r".*some_VO")) == {VO1}
+    assert names(re.compile(r"some_VO")) == set()
+    # features of python regular expressions that databases do not support
+    assert names(re.compile(r"(?i).*SOME_vo")) == {VO1}
+    assert names(re.compile(r"(?!.*some_VO).*_VO#")) == {VO2}
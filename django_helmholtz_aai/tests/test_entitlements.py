@@ -0,0 +1,146 @@
+"""Tests for the entitlements
+---------------------------
+
+This module defines unittests for the :mod:`django_helmholtz_aai.entitlements`
+module.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import pytest
+from django.core.management import call_command
+
+from django_helmholtz_aai import app_settings, entitlements, models, views
+
+
+@pytest.mark.parametrize(
+    "entitlement, expected",
+    [
+        (
+            "urn:geant:helmholtz.de:group:some_VO#login.helmholtz.de",
+            ("urn:geant:helmholtz.de", "some_VO", "login.helmholtz.de"),
+        ),
+        (
+            "urn:geant:helmholtz.de:group:some_VO:subgroup#login.helmholtz.de",
+            (
+                "urn:geant:helmholtz.de",
+                "some_VO:subgroup",
+                "login.helmholtz.de",
+            ),
+        ),
+        ("urn:mace:dir:entitlement:common-lib-terms", None),
+        ("urn:geant:helmholtz.de:group:some_VO", None),
+    ],
+)
+def test_parse_entitlement(entitlement: str, expected):
+    """Test parsing entitlements."""
+    parsed = entitlements.parse_entitlement(entitlement)
+    if expected is None:
+        assert parsed is None
+    else:
+        assert parsed == expected
+        assert str(parsed) == entitlement
+    assert entitlements.is_group_entitlement(entitlement) == bool(
+        views.group_patt.match(entitlement)
+    )
+
+
+def test_vo_fields(db):
+    """Test the structured fields of the VO."""
+    entitlement = (
+        "urn:geant:helmholtz.de:group:some_VO:subgroup#login.helmholtz.de"
+    )
+    vo = models.HelmholtzVirtualOrganization.objects.create(
+        name=entitlement, eduperson_entitlement=entitlement
+    )
+    assert vo.entitlement.segments == ("some_VO", "subgroup")
+    assert str(vo) == "some_VO:subgroup#login.helmholtz.de"
+    assert list(
+        models.HelmholtzVirtualOrganization.objects.from_authority(
+            "login.helmholtz.de"
+        )
+    ) == [vo]
+
+
+def test_vo_hierarchy(db):
+    """Test querying subgroups and parent groups of VOs."""
+    base = "urn:geant:helmholtz.de:group:"
+    authority = "#login.helmholtz.de"
+    vos = {}
+    for path in ["some_VO", "some_VO:sub", "some_VO:sub:sub", "some_VOx"]:
+        vos[path] = models.HelmholtzVirtualOrganization.objects.create(
+            name=base + path + authority,
+            eduperson_entitlement=base + path + authority,
+        )
+    user = models.HelmholtzUser.objects.create(
+        username="dummy_user",
+        eduperson_unique_id="dummy_user@login.helmholtz-data-federation.de",
+    )
+    user.groups.add(vos["some_VO:sub:sub"])
+
+    manager = models.HelmholtzVirtualOrganization.objects
+    assert set(vos["some_VO"].get_descendants()) == {
+        vos["some_VO:sub"],
+        vos["some_VO:sub:sub"],
+    }
+    assert set(manager.ancestors_of(vos["some_VO:sub:sub"])) == {
+        vos["some_VO"],
+        vos["some_VO:sub"],
+    }
+    assert manager.user_in_subtree(user, base + "some_VO" + authority)
+    assert not manager.user_in_subtree(user, vos["some_VOx"])
+
+
+def test_vo_filter(db, monkeypatch):
+    """Test filtering the VOs with include and exclude patterns."""
+    monkeypatch.setattr(
+        app_settings, "HELMHOLTZ_VO_INCLUDE", [r".*:group:some_VO[:#].*"]
+    )
+    monkeypatch.setattr(
+        app_settings, "HELMHOLTZ_VO_EXCLUDE", [r".*:group:some_VO:excl.*"]
+    )
+    vo_filter = entitlements.get_vo_filter()
+
+    base = "urn:geant:helmholtz.de:group:"
+    authority = "#login.helmholtz.de"
+    assert vo_filter(base + "some_VO" + authority)
+    assert vo_filter(base + "some_VO:sub" + authority)
+    assert not vo_filter(base + "some_VO:excluded" + authority)
+    assert not vo_filter(base + "other_VO" + authority)
+    assert not vo_filter("urn:mace:dir:entitlement:common-lib-terms")
+
+    for path in ["some_VO", "other_VO"]:
+        models.HelmholtzVirtualOrganization.objects.create(
+            name=base + path + authority,
+            eduperson_entitlement=base + path + authority,
+        )
+
+    call_command("prune_filtered_vos", without_confirmation=True)
+
+    assert list(
+        models.HelmholtzVirtualOrganization.objects.values_list(
+            "group_path", flat=True
+        )
+    ) == ["some_VO"]
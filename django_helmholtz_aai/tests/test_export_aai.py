@@ -0,0 +1,140 @@
+"""Tests for the export_aai command
+----------------------------------
+
+This module tests the
+:mod:`~django_helmholtz_aai.management.commands.export_aai` command.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import csv
+import json
+from typing import TYPE_CHECKING
+
+import pytest
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+
+from django_helmholtz_aai import models
+from django_helmholtz_aai.management import records
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+VO1 = "urn:geant:helmholtz.de:group:some_VO#login.helmholtz.de"
+VO2 = "urn:geant:helmholtz.de:group:other_VO#login.helmholtz.de"
+
+
+@pytest.fixture
+def aai_users(db) -> list[models.HelmholtzUser]:
+    vo1, vo2 = [
+        models.HelmholtzVirtualOrganization.objects.create(
+            name=vo, eduperson_entitlement=vo
+        )
+        for vo in [VO1, VO2]
+    ]
+    group = Group.objects.create(name="not a VO")
+    users = []
+    for i in range(3):
+        user = models.HelmholtzUser.objects.create(
+            username=f"user{i}",
+            email=f"user{i}@example.com",
+            eduperson_unique_id=f"user{i}@login.helmholtz.de",
+        )
+        user.groups.add(vo1, group)
+        users.append(user)
+    users[0].groups.add(vo2)
+    return users
+
+
+def test_export_jsonl(aai_users, tmp_path: Path):
+    """Test exporting the users to JSONL files."""
+    call_command("export_aai", output_dir=str(tmp_path), chunk_size=2)
+
+    users = list(records.read_records(str(tmp_path / "users.jsonl")))
+    assert [u["id"] for u in users] == [u.pk for u in aai_users]
+    assert users[0]["eduperson_unique_id"] == "user0@login.helmholtz.de"
+    assert users[0]["last_login"] is None
+
+    memberships = list(
+        records.read_records(str(tmp_path / "memberships.jsonl"))
+    )
+    assert sorted(
+        (m["user_id"], m["eduperson_entitlement"]) for m in memberships
+    ) == sorted([(u.pk, VO1) for u in aai_users] + [(aai_users[0].pk, VO2)])
+
+
+def test_export_csv(aai_users, tmp_path: Path):
+    """Test exporting the users to CSV files with a prefix."""
+    call_command(
+        "export_aai", output_dir=str(tmp_path), format="csv", prefix="aai_"
+    )
+    with (tmp_path / "aai_users.csv").open() as f:
+        users = list(csv.DictReader(f))
+    assert [u["username"] for u in users] == ["user0", "user1", "user2"]
+    with (tmp_path / "aai_memberships.csv").open() as f:
+        assert len(list(csv.DictReader(f))) == 4
+
+
+def test_export_parquet(aai_users, tmp_path: Path):
+    """Test exporting the users to Parquet files."""
+    pq = pytest.importorskip("pyarrow.parquet")
+    call_command("export_aai", output_dir=str(tmp_path), format="parquet")
+    table = pq.read_table(str(tmp_path / "users.parquet"))
+    assert table.column("username").to_pylist() == ["user0", "user1", "user2"]
+    assert str(table.schema.field("last_login").type).startswith("timestamp")
+
+
+def test_export_parquet_empty(db, tmp_path: Path):
+    """Test that an export without rows still writes the Parquet files."""
+    pq = pytest.importorskip("pyarrow.parquet")
+    call_command("export_aai", output_dir=str(tmp_path), format="parquet")
+    table = pq.read_table(str(tmp_path / "memberships.parquet"))
+    assert table.num_rows == 0
+    assert table.column_names == ["user_id", "eduperson_entitlement"]
+
+
+def test_get_field_types():
+    """Test getting the types of the fields for a values_list."""
+    through = models.HelmholtzUser.groups.through
+    assert records.get_field_types(
+        through,
+        ["user", "group__helmholtzvirtualorganization__eduperson_entitlement"],
+    ) == ["AutoField", "CharField"]
+    assert records.get_field_types(
+        models.HelmholtzUser, ["pk", "last_login", "is_active"]
+    ) == ["AutoField", "DateTimeField", "BooleanField"]
+
+
+def test_write_rows_jsonl(tmp_path: Path):
+    """Test the JSON encoding of the rows."""
+    path = str(tmp_path / "rows.jsonl")
+    n = records.write_rows(path, ["a", "b"], iter([(1, "x"), (2, None)]))
+    assert n == 2
+    with open(path) as f:
+        assert [json.loads(line) for line in f] == [
+            {"a": 1, "b": "x"},
+            {"a": 2, "b": None},
+        ]
@@ -0,0 +1,150 @@
+"""Tests for the import_aai_users command
+----------------------------------------
+
+This module tests the
+:mod:`~django_helmholtz_aai.management.commands.import_aai_users` command.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import json
+from io import StringIO
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from django.core.management import call_command
+
+from django_helmholtz_aai import models, signals
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+VO1 = "urn:geant:helmholtz.de:group:some_VO#login.helmholtz.de"
+VO2 = "urn:geant:helmholtz.de:group:some_VO:subgroup#login.helmholtz.de"
+
+
+def get_userinfo(i: int, **kwargs) -> dict[str, Any]:
+    userinfo = {
+        "sub": f"sub-{i}",
+        "email_verified": True,
+        "eduperson_unique_id": f"user{i}@login.helmholtz.de",
+        "preferred_username": f"user{i}",
+        "given_name": "Firstname",
+        "family_name": f"Lastname{i}",
+        "email": f"user{i}@example.com",
+        "eduperson_entitlement": [
+            VO1,
+            VO2 if i % 2 else "urn:mace:dir:entitlement:common-lib-terms",
+        ],
+    }
+    userinfo.update(kwargs)
+    return userinfo
+
+
+@pytest.fixture
+def jsonl_file(tmp_path: Path) -> Path:
+    path = tmp_path / "users.jsonl"
+    userinfos = [get_userinfo(i) for i in range(7)]
+    userinfos.append(get_userinfo(7, email_verified=False))
+    # the username of user8 is already taken
+    userinfos.append(get_userinfo(8, preferred_username="user0"))
+    path.write_text("\n".join(map(json.dumps, userinfos)) + "\n")
+    return path
+
+
+@pytest.mark.parametrize("jobs", [None, 2])
+def test_import_jsonl(db, jsonl_file: Path, jobs):
+    """Test importing users from a JSONL file."""
+    out = StringIO()
+    call_command(
+        "import_aai_users",
+        str(jsonl_file),
+        batch_size=3,
+        jobs=jobs,
+        stdout=out,
+    )
+    users = models.HelmholtzUser.objects.order_by("pk")
+    assert [u.last_name for u in users] == [
+        f"Lastname{i}" for i in [0, 1, 2, 3, 4, 5, 6, 8]
+    ]
+    user8 = users.get(last_name="Lastname8")
+    assert user8.username == user8.eduperson_unique_id
+
+    vo1, vo2 = models.HelmholtzVirtualOrganization.objects.order_by("pk")
+    assert vo1.eduperson_entitlement == VO1
+    assert vo2.group_path == "some_VO:subgroup"
+    assert vo1.user_set.count() == 8
+    assert vo2.user_set.count() == 3
+
+    output = out.getvalue()
+    assert "Imported 8 users with 11 memberships and 2 new VOs" in output
+    assert "1 email_not_verified" in output
+
+    # a second import skips the existing users
+    out = StringIO()
+    call_command("import_aai_users", str(jsonl_file), stdout=out)
+    assert models.HelmholtzUser.objects.count() == 8
+    assert "8 existing" in out.getvalue()
+
+
+def test_import_csv(db, tmp_path: Path):
+    """Test importing users from a CSV file."""
+    path = tmp_path / "users.csv"
+    keys = list(get_userinfo(0))
+    lines = [",".join(keys)]
+    for i in range(2):
+        userinfo = get_userinfo(i)
+        userinfo["eduperson_entitlement"] = " ".join(
+            userinfo["eduperson_entitlement"]
+        )
+        lines.append(",".join(str(userinfo[key]) for key in keys))
+    path.write_text("\n".join(lines) + "\n")
+
+    call_command("import_aai_users", str(path))
+
+    user = models.HelmholtzUser.objects.get(username="user1")
+    assert set(user.groups.values_list("name", flat=True)) == {VO1, VO2}
+
+
+def test_import_signals(db, jsonl_file: Path, monkeypatch):
+    """Test sending the signals."""
+    sent: list[str] = []
+    for name in ["aai_user_created", "aai_vo_created", "aai_vo_entered"]:
+        monkeypatch.setattr(
+            getattr(signals, name),
+            "send",
+            lambda *args, name=name, **kwargs: sent.append(name),
+        )
+
+    call_command("import_aai_users", str(jsonl_file))
+    assert not sent
+
+    models.HelmholtzUser.objects.all().delete()
+    models.HelmholtzVirtualOrganization.objects.all().delete()
+
+    call_command("import_aai_users", str(jsonl_file), send_signals=True)
+    assert sent.count("aai_user_created") == 8
+    assert sent.count("aai_vo_created") == 2
+    assert sent.count("aai_vo_entered") == 11
@@ -0,0 +1,92 @@
+"""Tests for the import time
+--------------------------
+
+This module measures the time to import the views of the app with
+``python -X importtime`` and makes sure that the OAuth client is only set up
+when it is needed.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import os
+import subprocess as spr
+import sys
+from pathlib import Path
+
+import pytest
+
+from django_helmholtz_aai import app_settings
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+
+
+def get_import_times(code: str) -> dict[str, int]:
+    """Get the cumulative import times in microseconds per module."""
+    env = os.environ.copy()
+    env["DJANGO_SETTINGS_MODULE"] = "testproject.settings"
+    proc = spr.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=str(ROOT),
+        env=env,
+        stdout=spr.PIPE,
+        stderr=spr.PIPE,
+        universal_newlines=True,
+        check=True,
+    )
+    times: dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_time, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+@pytest.mark.parametrize(
+    "module",
+    [
+        "django_helmholtz_aai.urls",
+        "django_helmholtz_aai.management.commands.remove_empty_vos",
+    ],
+)
+def test_import_without_authlib(module: str):
+    """Test that importing the module does not import authlib."""
+    times = get_import_times(f"import django; django.setup(); import {module}")
+    assert module in times
+    assert not [name for name in times if name.startswith("authlib")], (
+        f"{module} imports authlib "
+        f"(import time: {times[module] / 1000:.1f} ms)"
+    )
+
+
+def test_get_oauth_client():
+    """Test that the client is registered on first use."""
+    from django_helmholtz_aai import views
+
+    views.reset_oauth()
+    client = views.get_oauth_client()
+    assert client is views.get_oauth_client()
+    assert client.client_id == app_settings.HELMHOLTZ_CLIENT_KWS["client_id"]
+    views.reset_oauth()
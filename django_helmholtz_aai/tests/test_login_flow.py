@@ -0,0 +1,187 @@
+"""Tests for the login flow
+------------------------
+
+These tests run the full login flow against the
+:class:`~django_helmholtz_aai.testing.StandInProvider`, including the
+requests of the OAuth client to the token, userinfo and JWKS endpoints.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import time
+from urllib.parse import urlsplit
+
+import pytest
+import requests
+from authlib.integrations.base_client import MismatchingStateError
+from django.test import Client
+from django.urls import get_script_prefix, reverse
+
+from django_helmholtz_aai import app_settings, models
+from django_helmholtz_aai.testing import StandInProvider, make_userinfo
+
+
+def get_path(url: str) -> str:
+    """Get the path for the test client from a URL of the website.
+
+    The test client does not expect the FORCE_SCRIPT_NAME in the path.
+    """
+    parts = urlsplit(url)
+    path = "/" + parts.path[len(get_script_prefix()) :]
+    return path + ("?" + parts.query if parts.query else "")
+
+
+def get_vos(user: models.HelmholtzUser) -> list[str]:
+    """Get the group paths of the VOs of a user."""
+    return list(
+        models.HelmholtzVirtualOrganization.objects.filter(
+            user=user
+        ).values_list("group_path", flat=True)
+    )
+
+
+def login(client: Client, provider: StandInProvider, userinfo):
+    """Log in via the login view and the provider."""
+    response = client.get(get_path(reverse("django_helmholtz_aai:login")))
+    assert response.status_code == 302
+    assert response["Location"].startswith(provider.url + "/authorize")
+    return client.get(
+        get_path(provider.authorize(response["Location"], userinfo))
+    )
+
+
+def test_login(db, client: Client, aai_provider: StandInProvider):
+    """Test the login of a new user."""
+    userinfo = make_userinfo("user1", ["some_VO"])
+    response = login(client, aai_provider, userinfo)
+    assert response.status_code == 302
+
+    user = models.HelmholtzUser.objects.get()
+    assert user.eduperson_unique_id == userinfo["eduperson_unique_id"]
+    assert client.session["_auth_user_id"] == str(user.pk)
+    assert get_vos(user) == ["some_VO"]
+    assert aai_provider.requests["token"] == 1
+    assert aai_provider.requests["userinfo"] == 1
+    assert aai_provider.requests["jwks"] == 1
+
+
+def test_login_returning_user(db, aai_provider: StandInProvider):
+    """Test the login of a user that has an account already."""
+    login(Client(), aai_provider, make_userinfo("user1", ["some_VO"]))
+    userinfo = make_userinfo("user1", ["other_VO"], email="new@example.com")
+    client = Client()
+    assert login(client, aai_provider, userinfo).status_code == 302
+
+    user = models.HelmholtzUser.objects.get()
+    assert client.session["_auth_user_id"] == str(user.pk)
+    assert user.email == "new@example.com"
+    assert get_vos(user) == ["other_VO"]
+
+
+def test_reused_code(db, client: Client, aai_provider: StandInProvider):
+    """Test that a callback cannot be replayed."""
+    response = client.get(get_path(reverse("django_helmholtz_aai:login")))
+    callback = aai_provider.authorize(
+        response["Location"], make_userinfo("user1")
+    )
+    assert client.get(get_path(callback)).status_code == 302
+    client.logout()
+    with pytest.raises(MismatchingStateError):
+        client.get(get_path(callback))
+    assert aai_provider.requests["token"] == 1
+
+
+@pytest.mark.parametrize("endpoint", ["token", "userinfo"])
+def test_failure(
+    db, client: Client, aai_provider: StandInProvider, endpoint: str
+):
+    """Test a failing endpoint of the provider."""
+    aai_provider.failures[endpoint] = 503
+    with pytest.raises(requests.HTTPError):
+        login(client, aai_provider, make_userinfo("user1"))
+    assert not models.HelmholtzUser.objects.exists()
+
+
+def test_latency(db, client: Client, aai_provider: StandInProvider):
+    """Test the latency of the provider."""
+    aai_provider.latencies["token"] = 0.2
+    t0 = time.perf_counter()
+    login(client, aai_provider, make_userinfo("user1"))
+    assert time.perf_counter() - t0 >= 0.2
+
+
+def test_authorize_endpoint(aai_provider: StandInProvider):
+    """Test the login at the authorization endpoint of the provider."""
+    aai_provider.add_user(make_userinfo("user1"))
+    url = aai_provider.url + "/authorize"
+    params = {
+        "client_id": aai_provider.client_id,
+        "redirect_uri": "http://testserver/auth/",
+        "state": "some-state",
+    }
+    response = requests.get(
+        url, params=dict(params, login_hint="user1"), allow_redirects=False
+    )
+    assert response.status_code == 302
+    assert "state=some-state" in response.headers["Location"]
+    assert "code=" in response.headers["Location"]
+
+    response = requests.get(url, params=params, allow_redirects=False)
+    assert response.status_code == 400
+
+
+def test_backchannel_logout(
+    db, client: Client, aai_provider: StandInProvider, monkeypatch
+):
+    """Test the back-channel logout with the session id of the id token."""
+    monkeypatch.setattr(app_settings, "HELMHOLTZ_TRACK_SESSIONS", True)
+    login(client, aai_provider, make_userinfo("user1"))
+    user_session = models.HelmholtzUserSession.objects.get()
+    assert user_session.sid
+
+    token = aai_provider.make_logout_token(sid=user_session.sid)
+    response = Client(enforce_csrf_checks=True).post(
+        get_path(reverse("django_helmholtz_aai:backchannel_logout")),
+        {"logout_token": token},
+    )
+    assert response.status_code == 200
+    assert "_auth_user_id" not in client.session
+
+
+def test_provider_prunes_tokens(monkeypatch):
+    """Test that the provider does not keep expired or surplus tokens."""
+    from django_helmholtz_aai.testing import StandInProvider
+
+    provider = StandInProvider()
+    monkeypatch.setattr(provider, "max_tokens", 2)
+    for i in range(3):
+        provider._prune(provider._tokens, provider.max_tokens - 1)
+        provider._tokens[str(i)] = {"expires_at": float("inf")}
+    assert list(provider._tokens) == ["1", "2"]
+
+    provider._codes["old"] = {"expires_at": 0}
+    provider._codes["new"] = {"expires_at": float("inf")}
+    provider._prune(provider._codes)
+    assert list(provider._codes) == ["new"]
@@ -0,0 +1,105 @@
+"""Tests for the map_aai_accounts command
+----------------------------------------
+
+This module tests the
+:mod:`~django_helmholtz_aai.management.commands.map_aai_accounts` command.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+from django_helmholtz_aai import models
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+User = get_user_model()
+
+
+@pytest.fixture
+def users(db) -> list[User]:
+    return [
+        User.objects.create(username=f"user{i}", email=f"User{i}@example.com")
+        for i in range(5)
+    ]
+
+
+def test_map_accounts_csv(users, tmp_path: Path):
+    """Test mapping the accounts from a CSV file."""
+    path = tmp_path / "accounts.csv"
+    path.write_text(
+        "email,eduperson_unique_id\n"
+        + "".join(f"user{i}@example.com,id{i}@aai\n" for i in range(3))
+        + "unknown@example.com,unknown@aai\n"
+    )
+    call_command("map_aai_accounts", str(path), chunk_size=2)
+
+    aai_users = models.HelmholtzUser.objects.order_by("pk")
+    assert [u.eduperson_unique_id for u in aai_users] == [
+        f"id{i}@aai" for i in range(3)
+    ]
+    assert [u.pk for u in aai_users] == [u.pk for u in users[:3]]
+    assert aai_users[0].username == "user0"
+
+    # running the command again does not create duplicates
+    call_command("map_aai_accounts", str(path))
+    assert models.HelmholtzUser.objects.count() == 3
+
+
+def test_map_accounts_jsonl(users, tmp_path: Path):
+    """Test mapping the accounts from a JSONL file."""
+    User.objects.create(username="duplicate", email="user0@example.com")
+    path = tmp_path / "accounts.jsonl"
+    path.write_text(
+        "\n".join(
+            json.dumps(
+                {
+                    "email": f"user{i}@example.com",
+                    "eduperson_unique_id": f"id{i}",
+                }
+            )
+            for i in range(2)
+        )
+    )
+    call_command("map_aai_accounts", str(path))
+
+    # user0 is skipped as the email is ambiguous
+    assert list(models.HelmholtzUser.objects.values_list("pk", flat=True)) == [
+        users[1].pk
+    ]
+
+
+def test_map_accounts_dry_run(users, tmp_path: Path):
+    """Test that the dry run does not create users."""
+    path = tmp_path / "accounts.csv"
+    path.write_text("email,eduperson_unique_id\nuser0@example.com,id0@aai\n")
+    call_command("map_aai_accounts", str(path), dry_run=True)
+    assert not models.HelmholtzUser.objects.exists()
@@ -0,0 +1,172 @@
+"""Tests for the purge_stale_aai_users command
+-------------------------------------------
+
+This module tests the
+:mod:`~django_helmholtz_aai.management.commands.purge_stale_aai_users`
+command.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+from datetime import timedelta
+
+import pytest
+from django.contrib.admin.models import ADDITION, LogEntry
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db.models.signals import post_delete
+from django.utils import timezone
+
+from django_helmholtz_aai import models
+
+VO = "urn:geant:helmholtz.de:group:some_VO#login.helmholtz.de"
+
+
+@pytest.fixture
+def users(db) -> dict[str, models.HelmholtzUser]:
+    now = timezone.now()
+    long_ago = now - timedelta(days=100)
+    vo = models.HelmholtzVirtualOrganization.objects.create(
+        name=VO, eduperson_entitlement=VO
+    )
+    kws = {
+        "active": dict(last_login=now),
+        "stale": dict(last_login=long_ago),
+        "never": dict(last_login=None, date_joined=long_ago),
+        "staff": dict(last_login=long_ago, is_staff=True),
+    }
+    users = {
+        name: models.HelmholtzUser.objects.create(
+            username=name,
+            email=f"{name}@example.com",
+            eduperson_unique_id=f"{name}@aai",
+            **kw,
+        )
+        for name, kw in kws.items()
+    }
+    users["stale"].groups.add(vo)
+    LogEntry.objects.log_action(
+        users["stale"].pk, None, None, "something", ADDITION
+    )
+    return users
+
+
+def test_delete(users):
+    """Test deleting the stale users."""
+    call_command(
+        "purge_stale_aai_users", older_than=30, without_confirmation=True
+    )
+    remaining = {"active", "staff"}
+    assert set(User.objects.values_list("username", flat=True)) == remaining
+    assert (
+        set(models.HelmholtzUser.objects.values_list("username", flat=True))
+        == remaining
+    )
+    assert not LogEntry.objects.exists()
+    assert not User.groups.through.objects.exists()
+    assert models.HelmholtzVirtualOrganization.objects.get().possibly_empty
+
+
+def test_delete_chunks(users):
+    """Test deleting the stale users in several chunks."""
+    call_command(
+        "purge_stale_aai_users",
+        older_than=30,
+        without_confirmation=True,
+        chunk_size=1,
+    )
+    assert User.objects.count() == 2
+
+
+def test_include_staff(users):
+    """Test deleting the stale staff users."""
+    call_command(
+        "purge_stale_aai_users",
+        older_than=30,
+        without_confirmation=True,
+        include_staff=True,
+    )
+    assert list(User.objects.values_list("username", flat=True)) == ["active"]
+
+
+def test_send_signals(users):
+    """Test deleting the users with the deletion collector."""
+    deleted = []
+
+    def receiver(sender, instance, **kwargs):
+        deleted.append(instance.username)
+
+    post_delete.connect(receiver, sender=models.HelmholtzUser)
+    try:
+        call_command(
+            "purge_stale_aai_users",
+            older_than=30,
+            without_confirmation=True,
+            send_signals=True,
+        )
+    finally:
+        post_delete.disconnect(receiver, sender=models.HelmholtzUser)
+    assert sorted(deleted) == ["never", "stale"]
+    assert User.objects.count() == 2
+    assert models.HelmholtzVirtualOrganization.objects.get().possibly_empty
+
+
+def test_anonymize(users):
+    """Test anonymizing the stale users."""
+    call_command(
+        "purge_stale_aai_users",
+        older_than=30,
+        without_confirmation=True,
+        anonymize=True,
+    )
+    user = models.HelmholtzUser.objects.get(pk=users["stale"].pk)
+    assert user.username == f"anonymized-{user.pk}"
+    assert user.eduperson_unique_id == f"anonymized-{user.pk}"
+    assert not user.email
+    assert not user.is_active
+    assert not user.has_usable_password()
+    assert not user.groups.exists()
+    assert models.HelmholtzUser.objects.filter(is_active=True).count() == 2
+
+    # anonymized users are not selected again
+    call_command(
+        "purge_stale_aai_users",
+        older_than=30,
+        without_confirmation=True,
+        dry_run=True,
+    )
+    assert User.objects.count() == 4
+
+
+def test_dry_run(users, capsys):
+    """Test that the dry run does not delete anything."""
+    call_command(
+        "purge_stale_aai_users",
+        older_than=30,
+        without_confirmation=True,
+        dry_run=True,
+    )
+    assert "Would delete 2 users" in capsys.readouterr().out
+    assert User.objects.count() == 4
@@ -0,0 +1,242 @@
+"""Tests for removing empty virtual organizations
+-----------------------------------------------
+
+This module defines unittests for the
+:meth:`~django_helmholtz_aai.models.HelmholtzVirtualOrganizationQuerySet.remove_empty_vos`
+method and the ``remove_empty_vos`` management command.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+from datetime import timedelta
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+
+from django_helmholtz_aai import membership, models
+from django_helmholtz_aai.janitor import LOCK_KEY, EmptyVOJanitor
+
+VO1 = "urn:geant:helmholtz.de:group:some_VO#login.helmholtz.de"
+VO2 = "urn:geant:helmholtz.de:group:other_VO#login.helmholtz.de"
+
+
+@pytest.fixture
+def vos(db) -> list[models.HelmholtzVirtualOrganization]:
+    return [
+        models.HelmholtzVirtualOrganization.objects.create(
+            name=vo_name, eduperson_entitlement=vo_name
+        )
+        for vo_name in [VO1, VO2]
+    ]
+
+
+@pytest.fixture
+def aai_user(db, vos) -> models.HelmholtzUser:
+    user = models.HelmholtzUser.objects.create(
+        username="dummy_user",
+        email="user@example.com",
+        eduperson_unique_id="dummy_user@login.helmholtz-data-federation.de",
+    )
+    user.groups.add(*vos)
+    return user
+
+
+def test_remove_empty_vos(vos):
+    """Test removing all empty VOs."""
+    call_command("remove_empty_vos", without_confirmation=True)
+    assert not models.HelmholtzVirtualOrganization.objects.exists()
+
+
+def test_incremental_only_flagged(vos):
+    """Test that the incremental mode only removes flagged VOs."""
+    models.HelmholtzVirtualOrganization.objects.filter(
+        eduperson_entitlement=VO1
+    ).mark_possibly_empty()
+
+    call_command(
+        "remove_empty_vos", without_confirmation=True, incremental=True
+    )
+
+    remaining = models.HelmholtzVirtualOrganization.objects.values_list(
+        "eduperson_entitlement", flat=True
+    )
+    assert list(remaining) == [VO2]
+
+
+def test_incremental_keeps_members(aai_user, vos):
+    """Test that flagged VOs with members are kept and unflagged."""
+    models.HelmholtzVirtualOrganization.objects.mark_possibly_empty()
+
+    call_command(
+        "remove_empty_vos", without_confirmation=True, incremental=True
+    )
+
+    assert models.HelmholtzVirtualOrganization.objects.count() == 2
+    assert not models.HelmholtzVirtualOrganization.objects.filter(
+        possibly_empty=True
+    ).exists()
+
+
+def test_incremental_last_member_leaves(aai_user, vos, monkeypatch):
+    """Test that a VO whose last member leaves during the run stays flagged."""
+    vo_class = models.HelmholtzVirtualOrganization
+    aai_user.groups.remove(vos[0])
+    vo_class.objects.mark_possibly_empty()
+
+    def leave_and_keep(prompt):
+        # vos[1] still had a member when the candidates were queried
+        aai_user.groups.remove(vos[1])
+        return "n"
+
+    monkeypatch.setattr("builtins.input", leave_and_keep)
+    vo_class.objects.remove_empty_vos(
+        without_confirmation=False, incremental=True, grace_period=0
+    )
+
+    assert vo_class.objects.filter(pk=vos[1].pk, possibly_empty=True)
+    removed = vo_class.objects.remove_empty_vos(
+        incremental=True, grace_period=0
+    )
+    assert {vo.eduperson_entitlement for vo in removed} == {VO1, VO2}
+
+
+def test_flag_on_user_deletion(aai_user, vos):
+    """Test that the VOs of a deleted user are flagged."""
+    aai_user.delete()
+
+    assert (
+        models.HelmholtzVirtualOrganization.objects.filter(
+            possibly_empty=True
+        ).count()
+        == 2
+    )
+
+
+def test_tombstone_vos(vos):
+    """Test keeping empty VOs as tombstones during the grace period."""
+    removed = models.HelmholtzVirtualOrganization.objects.remove_empty_vos(
+        grace_period=3600
+    )
+    assert len(removed) == 2
+    assert (
+        models.HelmholtzVirtualOrganization.objects.filter(
+            tombstoned_at__isnull=False, possibly_empty=True
+        ).count()
+        == 2
+    )
+
+    # the tombstones are kept during the grace period
+    call_command(
+        "remove_empty_vos",
+        without_confirmation=True,
+        incremental=True,
+        grace_period=3600,
+    )
+    assert models.HelmholtzVirtualOrganization.objects.count() == 2
+
+    # and deleted afterwards
+    models.HelmholtzVirtualOrganization.objects.update(
+        tombstoned_at=timezone.now() - timedelta(hours=2)
+    )
+    call_command(
+        "remove_empty_vos",
+        without_confirmation=True,
+        incremental=True,
+        grace_period=3600,
+    )
+    assert not models.HelmholtzVirtualOrganization.objects.exists()
+
+
+def test_revive_vos(vos):
+    """Test reviving tombstoned VOs."""
+    pks = {vo.pk for vo in vos}
+    models.HelmholtzVirtualOrganization.objects.remove_empty_vos(
+        grace_period=3600
+    )
+
+    assert models.HelmholtzVirtualOrganization.objects.revive() == 2
+    assert {
+        vo.pk
+        for vo in models.HelmholtzVirtualOrganization.objects.filter(
+            tombstoned_at__isnull=True
+        )
+    } == pks
+
+
+def test_revive_refilled_tombstones(vos):
+    """Test reviving tombstones that got members outside of join_vo."""
+    vo_class = models.HelmholtzVirtualOrganization
+    vo_class.objects.remove_empty_vos(grace_period=3600)
+    vo = vo_class.objects.get(pk=vos[0].pk)
+    user = models.HelmholtzUser.objects.create(
+        username="dummy_user",
+        email="user@example.com",
+        eduperson_unique_id="dummy_user@login.helmholtz-data-federation.de",
+    )
+    user.groups.add(vo)
+
+    vo_class.objects.remove_empty_vos(incremental=True, grace_period=3600)
+    vo.refresh_from_db()
+    assert vo.tombstoned_at is None
+    assert not vo.possibly_empty
+
+    # when the VO empties again, it gets a new grace period
+    user.groups.remove(vo)
+    vo_class.objects.filter(pk=vo.pk).mark_possibly_empty()
+    removed = vo_class.objects.remove_empty_vos(
+        incremental=True, grace_period=3600
+    )
+    assert vo in removed
+    assert vo_class.objects.filter(pk=vo.pk, tombstoned_at__isnull=False)
+
+
+def test_delete_if_empty(aai_user, vos):
+    """Test that VOs that have been joined in the meantime are kept."""
+    vo_class = models.HelmholtzVirtualOrganization
+    # the VO was empty when it was examined, but the user joined it since
+    assert not vo_class.objects.delete_if_empty(vos[0])
+    assert vo_class.objects.filter(pk=vos[0].pk).exists()
+    assert aai_user.groups.filter(pk=vos[0].pk).exists()
+
+    aai_user.groups.remove(vos[0])
+    assert vo_class.objects.delete_if_empty(vos[0])
+    assert not vo_class.objects.filter(pk=vos[0].pk).exists()
+
+
+def test_janitor_lock(vos):
+    """Test that the janitor does not run concurrently."""
+    cache = membership.get_cache()
+    models.HelmholtzVirtualOrganization.objects.mark_possibly_empty()
+    janitor = EmptyVOJanitor(60)
+
+    cache.add(LOCK_KEY, True)
+    janitor.cleanup()
+    assert models.HelmholtzVirtualOrganization.objects.count() == 2
+
+    cache.delete(LOCK_KEY)
+    janitor.cleanup()
+    assert not models.HelmholtzVirtualOrganization.objects.exists()
+    assert cache.get(LOCK_KEY) is None
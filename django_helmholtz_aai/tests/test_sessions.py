@@ -0,0 +1,264 @@
+"""Tests for the session index
+-----------------------------
+
+This module tests the recording of sessions in
+:mod:`django_helmholtz_aai.sessions` and the
+:class:`~django_helmholtz_aai.views.HelmholtzBackchannelLogoutView`.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import time
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
+import pytest
+from django.conf import settings
+from django.contrib.auth import logout
+from django.contrib.sessions.models import Session
+from django.test import Client
+from django.urls import get_script_prefix, reverse
+
+from django_helmholtz_aai import app_settings, models, sessions, views
+
+if TYPE_CHECKING:
+    from django.test import RequestFactory
+
+ISSUER = "https://aai.example.com"
+
+
+@pytest.fixture(scope="module")
+def signing_key():
+    jwk = pytest.importorskip("joserfc.jwk")
+    return jwk.RSAKey.generate_key(2048, parameters={"kid": "test-key"})
+
+
+@pytest.fixture
+def oauth_metadata(signing_key) -> dict[str, Any]:
+    return {
+        "issuer": ISSUER,
+        "jwks": {"keys": [signing_key.as_dict(private=False)]},
+    }
+
+
+@pytest.fixture
+def aai_users(db) -> list[models.HelmholtzUser]:
+    return [
+        models.HelmholtzUser.objects.create(
+            username=f"user{i}",
+            email=f"user{i}@example.com",
+            eduperson_unique_id=f"user{i}@aai",
+        )
+        for i in range(2)
+    ]
+
+
+def login(rf: RequestFactory, user: models.HelmholtzUser, **kwargs):
+    """Create a session for the user and record it."""
+    request = rf.get("/")
+    request.session = import_module(settings.SESSION_ENGINE).SessionStore()
+    request.session["_auth_user_id"] = str(user.pk)
+    request.session.save()
+    request.user = user
+    sessions.record_session(request, user, **kwargs)
+    return request
+
+
+def test_invalidate_sessions_for(rf: RequestFactory, aai_users):
+    """Test deleting the sessions of users."""
+    user0, user1 = aai_users
+    for i in range(2):
+        login(rf, user0, sub="sub0")
+    login(rf, user1, sub="sub1")
+    assert Session.objects.count() == 3
+
+    assert sessions.invalidate_sessions_for([user0]) == 2
+    assert Session.objects.count() == 1
+    assert not user0.aai_sessions.exists()
+    assert user1.aai_sessions.exists()
+
+
+def test_logout_forgets_session(rf: RequestFactory, aai_users, monkeypatch):
+    """Test that the record is removed when the user logs out."""
+    monkeypatch.setattr(app_settings, "HELMHOLTZ_TRACK_SESSIONS", True)
+    request = login(rf, aai_users[0])
+    logout(request)
+    assert not models.HelmholtzUserSession.objects.exists()
+
+
+@pytest.fixture
+def logout_client() -> Client:
+    """A client for the back-channel logout that enforces CSRF checks."""
+    return Client(enforce_csrf_checks=True)
+
+
+def post_logout_token(client: Client, token: str):
+    # the test client does not expect the FORCE_SCRIPT_NAME in the path
+    url = reverse("django_helmholtz_aai:backchannel_logout")
+    path = "/" + url[len(get_script_prefix()) :]
+    return client.post(path, {"logout_token": token})
+
+
+def get_logout_token(signing_key, **claims) -> str:
+    from joserfc import jwt
+
+    payload = {
+        "iss": ISSUER,
+        "aud": "test-client",
+        "iat": int(time.time()),
+        "jti": "abc",
+        "events": {views.BACKCHANNEL_LOGOUT_EVENT: {}},
+    }
+    payload.update(claims)
+    return jwt.encode(
+        {"alg": "RS256", "kid": "test-key"}, payload, signing_key
+    )
+
+
+def test_backchannel_logout(
+    logout_client: Client,
+    rf: RequestFactory,
+    aai_users,
+    oauth_client,
+    signing_key,
+):
+    """Test the back-channel logout with the subject of the user."""
+    user0, user1 = aai_users
+    login(rf, user0, sub="sub0", sid="sid0")
+    login(rf, user0, sub="sub0", sid="sid1")
+    login(rf, user1, sub="sub1", sid="sid2")
+
+    token = get_logout_token(signing_key, sid="sid1")
+    response = post_logout_token(logout_client, token)
+    assert response.status_code == 200
+    assert response["Cache-Control"] == "no-store"
+    assert list(user0.aai_sessions.values_list("sid", flat=True)) == ["sid0"]
+
+    token = get_logout_token(signing_key, sub="sub0")
+    assert post_logout_token(logout_client, token).status_code == 200
+    assert not user0.aai_sessions.exists()
+    assert Session.objects.count() == 1
+
+
+@pytest.mark.parametrize(
+    "claims",
+    [
+        {"aud": "other-client"},
+        {"iss": "https://other.example.com"},
+        {"events": {}},
+        {"nonce": "abc"},
+        {},
+    ],
+)
+def test_backchannel_logout_invalid(
+    logout_client: Client,
+    rf: RequestFactory,
+    aai_users,
+    oauth_client,
+    signing_key,
+    claims,
+):
+    """Test that invalid logout tokens are rejected."""
+    login(rf, aai_users[0], sub="sub0")
+    if claims:
+        claims["sub"] = "sub0"
+    token = get_logout_token(signing_key, **claims)
+    response = post_logout_token(logout_client, token)
+    assert response.status_code == 400
+    assert response.json()["error"] == "invalid_request"
+    assert Session.objects.count() == 1
+
+
+def test_backchannel_logout_key_refresh(
+    logout_client: Client, aai_users, oauth_client, signing_key, monkeypatch
+):
+    """Test that the keys are only fetched again for unknown key ids."""
+    forced = []
+    fetch_jwk_set = oauth_client.fetch_jwk_set
+
+    def fetch(force=False):
+        if force:
+            forced.append(True)
+            return oauth_client.server_metadata["jwks"]
+        return fetch_jwk_set()
+
+    monkeypatch.setattr(oauth_client, "fetch_jwk_set", fetch)
+
+    # garbage and tokens with known keys do not fetch the keys
+    for token in ["garbage", "a.b.c", get_logout_token(signing_key)]:
+        assert post_logout_token(logout_client, token).status_code == 400
+    assert not forced
+
+    # unknown keys are fetched again, but only once per interval
+    jwk = pytest.importorskip("joserfc.jwk")
+    jwt = pytest.importorskip("joserfc.jwt")
+    other_key = jwk.RSAKey.generate_key(2048, parameters={"kid": "other"})
+    token = jwt.encode(
+        {"alg": "RS256", "kid": "other"}, {"sub": "sub0"}, other_key
+    )
+    for i in range(3):
+        assert post_logout_token(logout_client, token).status_code == 400
+    assert len(forced) == 1
+
+
+def test_backchannel_logout_hmac(
+    logout_client: Client,
+    rf: RequestFactory,
+    aai_users,
+    oauth_client,
+    signing_key,
+):
+    """Test that logout tokens signed with HMAC are rejected."""
+    jwk = pytest.importorskip("joserfc.jwk")
+    jwt = pytest.importorskip("joserfc.jwt")
+    login(rf, aai_users[0], sub="sub0")
+    payload = {
+        "iss": ISSUER,
+        "aud": "test-client",
+        "iat": int(time.time()),
+        "sub": "sub0",
+        "events": {views.BACKCHANNEL_LOGOUT_EVENT: {}},
+    }
+    # the public key of the AAI as HMAC secret (algorithm confusion)
+    public_key = jwk.OctKey.import_key(
+        signing_key.as_pem(private=False), {"kid": "test-key"}
+    )
+    # a symmetric key in the key set must not be usable either
+    secret_key = jwk.OctKey.generate_key(256, parameters={"kid": "hmac"})
+    oauth_client.server_metadata["jwks"]["keys"].append(
+        secret_key.as_dict(private=True)
+    )
+    for key in [public_key, secret_key]:
+        token = jwt.encode(
+            {"alg": "HS256", "kid": key.kid},
+            payload,
+            key,
+            algorithms=["HS256"],
+        )
+        assert post_logout_token(logout_client, token).status_code == 400
+    assert Session.objects.count() == 1
+    assert views.HelmholtzBackchannelLogoutView.get_signing_algorithms(
+        {"id_token_signing_alg_values_supported": ["HS256", "ES256", "none"]}
+    ) == ["ES256"]
@@ -0,0 +1,206 @@
+"""Tests for the login state
+---------------------------
+
+This module tests the stores in :mod:`django_helmholtz_aai.state` and how
+they are used by the login and authentification views.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import pytest
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.contrib.sessions.models import Session
+from django.urls import reverse
+
+from django_helmholtz_aai import app_settings, state, views
+
+if TYPE_CHECKING:
+    from django.http import HttpResponse
+    from django.test import Client, RequestFactory
+
+
+@pytest.fixture
+def cookie_store(monkeypatch) -> state.SignedCookieStateStore:
+    monkeypatch.setattr(
+        app_settings,
+        "HELMHOLTZ_STATE_STORE",
+        "django_helmholtz_aai.state.SignedCookieStateStore",
+    )
+    return state.get_state_store()
+
+
+def test_session_store(db, client: Client, rf: RequestFactory):
+    """Test saving and consuming the state in the session."""
+    request = rf.get("/")
+    request.session = client.session
+    store = state.SessionStateStore()
+    store.save(request, None, "abc", {"nonce": "123"})
+    assert store.pop(request, "other") is None
+    assert store.pop(request, "abc") == {"nonce": "123"}
+    # the state can only be used once
+    assert store.pop(request, "abc") is None
+
+
+def test_session_store_expired(
+    db, client: Client, rf: RequestFactory, monkeypatch
+):
+    """Test that the session store ignores and removes expired states."""
+    request = rf.get("/")
+    request.session = client.session
+    store = state.SessionStateStore()
+    monkeypatch.setattr(app_settings, "HELMHOLTZ_STATE_MAX_AGE", -1)
+    store.save(request, None, "old", {"nonce": "123"})
+    assert store.pop(request, "old") is None
+
+    store.save(request, None, "old", {"nonce": "123"})
+    monkeypatch.setattr(app_settings, "HELMHOLTZ_STATE_MAX_AGE", 60)
+    store.save(request, None, "new", {"nonce": "456"})
+    assert store.key_prefix + "old" not in request.session
+
+
+def login(rf: RequestFactory) -> HttpResponse:
+    """Start a login at the (fake) Helmholtz AAI."""
+    request = rf.get(reverse("django_helmholtz_aai:login"), {"next": "/x"})
+    return SessionMiddleware(views.HelmholtzLoginView.as_view())(request)
+
+
+def test_login_without_session(
+    db, rf: RequestFactory, oauth_client, cookie_store
+):
+    """Test that the login redirect does not create a session."""
+    response = login(rf)
+    assert response.status_code == 302
+    assert response.url.startswith("https://aai.example.com/authorize?")
+    assert cookie_store.cookie_name in response.cookies
+    assert settings.SESSION_COOKIE_NAME not in response.cookies
+    assert not Session.objects.exists()
+
+
+def test_cookie_store_callback(
+    db, rf: RequestFactory, oauth_client, cookie_store
+):
+    """Test consuming the state from the cookie in the callback."""
+    response = login(rf)
+    state_param = dict(
+        item.split("=", 1) for item in response.url.split("?")[1].split("&")
+    )["state"]
+    cookie = response.cookies[cookie_store.cookie_name]
+    assert cookie["path"] == reverse("django_helmholtz_aai:auth")
+    assert cookie["httponly"]
+
+    def get_view(state_param: str) -> views.HelmholtzAuthentificationView:
+        request = rf.get(
+            reverse("django_helmholtz_aai:auth"),
+            {"state": state_param, "code": "xyz"},
+        )
+        request.COOKIES[cookie_store.cookie_name] = cookie.value
+        view = views.HelmholtzAuthentificationView()
+        view.setup(request)
+        return view
+
+    # a state that does not belong to the cookie is rejected
+    assert get_view("forged").login_state is None
+
+    view = get_view(state_param)
+    assert view.login_state["next"] == "/x"
+    assert view.get_success_url() == "/x"
+
+    calls = []
+    oauth_client.fetch_access_token = lambda **kws: calls.append(kws) or {}
+    view.fetch_access_token(oauth_client)
+    assert calls == [
+        {
+            "code": "xyz",
+            "state": state_param,
+            "redirect_uri": view.login_state["redirect_uri"],
+        }
+    ]
+
+
+def test_cookie_store_tampered(rf: RequestFactory, cookie_store):
+    """Test that a tampered cookie is rejected."""
+    request = rf.get("/")
+    response = views.HttpResponseRedirect("/")
+    cookie_store.save(request, response, "abc", {"next": "/x"})
+    value = response.cookies[cookie_store.cookie_name].value
+
+    request.COOKIES[cookie_store.cookie_name] = value
+    assert cookie_store.pop(request, "abc") == {"next": "/x"}
+
+    tampered = value[:-1] + ("B" if value[-1] == "A" else "A")
+    request.COOKIES[cookie_store.cookie_name] = tampered
+    assert cookie_store.pop(request, "abc") is None
+
+
+def test_cookie_store_expired(rf: RequestFactory, cookie_store, monkeypatch):
+    """Test that an expired cookie is rejected."""
+    request = rf.get("/")
+    response = views.HttpResponseRedirect("/")
+    cookie_store.save(request, response, "abc", {"next": "/x"})
+    value = response.cookies[cookie_store.cookie_name].value
+    request.COOKIES[cookie_store.cookie_name] = value
+
+    # the cookie is older than the maximum age when it is read back
+    monkeypatch.setattr(app_settings, "HELMHOLTZ_STATE_MAX_AGE", -1)
+    assert cookie_store.pop(request, "abc") is None
+
+
+def test_cache_store(rf: RequestFactory, monkeypatch):
+    """Test saving and consuming the state in the cache."""
+    monkeypatch.setattr(
+        app_settings,
+        "HELMHOLTZ_STATE_STORE",
+        "django_helmholtz_aai.state.CacheStateStore",
+    )
+    store = state.get_state_store()
+    assert isinstance(store, state.CacheStateStore)
+
+    request = rf.get("/")
+    response = views.HttpResponseRedirect("/")
+    store.save(request, response, "abc", {"next": "/x"})
+    cookie = response.cookies[store.cookie_name]
+    assert store.cache.get(store.get_key("abc")) == {"next": "/x"}
+
+    # the state cannot be used without the cookie
+    assert store.pop(request, "abc") is None
+
+    request.COOKIES[store.cookie_name] = cookie.value
+    assert store.pop(request, "abc") == {"next": "/x"}
+    # the state can only be used once
+    assert store.pop(request, "abc") is None
+    assert store.cache.get(store.get_key("abc")) is None
+
+
+def test_cache_store_expired(rf: RequestFactory, monkeypatch):
+    """Test that abandoned logins expire in the cache."""
+    store = state.CacheStateStore()
+    request = rf.get("/")
+    response = views.HttpResponseRedirect("/")
+    monkeypatch.setattr(app_settings, "HELMHOLTZ_STATE_MAX_AGE", 0)
+    store.save(request, response, "abc", {"next": "/x"})
+    assert store.cache.get(store.get_key("abc")) is None
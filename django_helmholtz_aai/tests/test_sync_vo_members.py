@@ -0,0 +1,200 @@
+"""Tests for the sync_vo_members command
+---------------------------------------
+
+This module tests the
+:mod:`~django_helmholtz_aai.management.commands.sync_vo_members` command.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import json
+from typing import TYPE_CHECKING
+
+import pytest
+from django.contrib.auth.models import Group
+from django.core.management import call_command
+
+from django_helmholtz_aai import models, signals
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+VO1 = "urn:geant:helmholtz.de:group:some_VO#login.helmholtz.de"
+VO2 = "urn:geant:helmholtz.de:group:other_VO#login.helmholtz.de"
+VO3 = "urn:geant:helmholtz.de:group:new_VO#login.helmholtz.de"
+VO4 = "urn:geant:helmholtz.de:group:untouched_VO#login.helmholtz.de"
+
+
+@pytest.fixture
+def vos(db) -> dict[str, models.HelmholtzVirtualOrganization]:
+    return {
+        vo: models.HelmholtzVirtualOrganization.objects.create(
+            name=vo, eduperson_entitlement=vo
+        )
+        for vo in [VO1, VO2, VO4]
+    }
+
+
+@pytest.fixture
+def users(vos) -> list[models.HelmholtzUser]:
+    users = [
+        models.HelmholtzUser.objects.create(
+            username=f"user{i}",
+            email=f"user{i}@example.com",
+            eduperson_unique_id=f"user{i}@aai",
+        )
+        for i in range(3)
+    ]
+    users[0].groups.add(vos[VO1], vos[VO2], vos[VO4])
+    users[1].groups.add(vos[VO1])
+    return users
+
+
+@pytest.fixture
+def sent(monkeypatch) -> list[tuple]:
+    """Record the sent signals."""
+    ret: list[tuple] = []
+    for name in [
+        "aai_vo_created",
+        "aai_vo_members_added",
+        "aai_vo_members_removed",
+    ]:
+
+        def send(sender, name=name, vo=None, user_ids=None, **kwargs):
+            ret.append(
+                (name, vo.eduperson_entitlement, sorted(user_ids or []))
+            )
+
+        monkeypatch.setattr(getattr(signals, name), "send", send)
+    return ret
+
+
+def get_vos(user: models.HelmholtzUser) -> set[str]:
+    return set(
+        user.groups.filter(
+            helmholtzvirtualorganization__isnull=False
+        ).values_list("name", flat=True)
+    )
+
+
+def write_dump(path: Path, vos: dict[str, list[str]]) -> str:
+    path.write_text(
+        "\n".join(
+            json.dumps({"eduperson_entitlement": vo, "members": members})
+            for vo, members in vos.items()
+        )
+    )
+    return str(path)
+
+
+def test_sync_vo_members(users, sent, tmp_path: Path):
+    """Test adding and removing members."""
+    group = Group.objects.create(name="manual group")
+    users[0].groups.add(group)
+    path = write_dump(
+        tmp_path / "members.jsonl",
+        {
+            VO1: ["user1@aai", "user2@aai", "unknown@aai"],
+            VO2: [],
+            VO3: ["user2@aai"],
+        },
+    )
+    call_command("sync_vo_members", path)
+
+    assert get_vos(users[0]) == {VO4}
+    assert get_vos(users[1]) == {VO1}
+    assert get_vos(users[2]) == {VO1, VO3}
+    assert users[0].groups.filter(pk=group.pk).exists()
+
+    vo2 = models.HelmholtzVirtualOrganization.objects.get(name=VO2)
+    assert vo2.possibly_empty
+    vo3 = models.HelmholtzVirtualOrganization.objects.get(name=VO3)
+    assert vo3.group_path == "new_VO"
+
+    u0, u2 = users[0].pk, users[2].pk
+    assert sorted(sent) == sorted(
+        [
+            ("aai_vo_created", VO3, []),
+            ("aai_vo_members_added", VO1, [u2]),
+            ("aai_vo_members_added", VO3, [u2]),
+            ("aai_vo_members_removed", VO1, [u0]),
+            ("aai_vo_members_removed", VO2, [u0]),
+        ]
+    )
+
+    # a second run does not change anything
+    sent.clear()
+    call_command("sync_vo_members", path)
+    assert not sent
+
+
+def test_sync_vo_members_csv(users, tmp_path: Path):
+    """Test the synchronization with a CSV file."""
+    path = tmp_path / "members.csv"
+    path.write_text(
+        f"eduperson_entitlement,eduperson_unique_id\n{VO1},user2@aai\n{VO2},\n"
+    )
+    call_command("sync_vo_members", str(path))
+    assert get_vos(users[0]) == {VO4}
+    assert get_vos(users[1]) == set()
+    assert get_vos(users[2]) == {VO1}
+
+
+def test_sync_vo_members_dry_run(users, sent, tmp_path: Path):
+    """Test that the dry run does not change anything."""
+    path = write_dump(
+        tmp_path / "members.jsonl", {VO1: [], VO3: ["user2@aai"]}
+    )
+    call_command("sync_vo_members", path, dry_run=True)
+    assert get_vos(users[0]) == {VO1, VO2, VO4}
+    assert not models.HelmholtzVirtualOrganization.objects.filter(
+        name=VO3
+    ).exists()
+    assert not sent
+
+
+def test_sync_vo_members_chunks(users, sent, tmp_path: Path):
+    """Test that the changes are applied and signalled in chunks."""
+    path = write_dump(
+        tmp_path / "members.jsonl",
+        {VO1: ["user2@aai"], VO2: ["user1@aai", "user2@aai"]},
+    )
+    call_command("sync_vo_members", path, chunk_size=1)
+
+    assert get_vos(users[0]) == {VO4}
+    assert get_vos(users[1]) == {VO2}
+    assert get_vos(users[2]) == {VO1, VO2}
+
+    u0, u1, u2 = (user.pk for user in users)
+    assert sorted(sent) == sorted(
+        [
+            ("aai_vo_members_added", VO1, [u2]),
+            ("aai_vo_members_added", VO2, [u1]),
+            ("aai_vo_members_added", VO2, [u2]),
+            ("aai_vo_members_removed", VO1, [u0]),
+            ("aai_vo_members_removed", VO1, [u1]),
+            ("aai_vo_members_removed", VO2, [u0]),
+        ]
+    )
@@ -0,0 +1,99 @@
+"""Tests for the template tags
+----------------------------
+
+This module defines unittests for the
+:mod:`django_helmholtz_aai.templatetags.helmholtz_aai` module and the
+:mod:`django_helmholtz_aai.context_processors` module.
+"""
+
+# Disclaimer
+# ----------
+#
+# Copyright (C) 2022 Helmholtz-Zentrum Hereon
+#
+# This file is part of django-helmholtz-aai and is released under the
+# EUPL-1.2 license.
+# See LICENSE in the root of the repository for full licensing details.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the EUROPEAN UNION PUBLIC LICENCE v. 1.2 or later
+# as published by the European Commission.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# EUPL-1.2 license for more details.
+#
+# You should have received a copy of the EUPL-1.2 license along with this
+# program. If not, see https://www.eupl.eu/.
+
+
+from __future__ import annotations
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.template import Context, RequestContext, Template
+from django.urls import reverse
+
+from django_helmholtz_aai import models
+
+VO = "urn:geant:helmholtz.de:group:some_VO#login.helmholtz.de"
+SUBGROUP = "urn:geant:helmholtz.de:group:some_VO:subgroup#login.helmholtz.de"
+
+User = get_user_model()
+
+
+@pytest.fixture
+def aai_user(db) -> models.HelmholtzUser:
+    user = models.HelmholtzUser.objects.create(
+        username="dummy_user",
+        email="user@example.com",
+        eduperson_unique_id="dummy_user@login.helmholtz-data-federation.de",
+    )
+    user.groups.add(
+        models.HelmholtzVirtualOrganization.objects.create(
+            name=SUBGROUP, eduperson_entitlement=SUBGROUP
+        )
+    )
+    return user
+
+
+def test_in_vo(aai_user, django_assert_num_queries):
+    """Test the in_vo and in_vo_tree filters."""
+    template = Template(
+        "{% load helmholtz_aai %}"
+        + "".join(
+            f'{{% if user|in_vo:"{vo}" %}}1{{% else %}}0{{% endif %}}'
+            for vo in [VO, SUBGROUP] * 10
+        )
+        + f'{{% if user|in_vo_tree:"{VO}" %}}1{{% endif %}}'
+    )
+    user = User.objects.get(pk=aai_user.pk)
+    with django_assert_num_queries(1):
+        assert template.render(Context({"user": user})) == "01" * 10 + "1"
+
+
+def test_context_processor(aai_user, rf, django_assert_num_queries):
+    """Test the aai_vos of the context processor."""
+    request = rf.get("/")
+    request.user = User.objects.get(pk=aai_user.pk)
+    template = Template(
+        f'{{% if "{SUBGROUP}" in aai_vos %}}1{{% endif %}}'
+        f'{{% if "{VO}" in aai_vos %}}2{{% endif %}}'
+    )
+    with django_assert_num_queries(1):
+        assert template.render(RequestContext(request)) == "1"
+
+
+def test_helmholtz_login_url(rf):
+    """Test the url of the helmholtz_login_url tag."""
+    template = Template("{% load helmholtz_aai %}{% helmholtz_login_url %}")
+    login_url = reverse("django_helmholtz_aai:login")
+
+    request = rf.get("/some/page/")
+    assert template.render(Context({"request": request})) == login_url
+
+    request = rf.get("/some/page/", {"next": "/other/", "lang": "en"})
+    assert template.render(Context({"request": request})) == (
+        login_url + "?next=%2Fother%2F&amp;lang=en"
+    )
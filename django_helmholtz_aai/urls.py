@@ -44,4 +44,9 @@ app_name = "django_helmholtz_aai"
 urlpatterns = [
     path("login/", views.HelmholtzLoginView.as_view(), name="login"),
     path("auth/", views.HelmholtzAuthentificationView.as_view(), name="auth"),
+    path(
+        "backchannel-logout/",
+        views.HelmholtzBackchannelLogoutView.as_view(),
+        name="backchannel_logout",
+    ),
 ]
@@ -2,10 +2,12 @@
 -----
 
 Views of the django_helmholtz_aai app to be imported via the url config (see
-:mod:`django_helmholtz_aai.urls`). We define two views here: The
-:class:`HelmholtzLoginView` that redirects to the Helmholtz AAI, and the
+:mod:`django_helmholtz_aai.urls`). We define three views here: The
+:class:`HelmholtzLoginView` that redirects to the Helmholtz AAI, the
 :class:`HelmholtzAuthentificationView` that handles the user login after
-successful login at the Helmholtz AAI.
+successful login at the Helmholtz AAI, and the
+:class:`HelmholtzBackchannelLogoutView` that logs out users when they log out
+at the Helmholtz AAI.
 """
 # Disclaimer
 # ----------
@@ -32,26 +34,29 @@ successful login at the Helmholtz AAI.
 from __future__ import annotations
 
 import re
+import threading
+import time
 from enum import Enum
 from itertools import product
-from typing import TYPE_CHECKING, Any, Dict, Optional
+from typing import TYPE_CHECKING, Any, Dict, FrozenSet, List, Optional
 
-from authlib.integrations.django_client import OAuth
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import PermissionRequiredMixin
 from django.contrib.auth.views import LoginView
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
 from django.shortcuts import redirect
 from django.urls import reverse
+from django.utils.decorators import method_decorator
 from django.utils.functional import cached_property
 from django.views import generic
+from django.views.decorators.csrf import csrf_exempt
 
-from django_helmholtz_aai import app_settings
+from django_helmholtz_aai import app_settings, entitlements
 from django_helmholtz_aai import login as aai_login
-from django_helmholtz_aai import models, signals
-
-oauth = OAuth()
+from django_helmholtz_aai import membership, models, sessions, signals
+from django_helmholtz_aai.state import get_state_store
 
 SCOPES = [
     "profile",
@@ -60,15 +65,69 @@ SCOPES = [
 ]
 
 
-oauth.register(name="helmholtz", **app_settings.HELMHOLTZ_CLIENT_KWS)
-
-
 if TYPE_CHECKING:
+    from authlib.integrations.django_client import DjangoOAuth2App, OAuth
     from django.contrib.auth.models import User
 
 
+_oauth: Optional[OAuth] = None
+
+_oauth_lock = threading.Lock()
+
+
+def get_oauth() -> OAuth:
+    """Get the OAuth registry with the client for the Helmholtz AAI.
+
+    The registry is created (and authlib is imported) when this function is
+    called for the first time, i.e. with the first login. The client is
+    registered with the :setting:`HELMHOLTZ_CLIENT_KWS`.
+    """
+    global _oauth
+    if _oauth is None:
+        with _oauth_lock:
+            if _oauth is None:
+                from authlib.integrations.django_client import OAuth
+
+                oauth = OAuth()
+                oauth.register(
+                    name="helmholtz", **app_settings.HELMHOLTZ_CLIENT_KWS
+                )
+                _oauth = oauth
+    return _oauth
+
+
+def get_oauth_client() -> DjangoOAuth2App:
+    """Get the OAuth client for the Helmholtz AAI.
+
+    See Also
+    --------
+    get_oauth
+    """
+    return get_oauth().helmholtz
+
+
+def reset_oauth():
+    """Reset the OAuth registry.
+
+    The client is registered again with the current
+    :setting:`HELMHOLTZ_CLIENT_KWS` on the next call of :func:`get_oauth`.
+    """
+    global _oauth
+    with _oauth_lock:
+        _oauth = None
+
+
+def __getattr__(name: str):
+    # the oauth registry used to be created when importing this module
+    if name == "oauth":
+        return get_oauth()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 User = get_user_model()  # type: ignore  # noqa: F811
 
+#: Pattern for group entitlements. This has been superseded by
+#: :func:`django_helmholtz_aai.entitlements.is_group_entitlement`.
 group_patt = re.compile(r".*:group:.*#.*")
 
 
@@ -85,8 +144,13 @@ class HelmholtzLoginView(LoginView):
             redirect_uri = request.build_absolute_uri(
                 reverse("django_helmholtz_aai:auth")
             )
-        request.session["forward_after_aai_login"] = self.get_success_url()
-        return oauth.helmholtz.authorize_redirect(request, redirect_uri)
+        data = get_oauth_client().create_authorization_url(redirect_uri)
+        response = HttpResponseRedirect(data.pop("url"))
+        state = data.pop("state")
+        data["redirect_uri"] = redirect_uri
+        data["next"] = self.get_success_url()
+        get_state_store().save(request, response, state, data)
+        return response
 
     def post(self, request):
         """Reimplemented post method to call :meth:`get`."""
@@ -98,6 +162,16 @@ class HelmholtzAuthentificationView(PermissionRequiredMixin, generic.View):
 
     aai_user: models.HelmholtzUser
 
+    #: The entitlements of the VOs of the :attr:`aai_user`.
+    #:
+    #: This attribute is set via the :meth:`synchronize_vos` method.
+    vo_entitlements: FrozenSet[str]
+
+    #: The token from the Helmholtz AAI.
+    #:
+    #: This attribute is set when accessing the :attr:`userinfo`.
+    token: Dict[str, Any]
+
     class PermissionDeniedReasons(str, Enum):
         """Reasons why permissions are denied to login."""
 
@@ -158,6 +232,18 @@ class HelmholtzAuthentificationView(PermissionRequiredMixin, generic.View):
         ),
     }
 
+    @cached_property
+    def login_state(self) -> Optional[Dict[str, Any]]:
+        """The data of the pending login from the :class:`HelmholtzLoginView`.
+
+        The data is taken from the :setting:`HELMHOLTZ_STATE_STORE` for the
+        ``state`` that the Helmholtz AAI sent back. It is ``None`` if there is
+        no (or no valid) pending login.
+        """
+        return get_state_store().pop(
+            self.request, self.request.GET.get("state")
+        )
+
     @cached_property
     def userinfo(self) -> Dict[str, Any]:
         """The userinfo as obtained from the Helmholtz AAI.
@@ -169,8 +255,41 @@ class HelmholtzAuthentificationView(PermissionRequiredMixin, generic.View):
         ----------
         .. [1] https://hifis.net/doc/helmholtz-aai/attributes/
         """
-        token = oauth.helmholtz.authorize_access_token(self.request)
-        return oauth.helmholtz.userinfo(request=self.request, token=token)
+        client = get_oauth_client()
+        token = self.token = self.fetch_access_token(client)
+        return client.userinfo(request=self.request, token=token)
+
+    def fetch_access_token(self, client: DjangoOAuth2App) -> Dict[str, Any]:
+        """Fetch the access token from the Helmholtz AAI.
+
+        This does the same as the ``authorize_access_token`` method of the
+        `client` but takes the pending login from :attr:`login_state` instead
+        of the session.
+        """
+        from authlib.integrations.base_client import (
+            MismatchingStateError,
+            OAuthError,
+        )
+
+        params = self.request.GET
+        if params.get("error"):
+            raise OAuthError(
+                error=params["error"],
+                description=params.get("error_description"),
+            )
+        data = self.login_state
+        if data is None:
+            raise MismatchingStateError()
+        kws = {"code": params.get("code"), "state": params.get("state")}
+        for key in ["code_verifier", "redirect_uri"]:
+            if data.get(key):
+                kws[key] = data[key]
+        token = client.fetch_access_token(**kws)
+        if "id_token" in token and "nonce" in data:
+            token["userinfo"] = client.parse_id_token(
+                token, nonce=data["nonce"]
+            )
+        return token
 
     def login_user(self, user: models.HelmholtzUser):
         """Login the Helmholtz AAI user to the Django Application.
@@ -185,12 +304,29 @@ class HelmholtzAuthentificationView(PermissionRequiredMixin, generic.View):
         """
         user.backend = app_settings.HELMHOLTZ_USER_BACKEND  # type: ignore
         aai_login(self.request, user, self.userinfo)
+        if app_settings.HELMHOLTZ_SESSION_VO_SNAPSHOT:
+            membership.store_session_snapshot(
+                self.request, user, getattr(self, "vo_entitlements", None)
+            )
+        if app_settings.HELMHOLTZ_TRACK_SESSIONS:
+            claims = getattr(self, "token", {}).get("userinfo") or {}
+            sessions.record_session(
+                self.request,
+                user,
+                sub=self.userinfo.get("sub") or claims.get("sub"),
+                sid=claims.get("sid"),
+            )
 
     def get_success_url(self) -> str:
         """Return the URL to redirect to after processing a valid form."""
-        return self.request.session.pop(
-            "forward_after_aai_login", settings.LOGIN_REDIRECT_URL
-        )
+        data = self.login_state or {}
+        return data.get("next") or settings.LOGIN_REDIRECT_URL
+
+    def dispatch(self, request, *args, **kwargs):
+        """Reimplemented to clean up the pending login in the response."""
+        response = super().dispatch(request, *args, **kwargs)
+        get_state_store().clear(request, response)
+        return response
 
     def get(self, request):
         """Login the Helmholtz AAI user and update the data.
@@ -241,15 +377,9 @@ class HelmholtzAuthentificationView(PermissionRequiredMixin, generic.View):
                 user = self.get_user_from_email(self.userinfo["email"])
                 if user is None:
                     return True
-                fields = {
-                    f.name: getattr(user, f.name)
-                    for f in User._meta.fields
-                    if not f.many_to_many
-                }
-                self.aai_user = models.HelmholtzUser(
-                    user_ptr=user, eduperson_unique_id=user_id, **fields
+                self.aai_user = models.HelmholtzUser.objects.create_for_user(
+                    user, eduperson_unique_id=user_id
                 )
-                self.aai_user.save()
                 return False
             else:
                 return True
@@ -389,7 +519,7 @@ class HelmholtzAuthentificationView(PermissionRequiredMixin, generic.View):
             user = self.aai_user
             for key, val in to_update.items():
                 setattr(user, key, val)
-            user.save()
+            user.save(update_fields=list(to_update))
 
             # emit the aai_user_updated signal as the user has been updated
             signals.aai_user_updated.send(
@@ -404,7 +534,8 @@ class HelmholtzAuthentificationView(PermissionRequiredMixin, generic.View):
         """Synchronize the memberships in the virtual organizations.
 
         This method checks the ``eduperson_entitlement`` of the AAI userinfo
-        and
+        (filtered by the :setting:`HELMHOLTZ_VO_INCLUDE` and
+        :setting:`HELMHOLTZ_VO_EXCLUDE` settings) and
 
         1. creates the missing virtual organizations
         2. removes the user from virtual organizations that he or she does not
@@ -440,7 +571,7 @@ class HelmholtzAuthentificationView(PermissionRequiredMixin, generic.View):
             ]
         else:
             vo_names = []
-        actual_vos = list(filter(group_patt.match, vos))
+        actual_vos = list(filter(entitlements.get_vo_filter(), vos))
 
         # remove VOs in the database
         for vo_name in set(vo_names) - set(actual_vos):
@@ -459,10 +590,15 @@ class HelmholtzAuthentificationView(PermissionRequiredMixin, generic.View):
                 vo = self.create_vo(vo_name)
             self.join_vo(vo)
 
+        self.vo_entitlements = frozenset(actual_vos)
+
     def leave_vo(self, vo: models.HelmholtzVirtualOrganization):
         """Leave the given VO."""
         user = self.aai_user
         user.groups.remove(vo)
+        models.HelmholtzVirtualOrganization.objects.filter(
+            pk=vo.pk, user__isnull=True
+        ).mark_possibly_empty()
         signals.aai_vo_left.send(
             sender=vo.__class__,
             request=self.request,
@@ -474,6 +610,11 @@ class HelmholtzAuthentificationView(PermissionRequiredMixin, generic.View):
     def join_vo(self, vo: models.HelmholtzVirtualOrganization):
         """Join the given VO."""
         user = self.aai_user
+        if vo.tombstoned_at is not None:
+            models.HelmholtzVirtualOrganization.objects.filter(
+                pk=vo.pk
+            ).revive()
+            vo.tombstoned_at = None
         user.groups.add(vo)
         signals.aai_vo_entered.send(
             sender=vo.__class__,
@@ -495,3 +636,164 @@ class HelmholtzAuthentificationView(PermissionRequiredMixin, generic.View):
             userinfo=self.userinfo,
         )
         return vo
+
+
+#: The event of a back-channel logout in the logout token
+BACKCHANNEL_LOGOUT_EVENT = "http://schemas.openid.net/event/backchannel-logout"
+
+
+def _decode_jwt(
+    token: str, jwk_set: Dict[str, Any], algorithms: List[str]
+) -> Dict[str, Any]:
+    """Decode a JWT and verify its signature with the given key set.
+
+    Only the signature `algorithms` are accepted, such that a token cannot
+    choose an algorithm that does not fit the keys (e.g. HMAC with the
+    public key of the AAI).
+    """
+    try:
+        from joserfc import jwt
+        from joserfc.jwk import KeySet
+    except ImportError:  # older versions of authlib
+        from authlib.jose import JsonWebKey, JsonWebToken
+
+        return dict(
+            JsonWebToken(algorithms).decode(
+                token, JsonWebKey.import_key_set(jwk_set)
+            )
+        )
+    else:
+        return jwt.decode(
+            token, KeySet.import_key_set(jwk_set), algorithms=algorithms
+        ).claims
+
+
+def _get_jwt_kid(token: str) -> Optional[str]:
+    """Get the ``kid`` from the header of a JWT without verifying it.
+
+    Raises
+    ------
+    ValueError
+        If the token is malformed
+    """
+    import base64
+    import json
+
+    header = token.split(".", 1)[0]
+    try:
+        data = json.loads(
+            base64.urlsafe_b64decode(header + "=" * (-len(header) % 4))
+        )
+    except Exception:
+        raise ValueError("Malformed token")
+    if not isinstance(data, dict):
+        raise ValueError("Malformed token")
+    return data.get("kid")
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class HelmholtzBackchannelLogoutView(generic.View):
+    """Back-channel logout for the Helmholtz AAI.
+
+    This view implements the `OpenID Connect Back-Channel Logout`_. The
+    Helmholtz AAI posts a signed logout token to this view when a user logs
+    out at the Helmholtz AAI, and we delete the sessions of this user that
+    have been recorded with the :setting:`HELMHOLTZ_TRACK_SESSIONS` setting.
+
+    .. _OpenID Connect Back-Channel Logout: https://openid.net/specs/openid-connect-backchannel-1_0.html
+    """
+
+    #: Allowed clock skew in seconds when validating the logout token
+    leeway = 120
+
+    #: Minimum time in seconds between two fetches of the keys of the AAI
+    keys_refresh_interval = 300
+
+    def post(self, request):
+        """Validate the logout token and delete the sessions."""
+        try:
+            claims = self.parse_logout_token(request.POST["logout_token"])
+        except Exception as e:
+            response = JsonResponse(
+                {"error": "invalid_request", "error_description": str(e)},
+                status=400,
+            )
+        else:
+            sessions.invalidate_sessions(
+                sub=claims.get("sub"), sid=claims.get("sid")
+            )
+            response = HttpResponse()
+        response["Cache-Control"] = "no-store"
+        return response
+
+    def may_refresh_keys(self) -> bool:
+        """Check if the keys of the AAI may be fetched again.
+
+        The keys are fetched at most once per :attr:`keys_refresh_interval`
+        (across all processes that share the :setting:`HELMHOLTZ_CACHE`), so
+        that unauthenticated requests with unknown keys cannot make us
+        flood the AAI with requests.
+        """
+        return membership.get_cache().add(
+            f"{membership.KEY_PREFIX}:jwks-refresh",
+            True,
+            timeout=self.keys_refresh_interval,
+        )
+
+    @staticmethod
+    def get_signing_algorithms(metadata: Dict[str, Any]) -> List[str]:
+        """Get the algorithms that the logout token may be signed with.
+
+        These are the asymmetric algorithms of the
+        ``id_token_signing_alg_values_supported`` in the metadata of the AAI
+        (``["RS256"]`` by default). ``none`` and the HMAC algorithms are never
+        accepted, as the logout token has to be signed with the keys of the
+        AAI.
+        """
+        algorithms = [
+            alg
+            for alg in metadata.get("id_token_signing_alg_values_supported")
+            or ["RS256"]
+            if alg != "none" and not alg.startswith("HS")
+        ]
+        return algorithms or ["RS256"]
+
+    def parse_logout_token(self, logout_token: str) -> Dict[str, Any]:
+        """Decode and validate the logout token.
+
+        Raises
+        ------
+        ValueError
+            If the token is not a valid logout token for this client
+        """
+        client = get_oauth_client()
+        metadata = client.load_server_metadata()
+        jwk_set = client.fetch_jwk_set()
+        kid = _get_jwt_kid(logout_token)
+        known = {key.get("kid") for key in jwk_set.get("keys", [])}
+        if kid not in known and self.may_refresh_keys():
+            # the keys of the AAI may have been rotated
+            jwk_set = client.fetch_jwk_set(force=True)
+        claims = _decode_jwt(
+            logout_token, jwk_set, self.get_signing_algorithms(metadata)
+        )
+
+        now = time.time()
+        audience = claims.get("aud")
+        if isinstance(audience, str):
+            audience = [audience]
+        if metadata.get("issuer") and claims.get("iss") != metadata["issuer"]:
+            raise ValueError("Invalid issuer")
+        if client.client_id not in (audience or []):
+            raise ValueError("Invalid audience")
+        if not claims.get("iat") or claims["iat"] > now + self.leeway:
+            raise ValueError("Invalid issued at time")
+        if claims.get("exp") and claims["exp"] < now - self.leeway:
+            raise ValueError("The logout token expired")
+        if BACKCHANNEL_LOGOUT_EVENT not in (claims.get("events") or {}):
+            raise ValueError("Missing back-channel logout event")
+        if "nonce" in claims:
+            raise ValueError("A logout token must not contain a nonce")
+        if not claims.get("sub") and not claims.get("sid"):
+            raise ValueError("Missing sub or sid")
+        return claims